@@ -27,6 +27,7 @@ from core.camera import Camera
 from core.mesh import Mesh
 from core.renderer import Renderer
 from core.scene import Scene
+from core.skybox import Skybox
 from core.texture import Texture
 from effects.additiveBlendEffect import AdditiveBlendEffect
 from effects.brightFilterEffect import BrightFilterEffect
@@ -93,15 +94,14 @@ class Test(Base):
         self.rig.setPosition([0, 1, 4])  # Posisi awal kamera
         
         # ===================================================================
-        # SKY (Langit) - Skybox menggunakan Sphere
+        # SKY (Langit) - Skybox dengan cube map
         # ===================================================================
-        # Sphere besar (radius=50) yang membungkus seluruh scene
-        # Camera berada di dalam sphere, melihat texture dari dalam
-        skyGeometry = SphereGeometry(radius=50)
-        earthTexture = Texture("images/sky-earth.png")
-        skyMaterial = TextureMaterial(earthTexture)
-        sky = Mesh(skyGeometry, skyMaterial)
-        self.scene.add(sky)
+        # Gambar panorama (equirectangular) diubah sekali menjadi cube map;
+        # Skybox digambar terakhir sebagai satu segitiga layar penuh,
+        # hanya di pixel yang tidak tertutup objek lain
+        skyTexture = Texture()
+        skyTexture.loadEquirectangularImage("images/sky-earth.png", size=512)
+        self.scene.add(Skybox(skyTexture))
         
         # ===================================================================
         # GRASS (Rumput) - Ground Plane
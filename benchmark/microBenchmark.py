@@ -0,0 +1,258 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from math import cos, pi, sin
+
+import numpy
+
+#geometry uploads its attributes on construction, so the benchmark
+#needs an OpenGL context; it runs without a window unless HEADLESS is
+#set otherwise (must be selected before core is imported)
+os.environ.setdefault("HEADLESS", "egl")
+
+#must come first: selects the OpenGL platform for headless runs
+from core import headless
+from core.headless import HeadlessContext
+
+from benchmark.results import (compareResults, getEnvironment, loadResults,
+                               printRegressions, saveResults, summarize)
+from core.group import Group
+from core.matrix import Matrix
+from core.transformStore import TransformStore
+from geometry.boxGeometry import BoxGeometry
+from geometry.parametricGeometry import ParametricGeometry
+from geometry.sphereGeometry import SphereGeometry
+
+#microbenchmarks of geometry construction, matrix math and scene graph
+#queries, e.g.
+#  python -m benchmark.microBenchmark --output baseline.json
+#  python -m benchmark.microBenchmark --baseline baseline.json
+#  python -m benchmark.microBenchmark sphere --repeat 20
+#every case is run repeat times; each repetition calls it often enough
+#to last at least minimumTime and records the mean time per call.
+#Memory is measured in one extra call with tracemalloc, which slows
+#Python down, so it is never part of the timed repetitions.
+#the exit status is 1 when a result regressed against the baseline
+
+#compared with a tolerance: microseconds per call and peak bytes
+#allocated by one call
+comparedMetrics = ["time.p50", "time.min", "memoryPeak"]
+
+
+#surfaces for ParametricGeometry
+def waveSurface(u, v):
+    return [u, 0.2 * sin(4 * u) * cos(4 * v), v]
+
+def torusSurface(u, v):
+    return [(1 + 0.3 * cos(v)) * cos(u), 0.3 * sin(v), (1 + 0.3 * cos(v)) * sin(u)]
+
+
+#chain of groups depth levels deep, returns the deepest group
+def buildChain(depth):
+    node = Group()
+    for n in range(depth):
+        child = Group()
+        child.translate(0, 0.1, 0)
+        child.rotateY(0.1)
+        node.add(child)
+        node = child
+    return node
+
+#tree of groups, every group with breadth children
+def buildTree(depth, breadth):
+    root = Group()
+    level = [root]
+    for n in range(depth):
+        nextLevel = []
+        for parent in level:
+            for m in range(breadth):
+                child = Group()
+                parent.add(child)
+                nextLevel.append(child)
+        level = nextLevel
+    return root
+
+
+#setup functions return the arguments of the measured function
+def setupMerge(segments):
+    otherGeometry = SphereGeometry(1, segments, segments // 2)
+    return lambda: (SphereGeometry(1, segments, segments // 2), otherGeometry)
+
+def mergeGeometry(geometry, otherGeometry):
+    geometry.merge(otherGeometry)
+
+
+#the same geometry is transformed again on every call; a rigid
+#transformation keeps its coordinates finite
+def setupApplyMatrix(segments):
+    geometry = SphereGeometry(1, segments, segments // 2)
+    matrix = Matrix.makeTranslation(0.01, 0, 0) @ Matrix.makeRotationY(0.5)
+    return (geometry, matrix)
+
+
+#tree in a transform store, with its nodes below the root
+def setupStore(depth, breadth):
+    root = buildTree(depth, breadth)
+    store = TransformStore()
+    store.attach(root)
+    store.update()
+    return (store, root.getDescendantList()[1:])
+
+
+#name: (function, setup, needs OpenGL context)
+#function is called with the arguments returned by setup; when setup
+#returns a function instead, it is called before every measured call
+#(and is not timed), for cases that change their input
+cases = {
+    "box": (lambda: BoxGeometry(1, 1, 1), None, True),
+    "sphere-16x8": (lambda: SphereGeometry(1, 16, 8), None, True),
+    "sphere-32x16": (lambda: SphereGeometry(1, 32, 16), None, True),
+    "sphere-64x32": (lambda: SphereGeometry(1, 64, 32), None, True),
+    "sphere-128x64": (lambda: SphereGeometry(1, 128, 64), None, True),
+    "parametric-wave-32": (lambda: ParametricGeometry(-1, 1, 32, -1, 1, 32, waveSurface), None, True),
+    "parametric-torus-64": (lambda: ParametricGeometry(0, 2*pi, 64, 0, 2*pi, 32, torusSurface), None, True),
+    "merge-sphere-32x16": (mergeGeometry, lambda: setupMerge(32), True),
+    "applyMatrix-sphere-32x16": (lambda geometry, matrix: geometry.applyMatrix(matrix),
+        lambda: setupApplyMatrix(32), True),
+    "makeIdentity": (Matrix.makeIdentity, None, False),
+    "makeTranslation": (lambda: Matrix.makeTranslation(1, 2, 3), None, False),
+    "makeRotationY": (lambda: Matrix.makeRotationY(0.5), None, False),
+    "makeRotationY-out": (lambda out: Matrix.makeRotationY(0.5, out=out),
+        lambda: (Matrix.makeIdentity(),), False),
+    "makeScale": (lambda: Matrix.makeScale(2), None, False),
+    "makePerspective": (lambda: Matrix.makePerspective(60, 4/3, 0.1, 1000), None, False),
+    "makeLookAt": (lambda: Matrix.makeLookAt([1, 2, 3], [0, 0, 0]), None, False),
+    "makeOrthographic": (lambda: Matrix.makeOrthographic(), None, False),
+    "makeRotationsY-1000": (Matrix.makeRotationsY, lambda: (numpy.linspace(0, pi, 1000),), False),
+    "makeTranslations-1000": (Matrix.makeTranslations, lambda: (numpy.zeros((1000, 3)),), False),
+    "worldMatrix-depth-1": (lambda node: node.getWorldMatrix(), lambda: (buildChain(1),), False),
+    "worldMatrix-depth-10": (lambda node: node.getWorldMatrix(), lambda: (buildChain(10),), False),
+    "worldMatrix-depth-100": (lambda node: node.getWorldMatrix(), lambda: (buildChain(100),), False),
+    "descendants-deep-1000": (lambda root: root.getDescendantList(),
+        lambda: (buildTree(1000, 1),), False),
+    "descendants-wide-10000": (lambda root: root.getDescendantList(),
+        lambda: (buildTree(1, 10000),), False),
+    "descendants-tree-4x10": (lambda root: root.getDescendantList(),
+        lambda: (buildTree(4, 10),), False),
+    "store-update-wide-10000": (lambda store, nodes: store.update(),
+        lambda: setupStore(1, 10000), False),
+    "store-update-tree-4x10": (lambda store, nodes: store.update(),
+        lambda: setupStore(4, 10), False),
+    "store-rotateY-10000": (lambda store, nodes: store.rotateY(nodes, 0.01),
+        lambda: setupStore(1, 10000), False),
+    "traverse-wide-10000": (lambda root: sum(1 for node in root.traverse()),
+        lambda: (buildTree(1, 10000),), False),
+    "traverse-tree-4x10": (lambda root: sum(1 for node in root.traverse()),
+        lambda: (buildTree(4, 10),), False),
+}
+
+
+#arguments for one call of a case
+def getArguments(setupResult):
+    if callable(setupResult):
+        return setupResult()
+    return setupResult
+
+#seconds per call: mean of enough calls to last minimumTime
+def timeCalls(function, setupResult, minimumTime):
+    total = 0
+    calls = 0
+    while total < minimumTime:
+        arguments = getArguments(setupResult)
+        callStart = time.perf_counter()
+        function(*arguments)
+        total += time.perf_counter() - callStart
+        calls += 1
+    return total / calls, calls
+
+#bytes allocated at the peak of one call
+def measureMemory(function, setupResult):
+    arguments = getArguments(setupResult)
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        currentSize, peakSize = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peakSize
+
+
+def runCase(name, repeat, minimumTime):
+    function, setup, needsContext = cases[name]
+    setupResult = setup() if setup is not None else ()
+    #warm up caches and lazy imports
+    function(*getArguments(setupResult))
+    times = []
+    calls = 0
+    for n in range(repeat):
+        callTime, callCount = timeCalls(function, setupResult, minimumTime)
+        times.append(callTime)
+        calls += callCount
+    return {
+        #microseconds
+        "time": summarize(times, 1000000),
+        "calls": calls,
+        "memoryPeak": measureMemory(function, setupResult)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the geometry and matrix microbenchmarks")
+    parser.add_argument("cases", nargs="*",
+        help="case names or name prefixes (default: all)")
+    parser.add_argument("--list", action="store_true", help="list cases and exit")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--min-time", type=float, default=0.05,
+        help="seconds each repetition runs at least (default 0.05)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+        help="allowed relative slowdown (default 0.1)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in cases.keys():
+            print(name)
+        return 0
+
+    names = [name for name in cases.keys()
+                if len(args.cases) == 0 or any(name.startswith(prefix) for prefix in args.cases)]
+    if len(names) == 0:
+        parser.error("no case matches " + " ".join(args.cases))
+
+    context = None
+    if any(cases[name][2] for name in names):
+        context = HeadlessContext([16, 16], headless.backend, frameCount=0)
+
+    results = {
+        "environment": getEnvironment(),
+        "settings": {"repeat": args.repeat, "minimumTime": args.min_time},
+        "results": {}
+    }
+    print("%-28s %12s %12s %12s %12s" % ("case (us)", "min", "p50", "stdev", "peak KiB"))
+    for name in names:
+        result = runCase(name, args.repeat, args.min_time)
+        results["results"][name] = result
+        print("%-28s %12.2f %12.2f %12.2f %12.1f" % (name, result["time"]["min"],
+            result["time"]["p50"], result["time"]["stdev"], result["memoryPeak"] / 1024))
+        sys.stdout.flush()
+
+    if context is not None:
+        context.close()
+
+    if args.output is not None:
+        saveResults(results, args.output)
+
+    if args.baseline is not None:
+        regressions = compareResults(results, loadResults(args.baseline), comparedMetrics,
+            tolerance=args.tolerance)
+        printRegressions(regressions)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+import argparse
+import sys
+
+from benchmark.runScenes import runWorkload
+
+#measures where the depth pre-pass (Renderer.depthPrepass) starts to
+#pay off: the overdraw workload runs with and without it for a range of
+#layer counts (how many times each pixel is covered), e.g.
+#  python -m benchmark.prepassCrossover --layers 1 2 3 4 6 8
+#  python -m benchmark.prepassCrossover --material lambert --lights 1
+#the pre-pass costs one extra depth only draw per mesh; it wins once
+#the shading saved on hidden fragments is larger than that
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Depth pre-pass crossover measurement")
+    parser.add_argument("--layers", type=int, nargs="*", default=[1, 2, 3, 4, 6, 8, 12])
+    parser.add_argument("--material", default="phong")
+    parser.add_argument("--lights", type=int, default=4)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1280, 720])
+    args = parser.parse_args()
+
+    print("%7s %12s %12s %9s" % ("layers", "forward ms", "prepass ms", "speedup"))
+    crossover = None
+    for layers in args.layers:
+        times = []
+        for depthPrepass in [False, True]:
+            parameters = {"layers": layers, "material": args.material, "lights": args.lights,
+                        "depthPrepass": depthPrepass}
+            result = runWorkload("overdraw", parameters, args.frames, args.warmup, args.resolution, 1)
+            times.append(result["frameTime"]["p50"])
+        speedup = times[0] / times[1]
+        if crossover is None and speedup > 1:
+            crossover = layers
+        print("%7d %12.2f %12.2f %8.2fx" % (layers, times[0], times[1], speedup))
+        sys.stdout.flush()
+
+    if crossover is None:
+        print("the pre-pass did not pay off at any measured layer count")
+    else:
+        print("the pre-pass pays off from %d layers" % crossover)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
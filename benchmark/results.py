@@ -0,0 +1,112 @@
+import json
+import math
+import platform
+import subprocess
+import sys
+
+import numpy
+
+
+#summary statistics of a list of measurements, multiplied by scale
+#(1000 reports seconds as milliseconds)
+def summarize(values, scale=1):
+    ordered = sorted(values)
+    count = len(ordered)
+    if count == 0:
+        return {}
+
+    def percentile(fraction):
+        #linear interpolation between the closest ranks
+        position = fraction * (count - 1)
+        lower = int(math.floor(position))
+        upper = min(lower + 1, count - 1)
+        weight = position - lower
+        return ordered[lower] * (1 - weight) + ordered[upper] * weight
+
+    mean = sum(ordered) / count
+    variance = sum((value - mean) ** 2 for value in ordered) / max(1, count - 1)
+    return {
+        "count": count,
+        "mean": mean * scale,
+        "stdev": math.sqrt(variance) * scale,
+        "min": ordered[0] * scale,
+        "p50": percentile(0.50) * scale,
+        "p95": percentile(0.95) * scale,
+        "p99": percentile(0.99) * scale,
+        "max": ordered[-1] * scale
+    }
+
+
+#information needed to decide whether two result files are comparable
+def getEnvironment():
+    environment = {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "numpy": numpy.__version__
+    }
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=10)
+        if commit.returncode == 0:
+            environment["commit"] = commit.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return environment
+
+
+def saveResults(results, fileName):
+    with open(fileName, "w") as resultFile:
+        json.dump(results, resultFile, indent=2, sort_keys=True)
+
+
+def loadResults(fileName):
+    with open(fileName) as resultFile:
+        return json.load(resultFile)
+
+
+#value of a dotted metric name such as "frameTime.p95", or None
+def getMetric(result, metricName):
+    value = result
+    for key in metricName.split("."):
+        if not isinstance(value, dict) or key not in value.keys():
+            return None
+        value = value[key]
+    return value
+
+
+#compare the entries of two result files ({"results": {name: result}});
+#every metric is "lower is better". Timings regress when they grow by
+#more than tolerance (a fraction) and more than minimumChange, counts
+#(names in exactMetrics) regress on any increase.
+#returns a list of (name, metric, baseline value, new value)
+def compareResults(results, baseline, metrics, exactMetrics=[], tolerance=0.1, minimumChange=0):
+    regressions = []
+    for name, result in results["results"].items():
+        if name not in baseline["results"].keys():
+            continue
+        baselineResult = baseline["results"][name]
+        for metricName in metrics + exactMetrics:
+            value = getMetric(result, metricName)
+            baselineValue = getMetric(baselineResult, metricName)
+            if value is None or baselineValue is None:
+                continue
+            if metricName in exactMetrics:
+                regressed = value > baselineValue
+            else:
+                regressed = value > baselineValue * (1 + tolerance) \
+                    and value - baselineValue > minimumChange
+            if regressed:
+                regressions.append((name, metricName, baselineValue, value))
+    return regressions
+
+
+def printRegressions(regressions, stream=sys.stdout):
+    if len(regressions) == 0:
+        print("no regressions", file=stream)
+        return
+    for name, metricName, baselineValue, value in regressions:
+        change = 100 * (value - baselineValue) / baselineValue if baselineValue != 0 else float("inf")
+        print("REGRESSION %-24s %-20s %12.4f -> %12.4f (%+.1f%%)" % (
+            name, metricName, baselineValue, value, change), file=stream)
@@ -0,0 +1,122 @@
+import argparse
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmark.results import (compareResults, getEnvironment, loadResults,
+                               printRegressions, saveResults)
+
+#scene benchmark suite: every workload of benchmark/workloads.py runs
+#headless in its own process (so startup is measured from a cold start)
+#and the results are collected into one JSON file, e.g.
+#  python -m benchmark.runScenes --output baseline.json
+#  python -m benchmark.runScenes --baseline baseline.json --output new.json
+#  python -m benchmark.runScenes boxes-phong --set count=2000 --frames 50
+#the exit status is 1 when a result regressed against the baseline
+
+#timings compared with a tolerance, in milliseconds
+timedMetrics = ["frameTime.p50", "frameTime.p95", "startupTime", "geometryTime"]
+#per frame counts, which must not grow at all
+countedMetrics = ["drawCalls", "uniformUploads", "glCalls"]
+
+#same as in benchmark/sceneBenchmark.py, which cannot be imported here
+#because it selects the headless platform and opens a context
+resultPrefix = "BENCHMARK_RESULT "
+
+
+def runWorkload(name, parameters, frames, warmupFrames, resolution, seed):
+    command = [sys.executable, "-m", "benchmark.sceneBenchmark", name,
+        "--frames", str(frames), "--warmup", str(warmupFrames),
+        "--resolution", str(resolution[0]), str(resolution[1]),
+        "--parameters", json.dumps(parameters), "--seed", str(seed)]
+    environment = dict(os.environ)
+    environment.setdefault("HEADLESS", "egl")
+    process = subprocess.run(command, capture_output=True, text=True, env=environment)
+    for line in process.stdout.splitlines():
+        if line.startswith(resultPrefix):
+            return json.loads(line[len(resultPrefix):])
+    raise Exception("Benchmark " + name + " failed:\n" + process.stdout + process.stderr)
+
+
+#"key=value" with a JSON value (plain strings need no quotes)
+def parseParameter(text):
+    key, value = text.split("=", 1)
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def main():
+    #the workload list is only needed here, without creating a context
+    from benchmark.workloads import workloads
+
+    parser = argparse.ArgumentParser(description="Run the scene benchmark suite")
+    parser.add_argument("workloads", nargs="*", help="workload names (default: all)")
+    parser.add_argument("--list", action="store_true", help="list workloads and exit")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[800, 600])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+        help="override a workload parameter (applies to every selected workload)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+        help="allowed relative slowdown of timings (default 0.1)")
+    args = parser.parse_args()
+
+    if args.list:
+        for name in sorted(workloads.keys()):
+            print("%-22s %s" % (name, json.dumps(workloads[name][1])))
+        return 0
+
+    names = args.workloads if len(args.workloads) > 0 else sorted(workloads.keys())
+    for name in names:
+        if name not in workloads.keys():
+            parser.error("unknown workload: " + name)
+    overrides = dict(parseParameter(text) for text in args.set)
+
+    results = {
+        "environment": getEnvironment(),
+        "settings": {"frames": args.frames, "warmupFrames": args.warmup,
+                    "resolution": args.resolution, "seed": args.seed},
+        "results": {}
+    }
+    print("%-22s %9s %9s %9s %7s %9s %9s" % ("workload (ms)", "p50", "p95", "startup",
+        "draws", "uniforms", "geometry"))
+    for name in names:
+        suiteStart = time.perf_counter()
+        #only parameters the workload's builder accepts
+        builderParameters = inspect.signature(workloads[name][0]).parameters
+        parameters = {key: value for key, value in overrides.items()
+                        if key in builderParameters.keys()}
+        result = runWorkload(name, parameters, args.frames, args.warmup, args.resolution, args.seed)
+        results["results"][name] = result
+        results["environment"]["glRenderer"] = result["glRenderer"]
+        print("%-22s %9.2f %9.2f %9.1f %7d %9d %9.1f   (%.0f s)" % (name,
+            result["frameTime"]["p50"], result["frameTime"]["p95"], result["startupTime"],
+            result["drawCalls"], result["uniformUploads"], result["geometryTime"],
+            time.perf_counter() - suiteStart))
+        sys.stdout.flush()
+
+    if args.output is not None:
+        saveResults(results, args.output)
+
+    if args.baseline is not None:
+        baseline = loadResults(args.baseline)
+        if baseline["environment"].get("glRenderer") != results["environment"].get("glRenderer"):
+            print("warning: baseline was recorded with " + str(baseline["environment"].get("glRenderer")))
+        regressions = compareResults(results, baseline, timedMetrics, countedMetrics,
+            tolerance=args.tolerance, minimumChange=0.5)
+        printRegressions(regressions)
+        if len(regressions) > 0:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import time
+
+#start of the measured startup: imports, context, shaders and geometry
+startTime = time.perf_counter()
+
+import argparse
+import json
+import os
+import random
+import sys
+
+#runs without a window unless HEADLESS is set otherwise;
+#must be selected before core is imported (see core/headless.py)
+os.environ.setdefault("HEADLESS", "egl")
+#the benchmark stops itself after the requested frames
+os.environ["HEADLESS_FRAMES"] = "0"
+os.environ.pop("HEADLESS_OUTPUT", None)
+
+#must come first: selects the OpenGL platform for headless runs
+from core import headless
+
+from OpenGL.GL import *
+
+from benchmark.results import summarize
+from benchmark.workloads import workloads
+from core.base import Base
+from core.camera import Camera
+from core.glCallCounter import GLCallCounter
+from core.mesh import Mesh
+from core.renderer import Renderer
+from core.scene import Scene
+
+#prefix of the line holding the JSON result on standard output
+resultPrefix = "BENCHMARK_RESULT "
+
+
+#renders one workload (see benchmark/workloads.py): a first frame
+#that completes startup, warmupFrames untimed frames, frames timed
+#frames (CPU work and glFinish, i.e. until the GPU is done) and one
+#last frame with GL call counting, which is too slow to be timed
+class SceneBenchmark(Base):
+    def __init__(self, workloadName, parameters={}, frames=200, warmupFrames=20,
+                resolution=[800, 600], seed=1):
+        if workloadName not in workloads.keys():
+            raise Exception("Unknown workload: " + workloadName)
+        self.workloadName = workloadName
+        self.builder, defaultParameters = workloads[workloadName]
+        self.parameters = dict(defaultParameters)
+        self.parameters.update(parameters)
+        self.frames = frames
+        self.warmupFrames = warmupFrames
+        self.resolution = resolution
+        self.seed = seed
+        super().__init__(screenSize=resolution, frameRateLimit=0)
+
+    #construct geometry with factory(), adding its duration to geometryTime
+    def createGeometry(self, factory):
+        geometryStart = time.perf_counter()
+        geometry = factory()
+        self.geometryTime += time.perf_counter() - geometryStart
+        return geometry
+
+    def initialize(self):
+        buildStart = time.perf_counter()
+        self.renderer = Renderer(clearColor=[0.1, 0.1, 0.15])
+        self.camera = Camera(aspectRatio=self.resolution[0]/self.resolution[1])
+        self.camera.setPosition([0, 0, 16])
+        self.scene = Scene()
+        self.scene.add(self.camera)
+        #filled in by the workload builder
+        self.animated = []
+        self.postprocessor = None
+        self.random = random.Random(self.seed)
+        self.geometryTime = 0
+        self.builder(self, **self.parameters)
+        self.buildTime = time.perf_counter() - buildStart
+
+        self.frameNumber = 0
+        self.frameTimes = []
+        self.startupTime = None
+        self.callCounter = GLCallCounter()
+        self.glRenderer = glGetString(GL_RENDERER).decode()
+
+    def update(self):
+        countFrame = self.frameNumber == 1 + self.warmupFrames + self.frames
+        if countFrame:
+            self.callCounter.install()
+
+        frameStart = time.perf_counter()
+        for object3D in self.animated:
+            object3D.rotateY(0.01)
+        if self.postprocessor is not None:
+            self.postprocessor.render()
+        else:
+            self.renderer.render(self.scene, self.camera)
+        glFinish()
+        frameEnd = time.perf_counter()
+
+        if self.frameNumber == 0:
+            self.startupTime = frameEnd - startTime
+        elif self.frameNumber > self.warmupFrames and not countFrame:
+            self.frameTimes.append(frameEnd - frameStart)
+        elif countFrame:
+            self.callCounter.endFrame()
+            self.callCounter.uninstall()
+            self.running = False
+        self.frameNumber += 1
+
+    def getResult(self):
+        frame = self.callCounter.getFrame()
+        calls = frame["calls"]
+        countCalls = lambda prefix: sum(count for name, count in calls.items() if name.startswith(prefix))
+        meshCount = len(self.scene.getDescendantsOfType(Mesh))
+        return {
+            "workload": self.workloadName,
+            "parameters": self.parameters,
+            "resolution": list(self.resolution),
+            "frames": self.frames,
+            "warmupFrames": self.warmupFrames,
+            "meshes": meshCount,
+            #milliseconds
+            "frameTime": summarize(self.frameTimes, 1000),
+            "startupTime": self.startupTime * 1000,
+            "buildTime": self.buildTime * 1000,
+            "geometryTime": self.geometryTime * 1000,
+            #per frame, from the counted frame
+            "drawCalls": countCalls("glDraw"),
+            "uniformUploads": countCalls("glUniform"),
+            "glCalls": sum(calls.values()),
+            "redundantCalls": sum(frame["redundantCalls"].values()),
+            "passes": len(frame["passes"]),
+            "glRenderer": self.glRenderer
+        }
+
+    def run(self):
+        try:
+            super().run()
+        except SystemExit:
+            pass
+
+
+#run a single workload in this process and print its result;
+#benchmark/runScenes.py starts one process per workload
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one scene benchmark workload")
+    parser.add_argument("workload", choices=sorted(workloads.keys()))
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--resolution", type=int, nargs=2, default=[800, 600])
+    parser.add_argument("--parameters", default="{}", help="JSON object of workload parameters")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    benchmark = SceneBenchmark(args.workload, json.loads(args.parameters), args.frames,
+        args.warmup, args.resolution, args.seed)
+    benchmark.run()
+    print(resultPrefix + json.dumps(benchmark.getResult()))
+    sys.stdout.flush()
@@ -0,0 +1,209 @@
+from math import pi
+
+from core.group import Group
+from core.mesh import Mesh
+from effects.additiveBlendEffect import AdditiveBlendEffect
+from effects.brightFilterEffect import BrightFilterEffect
+from effects.colorReduceEffect import ColorReducerEffect
+from effects.horizontalBlurEffect import HorizontalBlurEffect
+from effects.invertEffect import InvertEffect
+from effects.pixelateEffect import PixelateEffect
+from effects.tintEffect import TintEffect
+from effects.verticalBlurEffect import VerticalBlurEffect
+from effects.vignetteEffect import VignetteEffect
+from extras.lightBaker import LightBaker
+from extras.postprocessor import Postprocessor
+from geometry.boxGeometry import BoxGeometry
+from geometry.planeGeometry import PlaneGeometry
+from geometry.sphereGeometry import SphereGeometry
+from light.ambientLight import AmbientLight
+from light.directionalLight import DirectionalLight
+from light.light import Light
+from light.lightProbes import LightProbeGrid
+from light.pointLight import PointLight
+from material.lambertMaterial import LambertMaterial
+from material.phongMaterial import PhongMaterial
+from material.surfaceMaterial import SurfaceMaterial
+
+#synthetic scenes for benchmark/sceneBenchmark.py. Every builder gets
+#the benchmark (scene, camera, renderer, seeded random generator) and
+#keyword parameters, adds objects to benchmark.scene and lists the
+#objects to rotate every frame in benchmark.animated. Geometry must be
+#created through benchmark.createGeometry, which times construction.
+
+
+def createMaterial(benchmark, materialName):
+    color = [benchmark.random.uniform(0.2, 1) for n in range(3)]
+    if materialName == "surface":
+        return SurfaceMaterial({"useVertexColors": True})
+    elif materialName == "lambert":
+        return LambertMaterial(properties={"baseColor": color})
+    elif materialName == "phong":
+        return PhongMaterial(properties={"baseColor": color})
+    elif materialName == "lambert-clustered":
+        return LambertMaterial(properties={"baseColor": color}, clustered=True)
+    elif materialName == "phong-clustered":
+        return PhongMaterial(properties={"baseColor": color}, clustered=True)
+    elif materialName == "phong-probes":
+        return PhongMaterial(properties={"baseColor": color}, probes=True)
+    elif materialName == "phong-vertex":
+        return PhongMaterial(properties={"baseColor": color}, lighting="vertex")
+    elif materialName == "phong-auto":
+        return PhongMaterial(properties={"baseColor": color}, lighting="auto")
+    else:
+        raise Exception("Unknown benchmark material: " + materialName)
+
+
+#meshes placed randomly inside a cube in front of the camera
+def addMeshes(benchmark, geometryFactory, count, materialName, uniqueGeometry, spread):
+    geometry = None
+    for n in range(count):
+        if geometry is None or uniqueGeometry:
+            geometry = benchmark.createGeometry(geometryFactory)
+        mesh = Mesh(geometry, createMaterial(benchmark, materialName))
+        mesh.setPosition([benchmark.random.uniform(-spread, spread) for n in range(3)])
+        mesh.rotateY(benchmark.random.uniform(0, 2*pi))
+        benchmark.scene.add(mesh)
+        benchmark.animated.append(mesh)
+
+
+def addDefaultLights(benchmark):
+    benchmark.scene.add(AmbientLight(color=[0.2, 0.2, 0.2]))
+    benchmark.scene.add(DirectionalLight(color=[0.8, 0.8, 0.8], direction=[-1, -1, -2]))
+
+
+def buildBoxes(benchmark, count=1000, material="surface", uniqueGeometry=False, spread=8):
+    addDefaultLights(benchmark)
+    addMeshes(benchmark, lambda: BoxGeometry(0.5, 0.5, 0.5), count, material, uniqueGeometry, spread)
+
+
+def buildSpheres(benchmark, count=200, material="phong", segments=32, uniqueGeometry=False, spread=8):
+    addDefaultLights(benchmark)
+    addMeshes(benchmark, lambda: SphereGeometry(0.3, segments, segments // 2),
+        count, material, uniqueGeometry, spread)
+
+
+#static lambert boxes whose light is baked (extras/lightBaker.py) into
+#vertex colors, or into lightmaps of lightMapSize
+def buildBaked(benchmark, count=500, lightMapSize=None, shadows=False):
+    buildBoxes(benchmark, count=count, material="lambert")
+    benchmark.animated.clear()
+    lights = benchmark.scene.getDescendantsOfType(Light)
+    baker = LightBaker(lights, shadows=shadows)
+    baker.bake(benchmark.scene.getDescendantsOfType(Mesh), lightMapSize)
+
+
+#groups nested depth levels deep, each with breadth child groups and
+#one box; the whole tree is rotated at the root, so every world
+#matrix changes every frame
+def buildHierarchy(benchmark, depth=50, breadth=1, material="surface"):
+    addDefaultLights(benchmark)
+    geometry = benchmark.createGeometry(lambda: BoxGeometry(0.2, 0.2, 0.2))
+    root = Group()
+    benchmark.scene.add(root)
+    benchmark.animated.append(root)
+    level = [root]
+    for levelNumber in range(depth):
+        nextLevel = []
+        for parent in level:
+            mesh = Mesh(geometry, createMaterial(benchmark, material))
+            parent.add(mesh)
+            for n in range(breadth):
+                group = Group()
+                group.setPosition([benchmark.random.uniform(-0.5, 0.5), 0.25, 0])
+                group.rotateY(benchmark.random.uniform(0, 2*pi))
+                parent.add(group)
+                nextLevel.append(group)
+        level = nextLevel
+
+
+#lit spheres with count point lights circling among them; materials
+#with light0..light3 only see the 4 brightest lights reaching each
+#sphere, clustered materials and deferred shading see all of them.
+#probes captures the lights' initial positions in a light probe grid
+def buildLights(benchmark, count=4, spheres=100, material="phong", segments=16, spread=6,
+                attenuation=[1, 0, 0.1], deferred=False, probes=False):
+    if deferred:
+        benchmark.renderer.enableDeferredShading()
+    benchmark.scene.add(AmbientLight(color=[0.1, 0.1, 0.1]))
+    addMeshes(benchmark, lambda: SphereGeometry(0.3, segments, segments // 2),
+        spheres, material, False, spread)
+    pivot = Group()
+    benchmark.scene.add(pivot)
+    benchmark.animated.append(pivot)
+    for n in range(count):
+        color = [benchmark.random.uniform(0.3, 1) for n in range(3)]
+        position = [benchmark.random.uniform(-spread, spread) for n in range(3)]
+        pivot.add(PointLight(color=color, position=position, attenuation=attenuation))
+    if probes:
+        grid = LightProbeGrid([-spread] * 3, [spread] * 3, [8, 8, 8])
+        grid.addLights(benchmark.scene.getDescendantsOfType(Light))
+        benchmark.renderer.lightProbes = grid
+
+
+#layers screen filling planes facing the camera, added back to front
+#so that every layer covers the previous ones: each pixel is shaded
+#layers times without a depth pre-pass and once with it
+def buildOverdraw(benchmark, layers=8, material="phong", lights=4, depthPrepass=False):
+    benchmark.renderer.depthPrepass = depthPrepass
+    benchmark.scene.add(AmbientLight(color=[0.1, 0.1, 0.1]))
+    for n in range(lights - 1):
+        position = [benchmark.random.uniform(-8, 8), benchmark.random.uniform(-6, 6), 4]
+        benchmark.scene.add(PointLight(color=[0.5, 0.5, 0.5], position=position))
+    geometry = benchmark.createGeometry(lambda: PlaneGeometry(40, 30, 1, 1))
+    for n in range(layers):
+        mesh = Mesh(geometry, createMaterial(benchmark, material))
+        mesh.setPosition([0, 0, -layers + n])
+        benchmark.scene.add(mesh)
+
+
+#boxes rendered through a chain of post-processing effects
+#("bloom" | "stylize")
+def buildPostprocess(benchmark, count=200, chain="bloom"):
+    buildBoxes(benchmark, count=count)
+    resolution = list(benchmark.renderer.windowSize)
+    postprocessor = Postprocessor(benchmark.renderer, benchmark.scene, benchmark.camera)
+    if chain == "bloom":
+        postprocessor.addEffect(BrightFilterEffect(threshold=1.2))
+        postprocessor.addEffect(HorizontalBlurEffect(textureSize=resolution, blurRadius=20))
+        postprocessor.addEffect(VerticalBlurEffect(textureSize=resolution, blurRadius=20))
+        mainScene = postprocessor.renderTargetList[0].texture
+        postprocessor.addEffect(AdditiveBlendEffect(mainScene, originalStrength=1, blendStrength=1))
+    elif chain == "stylize":
+        postprocessor.addEffect(TintEffect(tintColor=[1, 0.8, 0.6]))
+        postprocessor.addEffect(ColorReducerEffect(levels=6))
+        postprocessor.addEffect(PixelateEffect(pixelSize=2, resolution=resolution))
+        postprocessor.addEffect(VignetteEffect())
+        postprocessor.addEffect(InvertEffect())
+    else:
+        raise Exception("Unknown post-processing chain: " + chain)
+    benchmark.postprocessor = postprocessor
+
+
+#name: (builder, default parameters)
+workloads = {
+    "boxes-surface": (buildBoxes, {"count": 1000, "material": "surface"}),
+    "boxes-phong": (buildBoxes, {"count": 500, "material": "phong"}),
+    "spheres-phong": (buildSpheres, {"count": 200, "material": "phong", "segments": 32}),
+    #per vertex lighting for the spheres that are small on screen
+    "spheres-auto": (buildSpheres, {"count": 200, "material": "phong-auto", "segments": 32}),
+    "spheres-vertex": (buildSpheres, {"count": 200, "material": "phong-vertex", "segments": 32}),
+    "spheres-unique": (buildSpheres, {"count": 50, "material": "lambert", "segments": 32,
+                        "uniqueGeometry": True}),
+    "boxes-baked": (buildBaked, {"count": 500}),
+    "boxes-lightmap": (buildBaked, {"count": 500, "lightMapSize": 64, "shadows": True}),
+    "hierarchy-deep": (buildHierarchy, {"depth": 200, "breadth": 1}),
+    "hierarchy-wide": (buildHierarchy, {"depth": 4, "breadth": 6}),
+    "lights": (buildLights, {"count": 4, "spheres": 100}),
+    #short range lights, so that each cluster holds only a few
+    "lights-clustered": (buildLights, {"count": 256, "spheres": 400, "material": "phong-clustered",
+                        "spread": 16, "attenuation": [1, 0, 8]}),
+    "lights-deferred": (buildLights, {"count": 256, "spheres": 400, "material": "phong",
+                        "spread": 16, "attenuation": [1, 0, 8], "deferred": True}),
+    "lights-probes": (buildLights, {"count": 256, "spheres": 400, "material": "phong-probes",
+                        "spread": 16, "attenuation": [1, 0, 8], "probes": True}),
+    "overdraw": (buildOverdraw, {"layers": 8, "depthPrepass": False}),
+    "overdraw-prepass": (buildOverdraw, {"layers": 8, "depthPrepass": True}),
+    "postprocess-bloom": (buildPostprocess, {"count": 200, "chain": "bloom"}),
+    "postprocess-stylize": (buildPostprocess, {"count": 200, "chain": "stylize"}),
+}
@@ -0,0 +1,39 @@
+from OpenGL.GL import *
+
+from core.texture import Texture
+
+
+#depth only render target whose storage is a texture array with one
+#layer per render pass (e.g. shadow map cascades); the scene is
+#rendered into a layer after selectLayer(layer)
+class ArrayRenderTarget(object):
+    def __init__(self, resolution=[512,512], layers=4):
+        self.width, self.height = resolution
+        self.layers = layers
+
+        #compared against a reference depth by sampler2DArrayShadow
+        self.texture = Texture(None,
+        {
+            "magFilter":GL_LINEAR,
+            "minFilter":GL_LINEAR,
+            "wrap":GL_CLAMP_TO_BORDER,
+            "compare":True
+        })
+        self.texture.allocateArrayData(self.width, self.height, layers, GL_DEPTH_COMPONENT24)
+
+        self.framebufferRef = glGenFramebuffers(1)
+        self.drawFramebufferRef = self.framebufferRef
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+        glDrawBuffer(GL_NONE)
+        glReadBuffer(GL_NONE)
+        self.selectLayer(0)
+        if(glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE):
+            raise Exception("Framebuffer status error!")
+
+    #attach one layer; the framebuffer must be bound
+    def selectLayer(self, layer):
+        glFramebufferTextureLayer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.texture.textureRef, 0, layer)
+
+    #nothing to resolve; lets the renderer treat this like a RenderTarget
+    def resolve(self):
+        pass
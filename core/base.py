@@ -1,4 +1,9 @@
 import sys
+import time
+
+#must come first: selects the OpenGL platform for headless runs
+from core import headless
+from core.headless import HeadlessContext
 
 import pygame
 from pygame import display
@@ -7,25 +12,33 @@ from core.input import Input
 
 
 class Base(object):
-    def __init__(self, screenSize=[512,512]):
+    def __init__(self, screenSize=[512,512], fixedTimeStep=None, maxSubSteps=5,
+                frameRateLimit=60, vsync=False):
         #initilize all pygame modules
         pygame.init()
-        #indicate rendering details
-        displayFlags = pygame.DOUBLEBUF | pygame.OPENGL | pygame.RESIZABLE
-        #initlize buffers to perform antialiasing
-        pygame.display.gl_set_attribute(
-            pygame.GL_MULTISAMPLEBUFFERS, 1)
-        pygame.display.gl_set_attribute(
-            pygame.GL_MULTISAMPLESAMPLES, 4)
-        #use a core opengl profile for cross-plataform compatibility
-        pygame.display.gl_set_attribute(
-            pygame.GL_CONTEXT_PROFILE_MASK,
-            pygame.GL_CONTEXT_PROFILE_CORE)
-        #create and display the window
-        self.screen = pygame.display.set_mode(
-            screenSize, displayFlags)
-        #set the text that appears in the title bar of window
-        pygame.display.set_caption("Caipora Window")
+        #without a display, render offscreen (see core/headless.py);
+        #demos run unchanged, e.g. HEADLESS=egl python demo.py
+        self.headless = None
+        if headless.backend != "":
+            self.screen = None
+            self.headless = HeadlessContext.fromEnvironment(screenSize)
+        else:
+            #indicate rendering details
+            displayFlags = pygame.DOUBLEBUF | pygame.OPENGL | pygame.RESIZABLE
+            #initlize buffers to perform antialiasing
+            pygame.display.gl_set_attribute(
+                pygame.GL_MULTISAMPLEBUFFERS, 1)
+            pygame.display.gl_set_attribute(
+                pygame.GL_MULTISAMPLESAMPLES, 4)
+            #use a core opengl profile for cross-plataform compatibility
+            pygame.display.gl_set_attribute(
+                pygame.GL_CONTEXT_PROFILE_MASK,
+                pygame.GL_CONTEXT_PROFILE_CORE)
+            #create and display the window
+            self.screen = pygame.display.set_mode(
+                screenSize, displayFlags, vsync=1 if vsync else 0)
+            #set the text that appears in the title bar of window
+            pygame.display.set_caption("Caipora Window")
         #determine if main loop is active
         self.running = True
         #manage time related data and operations
@@ -35,6 +48,29 @@ class Base(object):
         #number of seconds application has been running
         self.time = 0
 
+        #optional fixed time step loop (seconds per simulation step);
+        #fixedUpdate runs at this rate, update runs once per frame
+        self.fixedTimeStep = fixedTimeStep
+        #catch-up limit per frame; time beyond it is dropped so a slow
+        #frame cannot start a spiral of ever longer frames
+        self.maxSubSteps = maxSubSteps
+        #unsimulated time and its fraction of a step; update can use
+        #interpolationAlpha to blend between the last two steps
+        self.accumulator = 0
+        self.interpolationAlpha = 0
+        #simulation steps run during the last frame
+        self.subSteps = 0
+        #frames per second cap for the window; 0 for uncapped
+        #(combine with vsync=True to only wait for the display)
+        self.frameRateLimit = frameRateLimit
+        #seconds spent in each phase of the last frame, for profiling
+        self.frameTimings = {"input":0, "simulation":0, "update":0, "present":0}
+        #optional core.profiler.Profiler; when set, every frame is a
+        #profiler frame (share it with the renderer to see render passes)
+        self.profiler = None
+        #optional core.glCallCounter.GLCallCounter; frames end with the loop
+        self.glCallCounter = None
+
         #implemented by extending classes
     def initialize(self):
         pass
@@ -42,30 +78,108 @@ class Base(object):
     #implement by extending class
     def update(self):
         pass
+
+    #implement by extending class when using fixedTimeStep;
+    #deltaTime is always equal to fixedTimeStep
+    def fixedUpdate(self, deltaTime):
+        pass
+
+    #seconds since the previous frame
+    def getFrameTime(self):
+        if self.headless is not None and self.headless.frameRate > 0:
+            #fixed time step: identical results on every run
+            return 1 / self.headless.frameRate
+        if self.headless is None and self.fixedTimeStep is None:
+            #time measured by the frame limiter on the previous frame
+            return self.clock.get_time() / 1000
+        #measured time of the previous frame
+        currentTime = time.perf_counter()
+        frameTime = currentTime - self.lastFrameTime
+        self.lastFrameTime = currentTime
+        return frameTime
+
+    #run as many fixed simulation steps as the elapsed time allows
+    def runFixedSteps(self, frameTime):
+        self.accumulator += frameTime
+        self.subSteps = 0
+        while self.accumulator >= self.fixedTimeStep and self.subSteps < self.maxSubSteps:
+            self.fixedUpdate(self.fixedTimeStep)
+            self.time += self.fixedTimeStep
+            self.accumulator -= self.fixedTimeStep
+            self.subSteps += 1
+        #too far behind: drop whole steps that could not be simulated
+        if self.accumulator >= self.fixedTimeStep:
+            self.accumulator = self.accumulator % self.fixedTimeStep
+        self.interpolationAlpha = self.accumulator / self.fixedTimeStep
+
+    #show the frame (or finish it, when headless)
+    def present(self):
+        if self.headless is None:
+            #render - render image on screen
+            pygame.display.flip()
+
+            #pause if necessary to achieve the frame rate limit
+            self.clock.tick(self.frameRateLimit)
+        elif not self.headless.endFrame():
+            #requested number of frames rendered
+            self.running = False
     
     def run(self):
         #startup
         self.initialize()
 
+        #reference time for measured frames
+        self.lastFrameTime = time.perf_counter()
+
         #main loop
         while self.running:
-            #process input 
-            self.input.update()
-            if self.input.quit:
-                self.running = False
+            if self.profiler is not None:
+                self.profiler.beginFrame()
+            phaseStart = time.perf_counter()
+            if self.headless is None:
+                #process input 
+                self.input.update()
+                if self.input.quit:
+                    self.running = False
             #seconds since iteration of run loop
-            self.deltaTime = self.clock.get_time() / 1000
-            #increment time application has been running
-            self.time += self.deltaTime
+            self.deltaTime = self.getFrameTime()
+            inputEnd = time.perf_counter()
+
+            if self.fixedTimeStep is None:
+                #increment time application has been running
+                self.time += self.deltaTime
+            else:
+                self.runFixedSteps(self.deltaTime)
+            simulationEnd = time.perf_counter()
+
+            #headless: draw into the offscreen target
+            if self.headless is not None:
+                self.headless.beginFrame()
 
             #update
+            if self.profiler is not None:
+                self.profiler.begin("update")
             self.update()
+            if self.profiler is not None:
+                self.profiler.end()
+            updateEnd = time.perf_counter()
 
-            #render - render image on screen
-            pygame.display.flip()
+            self.present()
+            presentEnd = time.perf_counter()
 
-            #pause if necessary to achieve 60 FPS
-            self.clock.tick(60)
+            self.frameTimings["input"] = inputEnd - phaseStart
+            self.frameTimings["simulation"] = simulationEnd - inputEnd
+            self.frameTimings["update"] = updateEnd - simulationEnd
+            self.frameTimings["present"] = presentEnd - updateEnd
+            if self.profiler is not None:
+                self.profiler.addTime("input", self.frameTimings["input"], phaseStart)
+                self.profiler.addTime("simulation", self.frameTimings["simulation"], inputEnd)
+                self.profiler.addTime("present", self.frameTimings["present"], updateEnd)
+                self.profiler.endFrame()
+            if self.glCallCounter is not None:
+                self.glCallCounter.endFrame()
         #shutdown
+        if self.headless is not None:
+            self.headless.close()
         pygame.quit()
         sys.exit()
@@ -1,24 +1,27 @@
 from numpy.linalg import inv
 
-from core.matrix import Matrix
+from core.matrix import Matrix, uploadType
 from core.object3D import Object3D
 
 
 class Camera(Object3D):
     def __init__(self, angleOfView=60, aspectRatio=1, near=0.1, far=1000):
         super().__init__()
+        #float32, as they are uploaded for every draw (see core/matrix.py)
         self.projectionMatrix = Matrix.makePerspective(
-            angleOfView, aspectRatio, near, far)
-        self.viewMatrix = Matrix.makeIdentity()
+            angleOfView, aspectRatio, near, far, out=Matrix.makeUploadIdentity())
+        self.viewMatrix = Matrix.makeUploadIdentity()
     
 
     def updateViewMatrix(self):
-        self.viewMatrix = inv(self.getWorldMatrix())
+        self.viewMatrix = inv(self.getWorldMatrix()).astype(uploadType)
 
     
     def setPerspective(self, angleOfView=50, aspectRatio=1, near=0.1, far=1000):
-        self.projectionMatrix = Matrix.makePerspective(angleOfView, aspectRatio, near, far)
+        self.projectionMatrix = Matrix.makePerspective(angleOfView, aspectRatio, near, far,
+                                                       out=Matrix.makeUploadIdentity())
 
     
     def setOrthographic(self, left=-1, right=1, bottom=-1, top=1, near=-1, far=1):
-        self.projectionMatrix = Matrix.makeOrthographic(left, right, bottom, top, near, far)
+        self.projectionMatrix = Matrix.makeOrthographic(left, right, bottom, top, near, far,
+                                                        out=Matrix.makeUploadIdentity())
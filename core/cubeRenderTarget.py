@@ -0,0 +1,60 @@
+from OpenGL.GL import *
+
+from core.texture import Texture
+
+
+#render target whose color (or depth) storage is a cube map texture;
+#the scene is rendered once per face after selectFace(face), with
+#faces in the order +x, -x, +y, -y, +z, -z
+class CubeRenderTarget(object):
+    def __init__(self, size=256, internalFormat=GL_RGBA8, depthTexture=False):
+        #faces are square
+        self.width = self.height = size
+        self.internalFormat = internalFormat
+
+        #depthTexture: depth is stored in the cube map (self.texture),
+        #compared against a reference depth by samplerCubeShadow;
+        #otherwise colors are stored and depth uses a renderbuffer
+        self.depthTexture = depthTexture
+        if depthTexture:
+            self.texture = Texture(None,
+            {
+                "magFilter":GL_LINEAR,
+                "minFilter":GL_LINEAR,
+                "wrap":GL_CLAMP_TO_EDGE,
+                "compare":True
+            })
+            self.texture.allocateCubeData(size, GL_DEPTH_COMPONENT24)
+        else:
+            self.texture = Texture(None,
+            {
+                "magFilter":GL_LINEAR,
+                "minFilter":GL_LINEAR,
+                "wrap":GL_CLAMP_TO_EDGE
+            })
+            self.texture.allocateCubeData(size, internalFormat)
+
+        self.framebufferRef = glGenFramebuffers(1)
+        self.drawFramebufferRef = self.framebufferRef
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+        if depthTexture:
+            glDrawBuffer(GL_NONE)
+            glReadBuffer(GL_NONE)
+        else:
+            self.depthBufferRef = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depthBufferRef)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, size, size)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depthBufferRef)
+        self.selectFace(0)
+        if(glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE):
+            raise Exception("Framebuffer status error!")
+
+    #attach one face; the framebuffer must be bound
+    def selectFace(self, face):
+        attachment = GL_DEPTH_ATTACHMENT if self.depthTexture else GL_COLOR_ATTACHMENT0
+        glFramebufferTexture2D(GL_FRAMEBUFFER, attachment,
+            GL_TEXTURE_CUBE_MAP_POSITIVE_X + face, self.texture.textureRef, 0)
+
+    #nothing to resolve; lets the renderer treat this like a RenderTarget
+    def resolve(self):
+        pass
@@ -0,0 +1,193 @@
+from OpenGL.GL import *
+
+from core.gBuffer import GBuffer
+from core.matrix import Matrix
+from core.mesh import Mesh
+from core.renderState import RenderState
+from effects.templateEffect import TemplateEffect
+from geometry.geometry import Geometry
+from geometry.sphereGeometry import SphereGeometry
+from material.deferredLightMaterial import DeferredLightMaterial
+from material.gBufferMaterial import GBufferMaterial
+
+
+#deferred shading mode of Renderer (see Renderer.enableDeferredShading):
+#lit meshes (materials with lights, e.g. Lambert and Phong) are drawn
+#once into the G-buffer, then each light shades only the pixels it
+#reaches, so the cost of lighting depends on the number of pixels and
+#lights instead of on overdraw; scenes may hold any number of lights.
+#Other meshes (unlit or transparent materials) are drawn forward after
+#lighting, tested against the G-buffer depth. The result is copied to
+#the render target, so the G-buffer textures stay available to
+#post-processing effects (renderer.deferredShading.gBuffer).
+#Bump textures and per-material useShadow are not used: every lit mesh
+#with receiveShadow gets the shadows of the lights that have one
+class DeferredShading(object):
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.gBuffer = GBuffer(renderer.windowSize)
+        self.geometryMaterial = GBufferMaterial()
+        self.lightMaterial = DeferredLightMaterial(self.gBuffer)
+
+        #rectangle covering clip space, for full screen passes
+        rectangleGeo = Geometry()
+        p0, p1, p2, p3 = [-1,-1], [1,-1], [-1,1], [1,1]
+        t0, t1, t2, t3 = [0,0], [1,0], [0,1], [1,1]
+        rectangleGeo.addAttribute("vec2", "vertexPosition", [p0,p1,p3, p0,p3,p2])
+        rectangleGeo.addAttribute("vec2", "vertexUV", [t0,t1,t3, t0,t3,t2])
+        rectangleGeo.countVertices()
+        self.screenMesh = Mesh(rectangleGeo, self.lightMaterial)
+        #unit sphere scaled to the range of point lights; its polygons
+        #lie inside the sphere, hence the larger scale
+        self.volumeMesh = Mesh(SphereGeometry(1, 16, 8), self.lightMaterial)
+        self.volumeScale = 1.1
+        self.volumeMatrix = Matrix.makeIdentity()
+
+        #copies lightTexture to the render target
+        copyEffect = TemplateEffect()
+        copyEffect.uniforms["texture"].data = [self.gBuffer.lightTexture.textureRef, 1]
+        copyEffect.setProperties({"blending": False, "depthTest": False, "depthWrite": False})
+        self.copyMesh = Mesh(rectangleGeo, copyEffect)
+        #whether each program reads vertex normals, by program reference
+        self.usesNormals = {}
+
+    #lit meshes with vertex normals are shaded from the G-buffer (not
+    #e.g. FlatMaterial, which lights face normals per vertex, nor
+    #reflective materials, whose reflections it cannot store)
+    def isDeferred(self, mesh):
+        uniforms = mesh.material.uniforms
+        if "light0" not in uniforms and "lightData" not in uniforms:
+            return False
+        if "environmentMap" in uniforms:
+            return False
+        programRef = mesh.material.programRef
+        if programRef not in self.usesNormals:
+            self.usesNormals[programRef] = glGetAttribLocation(programRef, "vertexNormal") != -1
+        return self.usesNormals[programRef]
+
+    def hasDeferredMeshes(self, meshList):
+        for mesh in meshList:
+            if mesh.visible and self.isDeferred(mesh):
+                return True
+        return False
+
+    #skyboxes are drawn with the forward meshes (see
+    #Renderer.drawWithSkyboxes), before the lit scene is copied
+    def render(self, meshList, sceneLights, shadowData, camera, renderTarget, skyboxes=[]):
+        renderer = self.renderer
+        profiler = renderer.profiler
+        if renderTarget is None:
+            resolution = renderer.windowSize
+        else:
+            resolution = (renderTarget.width, renderTarget.height)
+        if (self.gBuffer.width, self.gBuffer.height) != tuple(resolution):
+            self.gBuffer.resize(resolution)
+
+        visible = [mesh for mesh in meshList if mesh.visible]
+        if profiler is not None:
+            profiler.begin("geometry", gpu=True)
+        self.gBuffer.beginGeometryPass()
+        self.drawGeometry([mesh for mesh in visible if self.isDeferred(mesh)], camera)
+        if profiler is not None:
+            profiler.end()
+            profiler.begin("lighting", gpu=True)
+        self.gBuffer.beginLightPass()
+        self.drawLights(sceneLights, shadowData, camera)
+        if profiler is not None:
+            profiler.end()
+            profiler.begin("forward", gpu=True)
+        renderer.drawWithSkyboxes([mesh for mesh in visible if not self.isDeferred(mesh)],
+            skyboxes, camera, sceneLights, shadowData)
+        if profiler is not None:
+            profiler.end()
+
+        #copy the lit scene to the render target
+        if renderTarget is None:
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        else:
+            glBindFramebuffer(GL_FRAMEBUFFER, renderTarget.drawFramebufferRef)
+        glViewport(0, 0, resolution[0], resolution[1])
+        self.drawScreen(self.copyMesh)
+
+    def drawGeometry(self, meshList, camera):
+        renderState = RenderState.getCurrent()
+        material = self.geometryMaterial
+        uniforms = material.uniforms
+        renderState.useProgram(material.programRef)
+        uniforms["viewMatrix"].data = camera.viewMatrix
+        uniforms["projectionMatrix"].data = camera.projectionMatrix
+        for mesh in meshList:
+            meshUniforms = mesh.material.uniforms
+            uniforms["modelMatrix"].data = mesh.getModelMatrix()
+            uniforms["baseColor"].data = meshUniforms["baseColor"].data
+            uniforms["useTexture"].data = meshUniforms["useTexture"].data
+            if meshUniforms["useTexture"].data:
+                uniforms["texture"].data = meshUniforms["texture"].data
+            #materials without specular light (e.g. Lambert)
+            if "specularStrength" in meshUniforms.keys():
+                uniforms["specularStrength"].data = meshUniforms["specularStrength"].data
+                uniforms["shininess"].data = meshUniforms["shininess"].data
+            else:
+                uniforms["specularStrength"].data = 0
+            uniforms["receiveShadow"].data = mesh.receiveShadow
+            for variableName, uniformObject in uniforms.items():
+                uniformObject.uploadData()
+            #culling, wireframe and line width of the mesh's material
+            mesh.material.updateRenderSettings()
+            material.updateRenderSettings()
+            renderState.bindVertexArray(mesh.vaoRef)
+            glDrawArrays(mesh.material.settings["drawStyle"], 0, mesh.geometry.vertexCount)
+
+    def drawLights(self, lights, shadowData, camera):
+        renderState = RenderState.getCurrent()
+        material = self.lightMaterial
+        uniforms = material.uniforms
+        renderState.useProgram(material.programRef)
+        material.updateRenderSettings()
+        renderState.setPolygonMode(GL_FILL)
+        uniforms["viewMatrix"].data = camera.viewMatrix
+        uniforms["projectionMatrix"].data = camera.projectionMatrix
+        uniforms["viewPosition"].data = camera.getWorldPosition()
+        uniforms["modelMatrix"].data = self.volumeMatrix
+        for variableName, data in shadowData.items():
+            uniforms[variableName].data = data
+        if "shadowLight" not in shadowData:
+            uniforms["shadowLight"].data = -1
+        if "pointShadowLight" not in shadowData:
+            uniforms["pointShadowLight"].data = -1
+
+        for lightNumber, light in enumerate(lights):
+            uniforms["light"].data = light
+            uniforms["lightNumber"].data = lightNumber
+            lightRange = light.getRadius()
+            if lightRange is None:
+                uniforms["useVolume"].data = False
+                mesh = self.screenMesh
+                renderState.setCapability(GL_CULL_FACE, False)
+            else:
+                uniforms["useVolume"].data = True
+                Matrix.makeScale(lightRange * self.volumeScale, out=self.volumeMatrix)
+                self.volumeMatrix[0:3, 3] = light.getWorldPosition()
+                uniforms["modelMatrix"].data = self.volumeMatrix
+                mesh = self.volumeMesh
+                #back faces cover each pixel inside the sphere once, also
+                #when the camera is inside it
+                renderState.setCapability(GL_CULL_FACE, True)
+                renderState.setCullFace(GL_FRONT)
+            for variableName, uniformObject in uniforms.items():
+                uniformObject.uploadData()
+            renderState.bindVertexArray(mesh.vaoRef)
+            glDrawArrays(GL_TRIANGLES, 0, mesh.geometry.vertexCount)
+        renderState.setCullFace(GL_BACK)
+
+    #draw a full screen rectangle with its own material
+    def drawScreen(self, mesh):
+        renderState = RenderState.getCurrent()
+        renderState.useProgram(mesh.material.programRef)
+        mesh.material.updateRenderSettings()
+        renderState.setCapability(GL_CULL_FACE, False)
+        renderState.setPolygonMode(GL_FILL)
+        for variableName, uniformObject in mesh.material.uniforms.items():
+            uniformObject.uploadData()
+        renderState.bindVertexArray(mesh.vaoRef)
+        glDrawArrays(GL_TRIANGLES, 0, mesh.geometry.vertexCount)
@@ -0,0 +1,148 @@
+import ctypes
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+from OpenGL.GL import *
+from PIL import Image
+
+
+#asynchronous framebuffer readback: glReadPixels writes into one of a
+#ring of pixel pack buffers and returns immediately; each buffer is
+#mapped only after its fence has signaled (or when the ring is full),
+#so the CPU does not wait for the GPU to finish the frame
+class FrameCapture(object):
+    def __init__(self, resolution=[512,512], bufferCount=3, outputFolder=None,
+                fileFormat="png", callback=None, keepFrames=False, workerCount=1):
+        self.width, self.height = int(resolution[0]), int(resolution[1])
+        #bytes per frame (RGBA, 8 bits per channel)
+        self.frameSize = self.width * self.height * 4
+
+        #ring of pixel pack buffers
+        self.bufferCount = bufferCount
+        self.bufferRefs = []
+        for n in range(bufferCount):
+            bufferRef = glGenBuffers(1)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, bufferRef)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.frameSize, None, GL_STREAM_READ)
+            self.bufferRefs.append(bufferRef)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.nextBuffer = 0
+
+        #readbacks still in flight: (bufferIndex, frameNumber, fence)
+        self.pending = deque()
+        self.frameNumber = 0
+
+        #encoded output: "png" | "raw" (packed RGBA bytes) | "npy"
+        if fileFormat not in ["png", "raw", "npy"]:
+            raise Exception("Unknown frame capture format: " + fileFormat)
+        self.outputFolder = outputFolder
+        self.fileFormat = fileFormat
+        if outputFolder is not None:
+            os.makedirs(outputFolder, exist_ok=True)
+        #called with (frameNumber, pixels) on the worker thread
+        self.callback = callback
+        #store completed frames for getFrames()
+        self.keepFrames = keepFrames
+        self.frames = deque()
+
+        #encoding and callbacks run in the background
+        self.executor = ThreadPoolExecutor(max_workers=workerCount)
+        self.futures = deque()
+
+    #start reading the color buffer of a framebuffer;
+    #framebufferRef 0 reads the (single sampled) window back buffer
+    def readFramebuffer(self, framebufferRef, readBuffer=GL_COLOR_ATTACHMENT0):
+        #every buffer is in flight; the oldest one has to be finished
+        if len(self.pending) == self.bufferCount:
+            self.collect(wait=True)
+
+        bufferIndex = self.nextBuffer
+        self.nextBuffer = (self.nextBuffer + 1) % self.bufferCount
+
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, framebufferRef)
+        glReadBuffer(GL_BACK if framebufferRef == 0 else readBuffer)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.bufferRefs[bufferIndex])
+        #with a pack buffer bound, the last argument is an offset into it
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.pending.append((bufferIndex, self.frameNumber, fence))
+        self.frameNumber += 1
+
+        #pick up any earlier frames that are ready by now
+        self.collect(wait=False)
+
+    #map finished buffers; with wait=True the oldest buffer is
+    #collected even if the GPU has to be waited for
+    def collect(self, wait=False):
+        while len(self.pending) > 0:
+            bufferIndex, frameNumber, fence = self.pending[0]
+            timeout = 1000000000 if wait else 0
+            status = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+            if status not in [GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED]:
+                if wait:
+                    raise Exception("Frame capture timed out waiting for the GPU")
+                return
+            self.pending.popleft()
+            glDeleteSync(fence)
+            self.mapBuffer(bufferIndex, frameNumber)
+            #only the oldest frame is forced
+            wait = False
+
+    #copy one finished buffer into a new array and hand it to a worker
+    def mapBuffer(self, bufferIndex, frameNumber):
+        pixels = numpy.empty((self.height, self.width, 4), dtype=numpy.uint8)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.bufferRefs[bufferIndex])
+        address = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, self.frameSize, GL_MAP_READ_BIT)
+        #single copy, straight from mapped memory into the array
+        ctypes.memmove(pixels.ctypes.data, address, self.frameSize)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        #OpenGL rows start at the bottom; flip with a view, not a copy
+        pixels = pixels[::-1]
+        if self.keepFrames:
+            self.frames.append((frameNumber, pixels))
+        if self.outputFolder is not None or self.callback is not None:
+            self.futures.append(self.executor.submit(self.processFrame, frameNumber, pixels))
+            #drop references to finished work
+            while len(self.futures) > 0 and self.futures[0].done():
+                self.futures.popleft().result()
+
+    #runs on a worker thread
+    def processFrame(self, frameNumber, pixels):
+        if self.outputFolder is not None:
+            fileName = os.path.join(self.outputFolder, "frame_%05d.%s" % (frameNumber, self.fileFormat))
+            if self.fileFormat == "png":
+                #alpha written by materials is not meant for display
+                Image.fromarray(pixels[:, :, 0:3], "RGB").save(fileName)
+            elif self.fileFormat == "npy":
+                numpy.save(fileName, pixels)
+            else:
+                with open(fileName, "wb") as rawFile:
+                    rawFile.write(numpy.ascontiguousarray(pixels).data)
+        if self.callback is not None:
+            self.callback(frameNumber, pixels)
+
+    #return list of (frameNumber, pixels) collected so far (keepFrames=True)
+    def getFrames(self):
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+    #wait for every readback and every background job
+    def flush(self):
+        while len(self.pending) > 0:
+            self.collect(wait=True)
+        while len(self.futures) > 0:
+            self.futures.popleft().result()
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
+        glDeleteBuffers(len(self.bufferRefs), self.bufferRefs)
+        self.bufferRefs = []
@@ -0,0 +1,75 @@
+from OpenGL.GL import *
+
+from core.texture import Texture
+
+
+#framebuffer of deferred shading (see core/deferredShading.py): the
+#geometry pass writes the surface of every pixel into the G-buffer
+#textures, the lighting pass adds up the light of each pixel in
+#lightTexture, using the same depth buffer. All textures can be read
+#by post-processing effects, e.g. AdditiveBlendEffect(gBuffer.normalTexture)
+class GBuffer(object):
+    #color attachment number and internal format of each texture
+    layout = [
+        #surface color
+        ("albedoTexture", GL_RGBA8),
+        #world space normal
+        ("normalTexture", GL_RGBA16F),
+        #world space position; w is 1 where a surface was drawn
+        ("positionTexture", GL_RGBA32F),
+        #specular strength, shininess, 1 if shadows are received
+        ("specularTexture", GL_RGBA16F),
+        #accumulated light (lit color of the scene)
+        ("lightTexture", GL_RGBA16F),
+    ]
+    #draw buffers of the geometry pass and of the lighting pass
+    geometryBuffers = [GL_COLOR_ATTACHMENT0, GL_COLOR_ATTACHMENT1, GL_COLOR_ATTACHMENT2, GL_COLOR_ATTACHMENT3]
+    lightBuffers = [GL_COLOR_ATTACHMENT4]
+
+    def __init__(self, resolution=[512,512]):
+        self.width, self.height = resolution
+        #pixels are read with texelFetch; effects sample them 1:1
+        properties = {
+            "magFilter":GL_NEAREST,
+            "minFilter":GL_NEAREST,
+            "wrap":GL_CLAMP_TO_EDGE
+        }
+        for name, internalFormat in GBuffer.layout:
+            setattr(self, name, Texture(None, properties))
+        self.depthTexture = Texture(None, properties)
+        self.allocate()
+
+        self.framebufferRef = glGenFramebuffers(1)
+        self.drawFramebufferRef = self.framebufferRef
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+        for attachment, (name, internalFormat) in enumerate(GBuffer.layout):
+            glFramebufferTexture(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0 + attachment,
+                getattr(self, name).textureRef, 0)
+        glFramebufferTexture(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.depthTexture.textureRef, 0)
+        glDrawBuffers(len(GBuffer.geometryBuffers), GBuffer.geometryBuffers)
+        if(glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE):
+            raise Exception("Framebuffer status error!")
+
+    def allocate(self):
+        for name, internalFormat in GBuffer.layout:
+            getattr(self, name).allocateData(self.width, self.height, internalFormat)
+        self.depthTexture.allocateData(self.width, self.height, GL_DEPTH_COMPONENT24)
+
+    #reallocate all textures at a new resolution
+    def resize(self, resolution):
+        self.width, self.height = resolution
+        self.allocate()
+
+    #draw surfaces into the G-buffer textures, cleared to zero
+    def beginGeometryPass(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+        glViewport(0, 0, self.width, self.height)
+        glDrawBuffers(len(GBuffer.geometryBuffers), GBuffer.geometryBuffers)
+        for drawBuffer in range(len(GBuffer.geometryBuffers)):
+            glClearBufferfv(GL_COLOR, drawBuffer, [0, 0, 0, 0])
+        glClear(GL_DEPTH_BUFFER_BIT)
+
+    #draw into lightTexture, cleared to the clear color
+    def beginLightPass(self):
+        glDrawBuffers(len(GBuffer.lightBuffers), GBuffer.lightBuffers)
+        glClear(GL_COLOR_BUFFER_BIT)
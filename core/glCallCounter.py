@@ -0,0 +1,214 @@
+import sys
+from collections import Counter, deque
+
+import numpy
+import OpenGL.GL
+from OpenGL.GL import *
+
+
+#hashable copy of call arguments, for comparing state values
+def freezeValue(value):
+    if isinstance(value, numpy.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, (list, tuple)):
+        return tuple(freezeValue(item) for item in value)
+    return value
+
+
+#pieces of GL state set by each function, as a list of (key, value);
+#state is a dictionary of the values set so far
+stateFunctions = {
+    "glUseProgram": lambda state, args: [(("program",), args[0])],
+    "glBindVertexArray": lambda state, args: [(("vertexArray",), args[0])],
+    "glEnable": lambda state, args: [(("enabled", args[0]), True)],
+    "glDisable": lambda state, args: [(("enabled", args[0]), False)],
+    "glPolygonMode": lambda state, args: [(("polygonMode", args[0]), args[1])],
+    "glLineWidth": lambda state, args: [(("lineWidth",), args[0])],
+    "glPointSize": lambda state, args: [(("pointSize",), args[0])],
+    "glCullFace": lambda state, args: [(("cullFace",), args[0])],
+    "glBlendFunc": lambda state, args: [(("blendFunc",), tuple(args))],
+    "glBlendEquation": lambda state, args: [(("blendEquation",), args[0])],
+    "glDepthFunc": lambda state, args: [(("depthFunc",), args[0])],
+    "glDepthMask": lambda state, args: [(("depthMask",), bool(args[0]))],
+    "glColorMask": lambda state, args: [(("colorMask",), tuple(bool(arg) for arg in args))],
+    "glPolygonOffset": lambda state, args: [(("polygonOffset",), tuple(args))],
+    "glClearColor": lambda state, args: [(("clearColor",), tuple(args))],
+    "glViewport": lambda state, args: [(("viewport",), tuple(args))],
+    "glActiveTexture": lambda state, args: [(("activeTexture",), args[0])],
+    "glBindTexture": lambda state, args: [
+        (("texture", state.get(("activeTexture",), GL_TEXTURE0), args[0]), args[1])],
+    "glBindBuffer": lambda state, args: [(("buffer", args[0]), args[1])],
+    #GL_FRAMEBUFFER binds both the draw and the read framebuffer
+    "glBindFramebuffer": lambda state, args:
+        [(("framebuffer", target), args[1]) for target in
+            ([GL_DRAW_FRAMEBUFFER, GL_READ_FRAMEBUFFER] if args[0] == GL_FRAMEBUFFER else [args[0]])],
+}
+
+#uniform values belong to the program in use
+def uniformState(state, args):
+    return [(("uniform", state.get(("program",)), args[0]), freezeValue(args[1:]))]
+
+
+#opt-in instrumentation of OpenGL calls: every gl* function imported
+#by the engine's modules is replaced with a wrapper that counts calls
+#per frame and per render pass (one call of Renderer.render), and
+#flags calls that set a piece of state to the value it already has;
+#slows rendering down considerably, so only use it for measurement
+class GLCallCounter(object):
+    def __init__(self, packages=["core", "material", "extras", "effects", "geometry", "light"],
+                historySize=120):
+        #modules in these packages (and modules with these names) are
+        #instrumented; add "__main__" to include the application itself
+        self.packages = packages
+        #GL calls of the measuring tools are not part of the frame
+        self.excludedModules = ["core.glCallCounter", "core.profiler"]
+
+        #current frame: calls and redundant calls per function
+        self.calls = Counter()
+        self.redundantCalls = Counter()
+        #render passes of the current frame
+        self.passes = []
+        self.currentPass = None
+        #completed frames, oldest first
+        self.frames = deque(maxlen=historySize)
+        self.frameNumber = 0
+
+        #last value set for each piece of state; state set before
+        #install() or by other code is unknown, so never redundant
+        self.state = {}
+        #(module, name, original function) of every replaced function
+        self.replaced = []
+        self.originalRender = None
+
+    def install(self):
+        if len(self.replaced) > 0:
+            return
+        #modules loaded later are not instrumented; install after all
+        #engine modules have been imported
+        for moduleName, module in list(sys.modules.items()):
+            if module is None or moduleName in self.excludedModules:
+                continue
+            if not any(moduleName == package or moduleName.startswith(package + ".")
+                        for package in self.packages):
+                continue
+            for name, function in list(vars(module).items()):
+                if name.startswith("gl") and callable(function) \
+                    and getattr(OpenGL.GL, name, None) is function:
+                    setattr(module, name, self.wrapFunction(name, function))
+                    self.replaced.append((module, name, function))
+
+        #every render call is a pass
+        from core.renderer import Renderer
+        self.originalRender = Renderer.render
+        originalRender = self.originalRender
+        counter = self
+        def render(renderer, scene, camera, clearColor=True, clearDepth=True, renderTarget=None):
+            counter.beginPass(renderTarget)
+            try:
+                return originalRender(renderer, scene, camera, clearColor, clearDepth, renderTarget)
+            finally:
+                counter.endPass()
+        Renderer.render = render
+
+    #restore the original functions
+    def uninstall(self):
+        for module, name, function in self.replaced:
+            setattr(module, name, function)
+        self.replaced = []
+        if self.originalRender is not None:
+            from core.renderer import Renderer
+            Renderer.render = self.originalRender
+            self.originalRender = None
+
+    def wrapFunction(self, name, function):
+        stateFunction = stateFunctions.get(name)
+        if name.startswith("glUniform"):
+            stateFunction = uniformState
+        counter = self
+        def wrapper(*args, **keywordArgs):
+            counter.countCall(name, args, stateFunction)
+            return function(*args, **keywordArgs)
+        wrapper.__name__ = name
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def countCall(self, name, args, stateFunction):
+        self.calls[name] += 1
+        if self.currentPass is not None:
+            self.currentPass["calls"][name] += 1
+        if stateFunction is None:
+            return
+        try:
+            changes = stateFunction(self.state, args)
+        except (IndexError, TypeError):
+            #unusual call signature; not tracked
+            return
+        redundant = True
+        for key, value in changes:
+            if key not in self.state or self.state[key] != value:
+                redundant = False
+            self.state[key] = value
+        if redundant:
+            self.redundantCalls[name] += 1
+            if self.currentPass is not None:
+                self.currentPass["redundantCalls"][name] += 1
+
+    def beginPass(self, renderTarget=None):
+        if renderTarget is None:
+            target = "window"
+        else:
+            target = "target %dx%d" % (renderTarget.width, renderTarget.height)
+        self.currentPass = {
+            "name": "%d %s" % (len(self.passes), target),
+            "calls": Counter(),
+            "redundantCalls": Counter()
+        }
+        self.passes.append(self.currentPass)
+
+    def endPass(self):
+        self.currentPass = None
+
+    #store the counts of the current frame and start a new one
+    def endFrame(self):
+        self.frames.append({
+            "frameNumber": self.frameNumber,
+            "calls": self.calls,
+            "redundantCalls": self.redundantCalls,
+            "passes": self.passes
+        })
+        self.calls = Counter()
+        self.redundantCalls = Counter()
+        self.passes = []
+        self.currentPass = None
+        self.frameNumber += 1
+
+    #counts of a completed frame (default: the last one)
+    def getFrame(self, index=-1):
+        if len(self.frames) == 0:
+            return None
+        return self.frames[index]
+
+    #calls per function, averaged over the stored frames
+    def getAverageCalls(self):
+        totals = Counter()
+        redundantTotals = Counter()
+        for frame in self.frames:
+            totals.update(frame["calls"])
+            redundantTotals.update(frame["redundantCalls"])
+        frameCount = max(1, len(self.frames))
+        return {name: (totals[name] / frameCount, redundantTotals[name] / frameCount)
+                for name in totals.keys()}
+
+    #lines describing one frame: totals per pass, then per function
+    def getReport(self, index=-1, maxLines=20):
+        frame = self.getFrame(index)
+        if frame is None:
+            return []
+        lines = ["frame %d: %d calls, %d redundant" % (frame["frameNumber"],
+            sum(frame["calls"].values()), sum(frame["redundantCalls"].values()))]
+        for renderPass in frame["passes"]:
+            lines.append("  pass %-20s %6d calls %6d redundant" % (renderPass["name"],
+                sum(renderPass["calls"].values()), sum(renderPass["redundantCalls"].values())))
+        for name, count in frame["calls"].most_common(maxLines):
+            lines.append("  %-26s %6d calls %6d redundant" % (name, count, frame["redundantCalls"][name]))
+        return lines
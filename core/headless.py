@@ -0,0 +1,169 @@
+import ctypes
+import os
+
+#headless (windowless) rendering is selected with environment variables:
+#  HEADLESS=egl|osmesa  create an offscreen context instead of a window
+#                       (egl uses a surfaceless display, e.g. Mesa llvmpipe)
+#  HEADLESS_FRAMES=N    number of frames to run (0: until running is False)
+#  HEADLESS_FPS=F       fixed deltaTime of 1/F seconds (0: measured time)
+#  HEADLESS_SAMPLES=S   multisampling of the offscreen render target
+#  HEADLESS_OUTPUT=dir  save every frame as a png into this folder
+#PyOpenGL picks its platform when it is first imported, so this module
+#must be imported (core.base does) before anything imports OpenGL
+backend = os.environ.get("HEADLESS", "").lower()
+if backend in ["1", "true", "yes"]:
+    backend = "egl"
+if backend in ["0", "false", "no"]:
+    backend = ""
+if backend != "":
+    os.environ.setdefault("PYOPENGL_PLATFORM", backend)
+    #pygame still needs a video driver for events, fonts and surfaces
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+#imported after the platform has been chosen
+import OpenGL
+from OpenGL.GL import *
+
+from core.frameCapture import FrameCapture
+from core.rendererTarget import RenderTarget
+
+
+class HeadlessContext(object):
+    #active context; Renderer uses its render target in place of the window
+    current = None
+
+    def __init__(self, resolution=[512,512], backend="egl", frameCount=60,
+                frameRate=60, samples=0, outputFolder=None):
+        self.width, self.height = int(resolution[0]), int(resolution[1])
+        self.backend = backend
+
+        platformName = OpenGL.platform.PLATFORM.__class__.__name__.lower()
+        if backend not in platformName:
+            raise Exception("PyOpenGL was imported before headless mode was selected;"
+                + " set HEADLESS=" + backend + " in the environment")
+
+        if backend == "egl":
+            self.createEGLContext()
+        elif backend == "osmesa":
+            self.createOSMesaContext()
+        else:
+            raise Exception("Unknown headless backend: " + backend)
+
+        #number of frames to render; 0 runs until stopped
+        self.frameCount = frameCount
+        #fixed time step in seconds; 0 uses measured time
+        self.frameRate = frameRate
+        self.frameNumber = 0
+
+        #offscreen replacement for the window framebuffer
+        self.renderTarget = RenderTarget([self.width, self.height], samples=samples)
+
+        #optional png output of every frame
+        self.frameCapture = None
+        if outputFolder is not None:
+            self.frameCapture = FrameCapture([self.width, self.height], outputFolder=outputFolder)
+
+        HeadlessContext.current = self
+
+    #read settings from the environment variables listed above
+    @staticmethod
+    def fromEnvironment(resolution):
+        return HeadlessContext(resolution, backend,
+            frameCount=int(os.environ.get("HEADLESS_FRAMES", 60)),
+            frameRate=float(os.environ.get("HEADLESS_FPS", 60)),
+            samples=int(os.environ.get("HEADLESS_SAMPLES", 0)),
+            outputFolder=os.environ.get("HEADLESS_OUTPUT"))
+
+    def createEGLContext(self):
+        from OpenGL import EGL
+
+        #prefer a surfaceless display (no X/Wayland/GBM device needed)
+        EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+        self.display = EGL.EGL_NO_DISPLAY
+        try:
+            self.display = EGL.eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+        except Exception:
+            pass
+        if not self.display:
+            self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise Exception("Unable to initialize EGL display")
+
+        configAttributes = (EGL.EGLint * 5)(
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        configCount = EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, configAttributes, ctypes.pointer(config), 1, ctypes.pointer(configCount)) \
+            or configCount.value == 0:
+            raise Exception("No EGL configuration supports desktop OpenGL")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        #core profile, as requested by the windowed Base
+        contextAttributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+            EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE)
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT, contextAttributes)
+        if not self.context:
+            raise Exception("Unable to create EGL context")
+
+        #no surface at all; everything is drawn into framebuffer objects
+        if not EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context):
+            raise Exception("Unable to make EGL context current")
+
+    def createOSMesaContext(self):
+        from OpenGL import arrays, osmesa
+
+        contextAttributes = arrays.GLintArray.asArray([
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, 3,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, 3,
+            0])
+        self.context = osmesa.OSMesaCreateContextAttribs(contextAttributes, None)
+        if not self.context:
+            raise Exception("Unable to create OSMesa context")
+
+        #OSMesa always renders into client memory; it is only used as
+        #a fallback default framebuffer
+        self.buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(self.context, self.buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+            raise Exception("Unable to make OSMesa context current")
+
+    #called once per frame before update: the context has no window
+    #framebuffer, so code drawing with raw GL calls (without Renderer)
+    #draws into the render target as well
+    def beginFrame(self):
+        glBindFramebuffer(GL_FRAMEBUFFER, self.renderTarget.drawFramebufferRef)
+        glViewport(0, 0, self.width, self.height)
+
+    #called once per frame after update; returns False when done
+    def endFrame(self):
+        #raw GL drawing into a multisampled target is not resolved yet
+        self.renderTarget.resolve()
+        if self.frameCapture is not None:
+            self.renderTarget.captureFrame(self.frameCapture)
+        glFlush()
+        self.frameNumber += 1
+        return self.frameCount == 0 or self.frameNumber < self.frameCount
+
+    def close(self):
+        if self.frameCapture is not None:
+            self.frameCapture.close()
+        glFinish()
+        if self.backend == "egl":
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(self.display, self.context)
+            EGL.eglTerminate(self.display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self.context)
+        HeadlessContext.current = None
@@ -1,104 +1,113 @@
 from math import cos, pi, sin, tan
-from turtle import right
 
 import numpy
 from numpy import angle, cross, divide, rint, subtract
 from numpy.linalg import norm
 
+#every matrix is a float64 array: object transforms are updated
+#incrementally for as long as an application runs (e.g. MovementRig
+#turning every frame), and float32 rounding would make them drift
+#from orthonormal within minutes. Matrices uploaded for every draw
+#are kept as float32 (uploadType, the type of matrix uniforms) next
+#to them instead: world matrices (Object3D.getModelMatrix) and camera
+#matrices. Each make* function writes into out when given (any 4x4
+#float array, e.g. a matrix that is rebuilt every frame) instead of
+#allocating a new array; the batched variants take arrays of values
+#and return (N,4,4) arrays
+dataType = numpy.float64
+uploadType = numpy.float32
+
+identity = numpy.identity(4, dtype=dataType)
+
+
+#4x4 identity matrix in out, or in a new array
+def getIdentity(out):
+    if out is None:
+        return identity.copy()
+    out[...] = identity
+    return out
+
+#n identity matrices
+def getIdentities(count):
+    return numpy.tile(identity, (count, 1, 1))
+
+#values as a float array
+def getValues(values):
+    return numpy.asarray(values, dtype=dataType)
+
 
 class Matrix(object):
     @staticmethod
-    def makeIdentity():
-        return numpy.array(
-            [
-                [1, 0, 0, 0],
-                [0, 1, 0, 0],
-                [0, 0, 1, 0],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
-    
-    @staticmethod
-    def makeTranslation(x, y, z):
-        return numpy.array(
-            [
-                [1, 0, 0, x],
-                [0, 1, 0, y],
-                [0, 0, 1, z],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
-    
-    @staticmethod
-    def makeRotationX(angle):
+    def makeIdentity(out=None):
+        return getIdentity(out)
+
+    #identity matrix of uploadType, e.g. as out of the make* functions
+    #for a matrix uploaded for every draw
+    @staticmethod
+    def makeUploadIdentity():
+        return identity.astype(uploadType)
+
+    @staticmethod
+    def makeTranslation(x, y, z, out=None):
+        m = getIdentity(out)
+        m[0, 3] = x
+        m[1, 3] = y
+        m[2, 3] = z
+        return m
+
+    @staticmethod
+    def makeRotationX(angle, out=None):
         c = cos(angle)
         s = sin(angle)
-        return numpy.array(
-            [ 
-                [1, 0, 0, 0],
-                [0, c, -s, 0],
-                [0, s, c, 0],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
-    
-    @staticmethod
-    def makeRotationY(angle):
+        m = getIdentity(out)
+        m[1, 1], m[1, 2] = c, -s
+        m[2, 1], m[2, 2] = s, c
+        return m
+
+    @staticmethod
+    def makeRotationY(angle, out=None):
         c = cos(angle)
         s = sin(angle)
-        return numpy.array(
-            [
-                [c, 0, s, 0],
-                [0, 1, 0, 0],
-                [-s, 0, c, 0],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
+        m = getIdentity(out)
+        m[0, 0], m[0, 2] = c, s
+        m[2, 0], m[2, 2] = -s, c
+        return m
 
 
     @staticmethod
-    def makeRotationZ(angle):
+    def makeRotationZ(angle, out=None):
         c = cos(angle)
         s = sin(angle)
-        return numpy.array(
-            [
-                [c, -s, 0, 0],
-                [s, c, 0, 0],
-                [0, 0, 1, 0],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
+        m = getIdentity(out)
+        m[0, 0], m[0, 1] = c, -s
+        m[1, 0], m[1, 1] = s, c
+        return m
 
 
     @staticmethod
-    def makeScale(s):
-        return numpy.array(
-            [
-                [s, 0, 0, 0],
-                [0, s, 0, 0],
-                [0, 0, s, 0],
-                [0, 0, 0, 1]
-            ]
-        ).astype(float)
+    def makeScale(s, out=None):
+        m = getIdentity(out)
+        m[0, 0] = s
+        m[1, 1] = s
+        m[2, 2] = s
+        return m
 
     @staticmethod
-    def makePerspective(angleOfView = 60, aspectRatio = 1, near = 0.1, far = 1000):
+    def makePerspective(angleOfView = 60, aspectRatio = 1, near = 0.1, far = 1000, out=None):
         a = angleOfView * pi / 180.0
         d = 1.0 / tan(a*0.5)
         r = aspectRatio
         b = (far+near) / (near - far)
         c = 2 * far * near / (near - far)
-        return numpy.array(
-            [
-                [d/r, 0, 0, 0],
-                [0, d, 0, 0],
-                [0, 0, b, c],
-                [0, 0, -1, 0]
-            ]
-        ).astype(float)
+        m = getIdentity(out)
+        m[0, 0] = d/r
+        m[1, 1] = d
+        m[2, 2], m[2, 3] = b, c
+        m[3, 2], m[3, 3] = -1, 0
+        return m
 
     @staticmethod
-    def makeLookAt(position, target):
+    def makeLookAt(position, target, out=None):
         worldUp = [0,1,0]
         forward = subtract(target, position)
         right = cross(forward, worldUp)
@@ -115,22 +124,65 @@ class Matrix(object):
         right = divide(right, norm(right))
         up = divide(up, norm(up))
 
-        return numpy.array([
-            [right[0], up[0], -forward[0], position[0]],
-            [right[1], up[1], -forward[1], position[1]],
-            [right[2], up[2], -forward[2], position[2]],
-            [0, 0, 0, 1]
-
-        ])
-    
-    @staticmethod
-    def makeOrthographic(left=-1, right=1, bottom=-1, top=1, near=-1, far=1):
-        return numpy.array(
-            [
-                [2 / (right-left), 0, 0, -(right+left)/(right-left)],
-                [0, 2 / (top-bottom), 0, -(top+bottom)/(top-bottom)],
-                [0, 0, -2 / (far-near), -(far+near)/(far-near)],
-                [0, 0, 0, 1]
-            ]
-        )
-    
\ No newline at end of file
+        m = getIdentity(out)
+        m[0:3, 0] = right
+        m[0:3, 1] = up
+        m[0:3, 2] = -forward
+        m[0:3, 3] = position[0:3]
+        return m
+
+    @staticmethod
+    def makeOrthographic(left=-1, right=1, bottom=-1, top=1, near=-1, far=1, out=None):
+        m = getIdentity(out)
+        m[0, 0], m[0, 3] = 2 / (right-left), -(right+left)/(right-left)
+        m[1, 1], m[1, 3] = 2 / (top-bottom), -(top+bottom)/(top-bottom)
+        m[2, 2], m[2, 3] = -2 / (far-near), -(far+near)/(far-near)
+        return m
+
+    #batched: count identity matrices
+    @staticmethod
+    def makeIdentities(count):
+        return getIdentities(count)
+
+    #batched: positions is an (N,3) array
+    @staticmethod
+    def makeTranslations(positions):
+        positions = getValues(positions)
+        m = getIdentities(len(positions))
+        m[:, 0:3, 3] = positions
+        return m
+
+    #batched: angles in radians, an array of N angles
+    @staticmethod
+    def makeRotationsX(angles):
+        return Matrix.makeRotations(1, 2, angles)
+
+    @staticmethod
+    def makeRotationsY(angles):
+        return Matrix.makeRotations(2, 0, angles)
+
+    @staticmethod
+    def makeRotationsZ(angles):
+        return Matrix.makeRotations(0, 1, angles)
+
+    #rotations in the plane of axes first and second (0: x, 1: y,
+    #2: z), from first towards second
+    @staticmethod
+    def makeRotations(first, second, angles):
+        angles = numpy.asarray(angles, dtype=float).reshape(-1)
+        c = numpy.cos(angles)
+        s = numpy.sin(angles)
+        m = getIdentities(len(angles))
+        m[:, first, first], m[:, first, second] = c, -s
+        m[:, second, first], m[:, second, second] = s, c
+        return m
+
+    #batched: uniform scale factors, an array of N factors
+    @staticmethod
+    def makeScales(factors):
+        factors = getValues(factors).reshape(-1)
+        m = getIdentities(len(factors))
+        m[:, 0, 0] = factors
+        m[:, 1, 1] = factors
+        m[:, 2, 2] = factors
+        return m
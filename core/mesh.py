@@ -1,6 +1,7 @@
 from OpenGL.GL import *
 
 from core.object3D import Object3D
+from core.renderState import RenderState
 
 
 class Mesh(Object3D):
@@ -10,13 +11,22 @@ class Mesh(Object3D):
         self.material = material
         #should this object be renderer
         self.visible = True
-        #set up associations between attributes stored in 
-        #geometry and shader program stored in material
+        #drawn into shadow maps / darkened by them (materials created
+        #with useShadow=True)
+        self.castShadow = True
+        self.receiveShadow = True
         self.vaoRef = glGenVertexArrays(1)
-        glBindVertexArray(self.vaoRef)
+        self.associateAttributes()
 
-        for variableName, attributeObject in geometry.attributes.items():
-            attributeObject.associateVariable(material.programRef, variableName)
+    #set up associations between attributes stored in geometry and
+    #shader program stored in material; call again after replacing
+    #either (e.g. extras.lightBaker.LightBaker)
+    def associateAttributes(self):
+        renderState = RenderState.getCurrent()
+        renderState.bindVertexArray(self.vaoRef)
+
+        for variableName, attributeObject in self.geometry.attributes.items():
+            attributeObject.associateVariable(self.material.programRef, variableName)
 
         #unbind this vertex array object
-        glBindVertexArray(0)
+        renderState.bindVertexArray(0)
@@ -1,47 +1,193 @@
 import numpy
 
 from core.matrix import Matrix
+from core.quaternion import Quaternion
+
+
+#reused by the transformation methods, which apply it immediately
+transformBuffer = Matrix.makeIdentity()
 
 
 class Object3D(object):
     def __init__(self):
+        #optional core.transformStore.TransformStore holding the
+        #transform of this object at transformIndex
+        self.transformStore = None
+        self.transformIndex = None
+        #optional position, rotation and scale representation (see
+        #enableTRS); the matrix is composed from it when next read
+        self.position = None
+        self.quaternion = None
+        self.scaleFactors = None
+        self.matrixDirty = False
         self.transform = Matrix.makeIdentity()
+        #float32 copy of the world matrix for uploads (see getModelMatrix)
+        self.modelMatrix = Matrix.makeUploadIdentity()
         self.parent = None
         self.children = []
+        #tuples of descendants, by type (None: all; see getDescendantList),
+        #and "transformStores" (see getTransformStores)
+        self.descendantCache = {}
+
+    #local transformation matrix; a view into the transform store when
+    #this object is part of one, so assigning copies into the store
+    @property
+    def transform(self):
+        if self.matrixDirty:
+            self.composeMatrix()
+        return self.localMatrix
+
+    @transform.setter
+    def transform(self, matrix):
+        if self.transformStore is None:
+            self.localMatrix = matrix
+        else:
+            self.localMatrix[:] = matrix
+        if self.position is not None:
+            self.position, self.quaternion, self.scaleFactors = Quaternion.decomposeMatrix(matrix)
+            self.matrixDirty = False
+
+    #keep position, quaternion and scale factors and compose the matrix
+    #only when it is read: incremental rotations stay orthonormal and
+    #getPosition/getDirection are exact. Assumes the matrix has no shear
+    def enableTRS(self):
+        self.position, self.quaternion, self.scaleFactors = Quaternion.decomposeMatrix(self.transform)
+        self.matrixDirty = False
+
+    def disableTRS(self):
+        if self.matrixDirty:
+            self.composeMatrix()
+        self.position = None
+        self.quaternion = None
+        self.scaleFactors = None
+
+    def composeMatrix(self):
+        matrix = Quaternion.makeMatrix(self.position, self.quaternion, self.scaleFactors)
+        if self.transformStore is None:
+            self.localMatrix = matrix
+        else:
+            self.localMatrix[:] = matrix
+        self.matrixDirty = False
+
+    #the position, quaternion or scale factors changed
+    def trsChanged(self):
+        self.matrixDirty = True
+        if self.transformStore is not None:
+            self.transformStore.dirtyNodes.add(self)
+
+    #rotation quaternion [x, y, z, w], e.g. a result of Quaternion.slerp
+    def setQuaternion(self, quaternion):
+        if self.position is None:
+            self.enableTRS()
+        self.quaternion = Quaternion.normalize(quaternion)
+        self.trsChanged()
+
+    def rotateTRS(self, quaternion, localCoord):
+        if localCoord:
+            self.quaternion = Quaternion.normalize(Quaternion.multiply(self.quaternion, quaternion))
+        else:
+            self.position = Quaternion.rotateVector(quaternion, self.position)
+            self.quaternion = Quaternion.normalize(Quaternion.multiply(quaternion, self.quaternion))
+        self.trsChanged()
+
+    #a local rotation only keeps the TRS form with uniform scale
+    def isUniformlyScaled(self):
+        return self.scaleFactors[0] == self.scaleFactors[1] == self.scaleFactors[2]
 
     def add(self, child):
         self.children.append(child)
         child.parent = self
+        self.invalidateDescendants()
+        if self.transformStore is not None:
+            store = self.transformStore
+            if child in store.roots:
+                store.roots.remove(child)
+            for descendant in child.traverse():
+                store.addNode(descendant)
+            store.structureChanged()
     
     def remove(self, child):
         self.children.remove(child)
         child.parent = None
+        self.invalidateDescendants()
+        if child.transformStore is not None:
+            child.transformStore.detach(child)
+
+    #the structure below this object changed; cached descendant lists
+    #of this object and of every ancestor are rebuilt when next needed
+    #(code that changes children directly must call this)
+    def invalidateDescendants(self):
+        node = self
+        while node is not None:
+            node.descendantCache = {}
+            node = node.parent
 
     #calculate transformation on this object3D relative
     # to the root object3D of the scene graph
+    #(for objects in a transform store, as of its last update:
+    #Renderer.render updates the stores of the scene before drawing,
+    #so game code reading world positions in update() gets the values
+    #of the previous frame unless it calls TransformStore.update)
     def getWorldMatrix(self):
+        if self.transformStore is not None:
+            return self.transformStore.worldMatrices[self.transformIndex]
         if self.parent == None:
             return self.transform
         else:
             return self.parent.getWorldMatrix() @ self.transform
+
+    #world matrix as float32, for the modelMatrix uniform: the transform
+    #store's world matrix (no copy), otherwise computed into this
+    #object's modelMatrix array
+    def getModelMatrix(self):
+        if self.transformStore is not None:
+            return self.transformStore.worldMatrices[self.transformIndex]
+        if self.parent == None:
+            self.modelMatrix[...] = self.transform
+        else:
+            numpy.matmul(self.parent.getWorldMatrix(), self.transform, out=self.modelMatrix)
+        return self.modelMatrix
     
-    #return a single list containing all descendents
-    def getDescendantList(self):
-        #master list of all descendant nodes
-        descendants = []
-        #nodex to be added to descendant list and 
-        #children will be added to this list
+    #yield this object and its descendants, depth first in the order
+    #they were added; when prune(node) is true the descendants of that
+    #node are skipped, e.g. prune=lambda node: not getattr(node, "visible", True)
+    def traverse(self, prune=None):
         nodesToProcess = [self]
-        #continue processing nodes while any are left
         while len(nodesToProcess) > 0:
-            #remove first node from list
-            node = nodesToProcess.pop(0)
-            #add this node to descendant list
-            descendants.append(node)
-
-            #children of this node must also be processed
-            nodesToProcess = node.children + nodesToProcess
-        return descendants
+            node = nodesToProcess.pop()
+            yield node
+            if prune is not None and prune(node):
+                continue
+            #reversed, so the first child is processed next
+            nodesToProcess.extend(reversed(node.children))
+
+    #return this object and all descendents; cached until the
+    #structure changes, as a tuple so callers cannot change the cache
+    #(use list() for a copy to sort or extend)
+    def getDescendantList(self):
+        if None not in self.descendantCache.keys():
+            self.descendantCache[None] = tuple(self.traverse())
+        return self.descendantCache[None]
+
+    #descendants that are instances of objectType (e.g. Mesh or Light),
+    #in the same order as getDescendantList; a cached tuple like it
+    def getDescendantsOfType(self, objectType):
+        if objectType not in self.descendantCache.keys():
+            self.descendantCache[objectType] = tuple(node for node in self.getDescendantList()
+                                                     if isinstance(node, objectType))
+        return self.descendantCache[objectType]
+
+    #distinct transform stores holding this object or any descendant,
+    #in the order their first node appears in getDescendantList; cached
+    #like it (TransformStore.attach and detach invalidate the cache)
+    def getTransformStores(self):
+        if "transformStores" not in self.descendantCache.keys():
+            stores = []
+            for node in self.getDescendantList():
+                if node.transformStore is not None and node.transformStore not in stores:
+                    stores.append(node.transformStore)
+            self.descendantCache["transformStores"] = tuple(stores)
+        return self.descendantCache["transformStores"]
     
     #apply geometric transformations
     def applyMatrix(self, matrix, localCoord=True):
@@ -52,34 +198,62 @@ class Object3D(object):
     
 
     def translate(self, x, y, z, localCoord=True):
-        m = Matrix.makeTranslation(x, y, z)
+        if self.position is not None:
+            offset = numpy.array([x, y, z], dtype=float)
+            if localCoord:
+                offset = Quaternion.rotateVector(self.quaternion, offset * self.scaleFactors)
+            self.position = self.position + offset
+            self.trsChanged()
+            return
+        m = Matrix.makeTranslation(x, y, z, out=transformBuffer)
         self.applyMatrix(m, localCoord)
 
     def rotateX(self, angle, localCoord=True):
-        m = Matrix.makeRotationX(angle)
+        if self.position is not None and (not localCoord or self.isUniformlyScaled()):
+            self.rotateTRS(Quaternion.makeRotationX(angle), localCoord)
+            return
+        m = Matrix.makeRotationX(angle, out=transformBuffer)
         self.applyMatrix(m, localCoord)
 
     def rotateY(self, angle, localCoord=True):
-        m = Matrix.makeRotationY(angle)
+        if self.position is not None and (not localCoord or self.isUniformlyScaled()):
+            self.rotateTRS(Quaternion.makeRotationY(angle), localCoord)
+            return
+        m = Matrix.makeRotationY(angle, out=transformBuffer)
         self.applyMatrix(m, localCoord)
 
 
     def rotateZ(self, angle, localCoord=True):
-        m = Matrix.makeRotationZ(angle)
+        if self.position is not None and (not localCoord or self.isUniformlyScaled()):
+            self.rotateTRS(Quaternion.makeRotationZ(angle), localCoord)
+            return
+        m = Matrix.makeRotationZ(angle, out=transformBuffer)
         self.applyMatrix(m, localCoord)
 
     def scale(self, s, localCoord=True):
-        m = Matrix.makeScale(s)
+        if self.position is not None:
+            if not localCoord:
+                self.position = self.position * s
+            self.scaleFactors = self.scaleFactors * s
+            self.trsChanged()
+            return
+        m = Matrix.makeScale(s, out=transformBuffer)
         self.applyMatrix(m, localCoord)
 
     #get/set position components of transform
     def getPosition(self):
+        if self.position is not None:
+            return list(self.position)
         return [
             self.transform[0,3],
             self.transform[1,3],
             self.transform[2,3]]
 
     def setPosition(self, position):
+        if self.position is not None:
+            self.position = numpy.array(position[0:3], dtype=float)
+            self.trsChanged()
+            return
         self.transform[0,3] = position[0]
         self.transform[1,3] = position[1]
         self.transform[2,3] = position[2]
@@ -99,6 +273,8 @@ class Object3D(object):
 
     #returns 3x3 submatrix with rotation data
     def getRotationMatrix(self):
+        if self.position is not None:
+            return Quaternion.toRotationMatrix(self.quaternion) * self.scaleFactors
         return numpy.array(
             [
                 self.transform[0][0:3],
@@ -110,6 +286,8 @@ class Object3D(object):
 
     def getDirection(self):
         forward = numpy.array([0,0,-1])
+        if self.position is not None:
+            return list(Quaternion.rotateVector(self.quaternion, forward))
         return list(self.getRotationMatrix() @ forward)
 
     
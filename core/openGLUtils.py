@@ -4,6 +4,13 @@ from OpenGL.GL import *
 #static methods to load and compile OpenGL shaders 
 #link to create programs
 class OpenGLUtils(object):
+    #fixed locations of the attributes of geometry classes
+    attributeLocations = {
+        "vertexPosition": 0,
+        "vertexUV": 1,
+        "vertexNormal": 2
+    }
+
     @staticmethod
     def initializeShader(shaderCode, shaderType):
         #specify required opengl/glsl version
@@ -46,6 +53,12 @@ class OpenGLUtils(object):
         glAttachShader(programRef, vertexShaderRef)
         glAttachShader(programRef, fragmentShaderRef)
 
+        #standard attributes always use the same locations, so passes
+        #with their own program (shadow maps, deferred shading) can draw
+        #any mesh's vertex array object
+        for variableName, location in OpenGLUtils.attributeLocations.items():
+            glBindAttribLocation(programRef, location, variableName)
+
         #link vertex shader to fragment shader
         glLinkProgram(programRef)
 
@@ -0,0 +1,196 @@
+import ctypes
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from OpenGL.GL import *
+from OpenGL.raw.GL.VERSION import GL_3_2, GL_3_3
+
+
+#frame profiler with nested CPU scopes (perf_counter) and GPU scopes
+#(timestamp queries); results are kept as rolling statistics per scope
+#and can be exported as a Chrome trace (chrome://tracing, Perfetto)
+class Profiler(object):
+    def __init__(self, historySize=120, gpuTiming=True, traceSize=100000):
+        #number of frames used for the rolling statistics
+        self.historySize = historySize
+        #measure GPU time of scopes opened with gpu=True
+        self.gpuTiming = gpuTiming
+        #duration (seconds) of every scope in recent frames, indexed by
+        #scope path such as "frame/render/uniforms"
+        self.history = {}
+        #durations summed over the current frame (scopes may repeat)
+        self.frameTotals = {}
+        #open scopes: (name, path, startTime, gpuQueries)
+        self.stack = []
+        #chrome trace events (complete events, microseconds)
+        self.traceEvents = deque(maxlen=traceSize)
+        self.recordTrace = True
+        self.startTime = time.perf_counter()
+        self.frameNumber = 0
+
+        #GPU timestamps are read back a frame or more later to avoid
+        #stalling; queries of finished frames return to the pool
+        self.queryPool = []
+        #current frame's GPU scopes: (path, name, startQuery, endQuery)
+        self.gpuScopes = []
+        #earlier frames waiting for their query results
+        self.pendingGpuFrames = deque()
+        #offset from GPU timestamps to the perf_counter timeline
+        self.gpuClockOffset = None
+        #output storage for 64 bit query results (the wrapped PyOpenGL
+        #functions have no array type for 64 bit integers)
+        self.queryResult = ctypes.c_uint64()
+
+    #open the scope that encloses a whole frame
+    def beginFrame(self):
+        self.frameTotals = {}
+        self.begin("frame")
+
+    #close the frame scope and update the statistics
+    def endFrame(self):
+        while len(self.stack) > 0:
+            self.end()
+        for path, duration in self.frameTotals.items():
+            if path not in self.history.keys():
+                self.history[path] = deque(maxlen=self.historySize)
+            self.history[path].append(duration)
+        if len(self.gpuScopes) > 0:
+            self.pendingGpuFrames.append(self.gpuScopes)
+            self.gpuScopes = []
+        self.collectGpuResults()
+        self.frameNumber += 1
+
+    #open a nested scope; gpu=True also times the GL commands
+    #issued until the matching end()
+    def begin(self, name, gpu=False):
+        path = name
+        if len(self.stack) > 0:
+            path = self.stack[-1][1] + "/" + name
+        queries = None
+        if gpu and self.gpuTiming:
+            queries = [self.getQuery(), None]
+            glQueryCounter(queries[0], GL_TIMESTAMP)
+        self.stack.append((name, path, time.perf_counter(), queries))
+
+    def end(self):
+        endTime = time.perf_counter()
+        name, path, startTime, queries = self.stack.pop()
+        if queries is not None:
+            queries[1] = self.getQuery()
+            glQueryCounter(queries[1], GL_TIMESTAMP)
+            self.gpuScopes.append((path + " [gpu]", name, queries[0], queries[1]))
+        self.record(path, name, startTime, endTime - startTime, "cpu")
+
+    @contextmanager
+    def scope(self, name, gpu=False):
+        self.begin(name, gpu)
+        try:
+            yield self
+        finally:
+            self.end()
+
+    #add a duration measured elsewhere as a child of the current scope;
+    #used for work spread over many small calls (e.g. uniform uploads)
+    def addTime(self, name, duration, startTime=None):
+        path = name
+        if len(self.stack) > 0:
+            path = self.stack[-1][1] + "/" + name
+        if startTime is None:
+            startTime = time.perf_counter() - duration
+        self.record(path, name, startTime, duration, "cpu")
+
+    def record(self, path, name, startTime, duration, category):
+        self.frameTotals[path] = self.frameTotals.get(path, 0) + duration
+        if self.recordTrace:
+            self.traceEvents.append({
+                "name": name, "cat": category, "ph": "X",
+                "ts": (startTime - self.startTime) * 1000000,
+                "dur": duration * 1000000,
+                "pid": 0, "tid": 0 if category == "cpu" else 1,
+                "args": {"path": path, "frame": self.frameNumber}
+            })
+
+    def getQuery(self):
+        if len(self.queryPool) == 0:
+            self.queryPool.extend(glGenQueries(16))
+        return self.queryPool.pop()
+
+    #timestamp of a finished query, in seconds
+    def getQueryResult(self, query):
+        GL_3_3.glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(self.queryResult))
+        return self.queryResult.value / 1000000000
+
+    #read results of earlier frames whose queries have completed
+    def collectGpuResults(self):
+        while len(self.pendingGpuFrames) > 0:
+            scopes = self.pendingGpuFrames[0]
+            lastQuery = scopes[-1][3]
+            if not glGetQueryObjectiv(lastQuery, GL_QUERY_RESULT_AVAILABLE):
+                return
+            self.pendingGpuFrames.popleft()
+
+            if self.gpuClockOffset is None:
+                GL_3_2.glGetInteger64v(GL_TIMESTAMP, ctypes.byref(self.queryResult))
+                gpuNow = self.queryResult.value / 1000000000
+                self.gpuClockOffset = time.perf_counter() - gpuNow
+
+            totals = {}
+            for path, name, startQuery, endQuery in scopes:
+                gpuStart = self.getQueryResult(startQuery)
+                gpuEnd = self.getQueryResult(endQuery)
+                duration = gpuEnd - gpuStart
+                totals[path] = totals.get(path, 0) + duration
+                if self.recordTrace:
+                    self.traceEvents.append({
+                        "name": name, "cat": "gpu", "ph": "X",
+                        "ts": (gpuStart + self.gpuClockOffset - self.startTime) * 1000000,
+                        "dur": duration * 1000000,
+                        "pid": 0, "tid": 1,
+                        "args": {"path": path}
+                    })
+                self.queryPool.append(startQuery)
+                self.queryPool.append(endQuery)
+            for path, duration in totals.items():
+                if path not in self.history.keys():
+                    self.history[path] = deque(maxlen=self.historySize)
+                self.history[path].append(duration)
+
+    #mean, 95th percentile, max and last value (milliseconds) per scope
+    def getStatistics(self):
+        statistics = {}
+        for path, durations in self.history.items():
+            if len(durations) == 0:
+                continue
+            ordered = sorted(durations)
+            index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+            statistics[path] = {
+                "mean": 1000 * sum(ordered) / len(ordered),
+                "p95": 1000 * ordered[index],
+                "max": 1000 * ordered[-1],
+                "last": 1000 * durations[-1]
+            }
+        return statistics
+
+    #one line per scope, indented by nesting depth
+    def getReport(self):
+        lines = []
+        statistics = self.getStatistics()
+        #children directly below their parent scope
+        for path in sorted(statistics.keys(), key=lambda path: path.split("/")):
+            stats = statistics[path]
+            depth = path.count("/")
+            name = path.split("/")[-1]
+            lines.append("%s%-24s %7.2f %7.2f %7.2f" % (
+                "  " * depth, name, stats["mean"], stats["p95"], stats["max"]))
+        return lines
+
+    #write recorded events as Chrome trace event JSON
+    def exportChromeTrace(self, fileName):
+        trace = {
+            "traceEvents": list(self.traceEvents),
+            "displayTimeUnit": "ms"
+        }
+        with open(fileName, "w") as traceFile:
+            json.dump(trace, traceFile)
@@ -0,0 +1,132 @@
+from math import cos, sin, sqrt
+
+import numpy
+
+from core.matrix import Matrix
+
+
+#quaternions are numpy arrays [x, y, z, w]; functions marked as
+#batched also accept (N,4) arrays of quaternions
+class Quaternion(object):
+    @staticmethod
+    def makeIdentity():
+        return numpy.array([0.0, 0.0, 0.0, 1.0])
+
+    #rotation by angle (radians) about a unit length axis
+    @staticmethod
+    def makeAxisAngle(axis, angle):
+        s = sin(angle * 0.5)
+        return numpy.array([axis[0] * s, axis[1] * s, axis[2] * s, cos(angle * 0.5)])
+
+    @staticmethod
+    def makeRotationX(angle):
+        return numpy.array([sin(angle * 0.5), 0.0, 0.0, cos(angle * 0.5)])
+
+    @staticmethod
+    def makeRotationY(angle):
+        return numpy.array([0.0, sin(angle * 0.5), 0.0, cos(angle * 0.5)])
+
+    @staticmethod
+    def makeRotationZ(angle):
+        return numpy.array([0.0, 0.0, sin(angle * 0.5), cos(angle * 0.5)])
+
+    #rotation of a, followed by rotation b in the frame rotated by a
+    #(the quaternion of the matrix product A @ B); batched
+    @staticmethod
+    def multiply(a, b):
+        ax, ay, az, aw = numpy.moveaxis(numpy.asarray(a, dtype=float), -1, 0)
+        bx, by, bz, bw = numpy.moveaxis(numpy.asarray(b, dtype=float), -1, 0)
+        return numpy.stack([
+            aw*bx + ax*bw + ay*bz - az*by,
+            aw*by - ax*bz + ay*bw + az*bx,
+            aw*bz + ax*by - ay*bx + az*bw,
+            aw*bw - ax*bx - ay*by - az*bz
+        ], axis=-1)
+
+    #unit length; batched
+    @staticmethod
+    def normalize(q):
+        q = numpy.asarray(q, dtype=float)
+        return q / numpy.linalg.norm(q, axis=-1, keepdims=True)
+
+    #3x3 rotation matrix; batched ((N,3,3) for (N,4) quaternions)
+    @staticmethod
+    def toRotationMatrix(q):
+        x, y, z, w = numpy.moveaxis(numpy.asarray(q, dtype=float), -1, 0)
+        return numpy.stack([
+            numpy.stack([1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)], axis=-1),
+            numpy.stack([2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)], axis=-1),
+            numpy.stack([2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)], axis=-1)
+        ], axis=-2)
+
+    #quaternion of a 3x3 rotation matrix (without scale)
+    @staticmethod
+    def fromRotationMatrix(m):
+        trace = m[0][0] + m[1][1] + m[2][2]
+        if trace > 0:
+            s = 0.5 / sqrt(trace + 1)
+            q = [(m[2][1] - m[1][2]) * s, (m[0][2] - m[2][0]) * s,
+                (m[1][0] - m[0][1]) * s, 0.25 / s]
+        elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = 2 * sqrt(1 + m[0][0] - m[1][1] - m[2][2])
+            q = [0.25 * s, (m[0][1] + m[1][0]) / s,
+                (m[0][2] + m[2][0]) / s, (m[2][1] - m[1][2]) / s]
+        elif m[1][1] > m[2][2]:
+            s = 2 * sqrt(1 + m[1][1] - m[0][0] - m[2][2])
+            q = [(m[0][1] + m[1][0]) / s, 0.25 * s,
+                (m[1][2] + m[2][1]) / s, (m[0][2] - m[2][0]) / s]
+        else:
+            s = 2 * sqrt(1 + m[2][2] - m[0][0] - m[1][1])
+            q = [(m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s,
+                0.25 * s, (m[1][0] - m[0][1]) / s]
+        return Quaternion.normalize(q)
+
+    #vector (or (N,3) vectors) rotated by q
+    @staticmethod
+    def rotateVector(q, vector):
+        u = numpy.asarray(q[0:3], dtype=float)
+        w = q[3]
+        vector = numpy.asarray(vector, dtype=float)
+        t = 2 * numpy.cross(u, vector)
+        return vector + w * t + numpy.cross(u, t)
+
+    #spherical interpolation from a to b at fraction t (0 to 1) along
+    #the shorter arc; batched over quaternions and t, e.g. one
+    #animation step for many objects: slerp(starts, ends, times)
+    @staticmethod
+    def slerp(a, b, t):
+        a = numpy.asarray(a, dtype=float)
+        b = numpy.asarray(b, dtype=float)
+        t = numpy.asarray(t, dtype=float)[..., numpy.newaxis]
+        dot = numpy.sum(a * b, axis=-1, keepdims=True)
+        #q and -q are the same rotation; take the shorter way
+        b = numpy.where(dot < 0, -b, b)
+        dot = numpy.abs(dot)
+        #nearly equal: linear interpolation avoids dividing by sin(0)
+        linear = dot > 0.9995
+        theta = numpy.arccos(numpy.clip(dot, -1, 1))
+        sinTheta = numpy.where(linear, 1, numpy.sin(theta))
+        weightA = numpy.where(linear, 1 - t, numpy.sin((1 - t) * theta) / sinTheta)
+        weightB = numpy.where(linear, t, numpy.sin(t * theta) / sinTheta)
+        return Quaternion.normalize(weightA * a + weightB * b)
+
+    #4x4 matrix translating by position, rotating by q and scaling by
+    #scale (three factors), i.e. T @ R @ S
+    @staticmethod
+    def makeMatrix(position, q, scale):
+        matrix = Matrix.makeIdentity()
+        matrix[0:3, 0:3] = Quaternion.toRotationMatrix(q) * numpy.asarray(scale, dtype=float)
+        matrix[0:3, 3] = position
+        return matrix
+
+    #(position, quaternion, scale) of a matrix without shear
+    @staticmethod
+    def decomposeMatrix(matrix):
+        matrix = numpy.asarray(matrix, dtype=float)
+        position = matrix[0:3, 3].copy()
+        scale = numpy.linalg.norm(matrix[0:3, 0:3], axis=0)
+        #a mirroring matrix keeps a proper rotation with negative scale
+        if numpy.linalg.det(matrix[0:3, 0:3]) < 0:
+            scale[0] = -scale[0]
+        rotation = matrix[0:3, 0:3] / scale
+        return position, Quaternion.fromRotationMatrix(rotation), scale
@@ -0,0 +1,86 @@
+from OpenGL.GL import *
+
+
+#cache of the fixed function state of the OpenGL context; every
+#setter remembers the value it was given and only calls OpenGL when
+#the value changes, so materials can apply their settings for every
+#mesh without re-issuing identical state changes
+class RenderState(object):
+    #shared by all materials and renderers (one OpenGL context)
+    current = None
+
+    def __init__(self):
+        #last value set, indexed by piece of state;
+        #missing keys are unknown and always set
+        self.values = {}
+
+    @staticmethod
+    def getCurrent():
+        if RenderState.current is None:
+            RenderState.current = RenderState()
+        return RenderState.current
+
+    #forget all values; call after changing state with OpenGL directly
+    def invalidate(self):
+        self.values = {}
+
+    #store value; return True when OpenGL has to be called
+    def changed(self, key, value):
+        if key in self.values and self.values[key] == value:
+            return False
+        self.values[key] = value
+        return True
+
+    #glEnable / glDisable
+    def setCapability(self, capability, enabled):
+        if self.changed(capability, enabled):
+            if enabled:
+                glEnable(capability)
+            else:
+                glDisable(capability)
+
+    def setPolygonMode(self, mode):
+        if self.changed("polygonMode", mode):
+            glPolygonMode(GL_FRONT_AND_BACK, mode)
+
+    def setLineWidth(self, width):
+        if self.changed("lineWidth", width):
+            glLineWidth(width)
+
+    def setPointSize(self, size):
+        if self.changed("pointSize", size):
+            glPointSize(size)
+
+    def setBlendFunction(self, sourceFactor, destinationFactor):
+        if self.changed("blendFunction", (sourceFactor, destinationFactor)):
+            glBlendFunc(sourceFactor, destinationFactor)
+
+    def setDepthFunction(self, function):
+        if self.changed("depthFunction", function):
+            glDepthFunc(function)
+
+    def setDepthWrite(self, enabled):
+        if self.changed("depthWrite", enabled):
+            glDepthMask(GL_TRUE if enabled else GL_FALSE)
+
+    #faces removed when GL_CULL_FACE is enabled (GL_BACK / GL_FRONT)
+    def setCullFace(self, face):
+        if self.changed("cullFace", face):
+            glCullFace(face)
+
+    #glColorMask for all channels (off for depth only passes)
+    def setColorWrite(self, enabled):
+        if self.changed("colorWrite", enabled):
+            glColorMask(enabled, enabled, enabled, enabled)
+
+    def setPolygonOffset(self, factor, units):
+        if self.changed("polygonOffset", (factor, units)):
+            glPolygonOffset(factor, units)
+
+    def useProgram(self, programRef):
+        if self.changed("program", programRef):
+            glUseProgram(programRef)
+
+    def bindVertexArray(self, vaoRef):
+        if self.changed("vertexArray", vaoRef):
+            glBindVertexArray(vaoRef)
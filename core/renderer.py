@@ -1,83 +1,427 @@
+import time
+
+import numpy
 import pygame
+from light.clusteredLighting import ClusteredLighting
 from light.light import Light
+from light.lightCulling import getMeshSpheres, selectLights
 from OpenGL.GL import *
 
+from core.deferredShading import DeferredShading
+from core.headless import HeadlessContext
 from core.mesh import Mesh
+from core.renderState import RenderState
+from core.rendererTarget import RenderTarget
+from core.skybox import Skybox
+from material.depthMaterial import DepthMaterial
 
 
 class Renderer(object):
     def __init__(self, clearColor=[0, 0, 0]):
-        glEnable(GL_DEPTH_TEST)
+        #fixed function state, changed only when materials differ
+        self.renderState = RenderState.getCurrent()
+        self.renderState.setCapability(GL_DEPTH_TEST, True)
         #require for antialiasing
-        glEnable(GL_MULTISAMPLE)
+        self.renderState.setCapability(GL_MULTISAMPLE, True)
         glClearColor(clearColor[0], clearColor[1], clearColor[2], 1)
         #support transparent textures
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        self.windowSize = pygame.display.get_surface().get_size()
+        self.renderState.setCapability(GL_BLEND, True)
+        self.renderState.setBlendFunction(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        #headless runs draw into an offscreen target instead of a window
+        self.windowTarget = None
+        if HeadlessContext.current is not None:
+            self.windowTarget = HeadlessContext.current.renderTarget
+            self.windowSize = (self.windowTarget.width, self.windowTarget.height)
+        else:
+            self.windowSize = pygame.display.get_surface().get_size()
+        #single sampled copy of the window, used by captureFrame when
+        #the window itself is multisampled (created when first needed)
+        self.captureTarget = None
+        #optional core.profiler.Profiler; times each render call
+        #(CPU and GPU), uniform uploads and draw submission
+        self.profiler = None
+        #light textures of materials created with clustered=True
+        #(created when first needed)
+        self.clusteredLighting = None
+        #choose the lights of each mesh with light0..light3 by distance
+        #(see light/lightCulling.py) instead of using the first 4
+        self.lightCulling = True
+        #fills unused light slots
+        self.emptyLight = Light()
+        #light.lightProbes.LightProbeGrid lighting the materials created
+        #with probes=True
+        self.lightProbes = None
+        #materials created with lighting="auto" light meshes whose
+        #bounding sphere is smaller on screen than this many pixels
+        #(diameter) per vertex instead of per fragment
+        self.vertexLightingSize = 48
+        #height in pixels of the target being rendered (set by render)
+        self.viewportHeight = self.windowSize[1]
+        #core.deferredShading.DeferredShading in deferred mode
+        self.deferredShading = None
+        #draw the depth of opaque meshes first (forward rendering only),
+        #so the main pass shades only the nearest fragment of each pixel;
+        #pays off when fragment shading is expensive and meshes overlap.
+        #Measured with benchmark/prepassCrossover.py (llvmpipe, 1280x720,
+        #phong with 4 lights, median frame ms, forward / pre-pass):
+        #  1 layer 80 / 85, 2 layers 125-165 / 65-90, 3: 289 / 113,
+        #  4: 374 / 70, 8: 600 / 108, 12: 580 / 107
+        #so it costs about 5% without overdraw and wins from 2 layers
+        #(lambert with 1 light: 2.4x at 3 layers). Materials opt out
+        #with the setting "depthPrepass"
+        self.depthPrepass = False
+        #program of the pre-pass (created when first needed)
+        self.depthMaterial = None
+
+    #deferred mode: lit meshes are written to a G-buffer and shaded
+    #per light afterwards (see core/deferredShading.py); the scene is
+    #always drawn over the clear color (clearColor and clearDepth of
+    #render are ignored). Returns the DeferredShading object, whose
+    #gBuffer textures post-processing effects can read
+    def enableDeferredShading(self):
+        if self.deferredShading is None:
+            self.deferredShading = DeferredShading(self)
+        return self.deferredShading
+
+    #back to forward rendering
+    def disableDeferredShading(self):
+        self.deferredShading = None
 
-    
 
     def render(self, scene, camera, clearColor=True, clearDepth=True, renderTarget=None):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin("render", gpu=True)
+
+        #world matrices of every transform store in the scene (attached
+        #at the scene or at any subtree)
+        for transformStore in scene.getTransformStores():
+            transformStore.update()
+
+        #extract list of all Mesh objects in scene 
+        #(cached by the scene until objects are added or removed)
+        meshList = scene.getDescendantsOfType(Mesh)
+
+        sceneLights = scene.getDescendantsOfType(Light)
+        #drawn where no mesh writing depth is (see drawWithSkyboxes)
+        skyboxes = [skybox for skybox in scene.getDescendantsOfType(Skybox) if skybox.visible]
+
+        #shadow maps are drawn first, as they use their own framebuffers
+        shadowData = self.renderShadows(meshList, sceneLights, camera)
+
         #activate render target
         if renderTarget == None:
-            #set render target to window
-            glBindFramebuffer(GL_FRAMEBUFFER, 0)
-            glViewport(0, 0, self.windowSize[0], self.windowSize[1])
-        else:
-            #set render target properties
-            glBindFramebuffer(GL_FRAMEBUFFER, renderTarget.framebufferRef)
-            glViewport(0, 0, renderTarget.width, renderTarget.height)
-        
-        #clear color and depth buffers
-        if clearColor:
-            glClear(GL_COLOR_BUFFER_BIT)
-        if clearDepth:
-            glClear(GL_DEPTH_BUFFER_BIT)
+            renderTarget = self.windowTarget
 
         #Update camera view (calculate inverse)
         camera.updateViewMatrix()
+        self.viewportHeight = self.windowSize[1] if renderTarget is None else renderTarget.height
 
-        #extract list of all Mesh objects in scene 
-        descendantList = scene.getDescendantList()
-        meshFilter = lambda x : isinstance(x, Mesh)
-        meshList = list(filter(meshFilter, descendantList))
+        #scenes without lit meshes (e.g. post-processing passes) are
+        #drawn forward
+        if self.deferredShading is not None and self.deferredShading.hasDeferredMeshes(meshList):
+            self.deferredShading.render(meshList, sceneLights, shadowData, camera, renderTarget, skyboxes)
+        else:
+            if renderTarget == None:
+                #set render target to window
+                glBindFramebuffer(GL_FRAMEBUFFER, 0)
+                glViewport(0, 0, self.windowSize[0], self.windowSize[1])
+            else:
+                #set render target properties
+                glBindFramebuffer(GL_FRAMEBUFFER, renderTarget.drawFramebufferRef)
+                glViewport(0, 0, renderTarget.width, renderTarget.height)
+        
+            #clear color and depth buffers
+            if clearColor:
+                glClear(GL_COLOR_BUFFER_BIT)
+            if clearDepth:
+                #the depth buffer is only cleared where writing is enabled
+                self.renderState.setDepthWrite(True)
+                glClear(GL_DEPTH_BUFFER_BIT)
+            prepassMeshes = None
+            if self.depthPrepass:
+                prepassMeshes = self.renderDepthPrepass(meshList, camera)
+            self.drawWithSkyboxes(meshList, skyboxes, camera, sceneLights, shadowData, prepassMeshes)
 
-        lightFilter = lambda x : isinstance(x, Light)
-        lightList = list(filter(lightFilter, descendantList))
+        #multisampled targets must be resolved before being sampled
+        if renderTarget is not None:
+            renderTarget.resolve()
 
-        #scenes support 4 lights; precisely 4 must be present 
-        while len(lightList) < 4:
-            lightList.append(Light())
+        if profiler is not None:
+            profiler.end()
+
+    #draw the depth of the meshes that allow it, with color writes
+    #off; returns the set of ids of the meshes drawn
+    def renderDepthPrepass(self, meshList, camera):
+        if self.profiler is not None:
+            self.profiler.begin("depthPrepass", gpu=True)
+        if self.depthMaterial is None:
+            self.depthMaterial = DepthMaterial()
+        material = self.depthMaterial
+        self.renderState.useProgram(material.programRef)
+        material.uniforms["viewMatrix"].data = camera.viewMatrix
+        material.uniforms["viewMatrix"].uploadData()
+        material.uniforms["projectionMatrix"].data = camera.projectionMatrix
+        material.uniforms["projectionMatrix"].uploadData()
+        self.renderState.setColorWrite(False)
+        prepassMeshes = set()
+        for mesh in meshList:
+            settings = mesh.material.settings
+            #opaque filled triangles only
+            if (not mesh.visible or not settings["depthPrepass"] or not settings["depthTest"]
+                    or not settings["depthWrite"] or settings.get("wireframe", False)
+                    or settings["drawStyle"] not in [GL_TRIANGLES, GL_TRIANGLE_STRIP, GL_TRIANGLE_FAN]):
+                continue
+            #culling of the mesh's material
+            mesh.material.updateRenderSettings()
+            self.renderState.setDepthFunction(GL_LESS)
+            self.renderState.bindVertexArray(mesh.vaoRef)
+            material.uniforms["modelMatrix"].data = mesh.getModelMatrix()
+            material.uniforms["modelMatrix"].uploadData()
+            glDrawArrays(settings["drawStyle"], 0, mesh.geometry.vertexCount)
+            prepassMeshes.add(id(mesh))
+        self.renderState.setColorWrite(True)
+        if self.profiler is not None:
+            self.profiler.end()
+        return prepassMeshes
+
+    #light numbers (positions in lights) for the uniforms light0..light3
+    #of each mesh using them, by mesh id
+    def getLightSlots(self, meshList, lights):
+        meshes = [mesh for mesh in meshList if mesh.visible and "light0" in mesh.material.uniforms.keys()]
+        if not self.lightCulling:
+            firstLights = list(range(min(4, len(lights))))
+            return {id(mesh): firstLights for mesh in meshes}
+        if self.profiler is not None:
+            self.profiler.begin("lightCulling")
+        slots, counts = selectLights(meshes, lights, 4)
+        lightSlots = {id(mesh): slots[n, 0:counts[n]].tolist() for n, mesh in enumerate(meshes)}
+        if self.profiler is not None:
+            self.profiler.end()
+        return lightSlots
+
+    #lighting variant ("fragment" or "vertex") of each mesh whose
+    #material has both, by mesh id
+    def getLightingVariants(self, meshList, camera):
+        meshes = [mesh for mesh in meshList if mesh.visible and "vertex" in mesh.material.variants.keys()
+                  and "fragment" in mesh.material.variants.keys()]
+        if len(meshes) == 0:
+            return {}
+        centers, radii = getMeshSpheres(meshes)
+        depths = -(centers @ camera.viewMatrix[2, 0:3] + camera.viewMatrix[2, 3])
+        #projected diameter in pixels; spheres reaching the camera plane
+        #are treated as covering the screen
+        pixelsPerUnit = camera.projectionMatrix[1][1] * self.viewportHeight / 2
+        sizes = numpy.where(depths > radii, 2 * radii * pixelsPerUnit / numpy.maximum(depths, 1e-6), numpy.inf)
+        return {id(mesh): "vertex" if size < self.vertexLightingSize else "fragment"
+                for mesh, size in zip(meshes, sizes)}
+
+    #probe coefficients (see light/lightProbes.py) at the center of
+    #each mesh with a probe lit material, by mesh id
+    def sampleProbes(self, meshList):
+        if self.lightProbes is None:
+            raise Exception("Materials created with probes=True need Renderer.lightProbes")
+        meshes = [mesh for mesh in meshList if mesh.visible and "shCoefficients" in mesh.material.uniforms.keys()]
+        centers, radii = getMeshSpheres(meshes)
+        coefficients = self.lightProbes.sample(centers)
+        return {id(mesh): coefficients[n] for n, mesh in enumerate(meshes)}
+
+    #drawMeshes, with the skyboxes drawn after the meshes that write
+    #depth and before those that do not (e.g. transparent ones): the
+    #sky only shades pixels no opaque mesh covers, and transparent
+    #meshes still blend over it
+    def drawWithSkyboxes(self, meshList, skyboxes, camera, sceneLights, shadowData, prepassMeshes=None):
+        if len(skyboxes) == 0:
+            self.drawMeshes(meshList, camera, sceneLights, shadowData, prepassMeshes)
+            return
+        lateMeshes = [mesh for mesh in meshList if not mesh.material.settings["depthWrite"]]
+        if len(lateMeshes) > 0:
+            meshList = [mesh for mesh in meshList if mesh.material.settings["depthWrite"]]
+        self.drawMeshes(meshList, camera, sceneLights, shadowData, prepassMeshes)
+        for skybox in skyboxes:
+            skybox.draw(camera)
+        if len(lateMeshes) > 0:
+            self.drawMeshes(lateMeshes, camera, sceneLights, shadowData, prepassMeshes)
+
+    #draw meshes with their own materials into the bound framebuffer;
+    #meshes in prepassMeshes (ids) only draw their nearest fragments
+    def drawMeshes(self, meshList, camera, sceneLights, shadowData, prepassMeshes=None):
+        profiler = self.profiler
+        if profiler is not None:
+            uniformTime = 0
+            drawTime = 0
+        #uniform data of clustered lighting, updated once per frame when
+        #a clustered material is drawn
+        clusterData = None
+        #lights of the meshes with light0..light3 (computed when needed)
+        lightSlots = None
+        #probe coefficients of the meshes (computed when needed)
+        probeData = None
+        #variants of the meshes with materials created with
+        #lighting="auto" (computed when needed)
+        lightingVariants = None
 
         for mesh in meshList:
             #if this object is not visible continue to next object in list
             if not mesh.visible:
                 continue
 
-            glUseProgram(mesh.material.programRef)
+            if len(mesh.material.variants) > 1:
+                if lightingVariants is None:
+                    lightingVariants = self.getLightingVariants(meshList, camera)
+                if id(mesh) in lightingVariants:
+                    mesh.material.useVariant(lightingVariants[id(mesh)])
+
+            self.renderState.useProgram(mesh.material.programRef)
 
             #bind VAO
-            glBindVertexArray(mesh.vaoRef)
+            self.renderState.bindVertexArray(mesh.vaoRef)
 
             #update uniform values stored outside of material
-            mesh.material.uniforms["modelMatrix"].data = mesh.getWorldMatrix()
+            mesh.material.uniforms["modelMatrix"].data = mesh.getModelMatrix()
             mesh.material.uniforms["viewMatrix"].data = camera.viewMatrix
             mesh.material.uniforms["projectionMatrix"].data = camera.projectionMatrix
 
-            #if material uses light data, add lights from list
+            #if material uses light data, add the mesh's lights
+            slots = None
             if "light0" in mesh.material.uniforms.keys():
-                for lightNumber in range(4):
-                    lightName = "light" + str(lightNumber)
-                    lightObject = lightList[lightNumber]
-                    mesh.material.uniforms[lightName].data = lightObject
+                if lightSlots is None:
+                    lightSlots = self.getLightSlots(meshList, sceneLights)
+                slots = lightSlots[id(mesh)]
+                for slot in range(4):
+                    lightName = "light" + str(slot)
+                    if slot < len(slots):
+                        mesh.material.uniforms[lightName].data = sceneLights[slots[slot]]
+                    else:
+                        mesh.material.uniforms[lightName].data = self.emptyLight
+                mesh.material.uniforms["lightCount"].data = len(slots)
+            #all lights, for materials with clustered lighting
+            if "lightData" in mesh.material.uniforms.keys():
+                if clusterData is None:
+                    clusterData = self.updateClusters(sceneLights, camera)
+                for variableName, data in clusterData.items():
+                    mesh.material.uniforms[variableName].data = data
+            #irradiance at the mesh, for materials with probes=True
+            if "shCoefficients" in mesh.material.uniforms.keys():
+                if probeData is None:
+                    probeData = self.sampleProbes(meshList)
+                mesh.material.uniforms["shCoefficients"].data = probeData[id(mesh)]
+            #shadow maps of the lights, for materials with useShadow
+            if "shadowLight" in mesh.material.uniforms.keys():
+                self.setShadowUniforms(mesh, shadowData, slots)
             #add camera position if needed (specular lighting)
             if "viewPosition" in mesh.material.uniforms.keys():
                 mesh.material.uniforms["viewPosition"].data = camera.getWorldPosition()
 
+            if profiler is not None:
+                uploadStart = time.perf_counter()
             #update uniforms stored in material 
             for variableName, uniformObject in mesh.material.uniforms.items():
                 uniformObject.uploadData()
+            if profiler is not None:
+                uploadEnd = time.perf_counter()
+                uniformTime += uploadEnd - uploadStart
             #update render settings
             mesh.material.updateRenderSettings()
+            if prepassMeshes is not None:
+                #depth is already stored: pass only the fragments equal
+                #to it (LEQUAL; both programs declare gl_Position invariant)
+                if id(mesh) in prepassMeshes:
+                    self.renderState.setDepthFunction(GL_LEQUAL)
+                    self.renderState.setDepthWrite(False)
+                else:
+                    self.renderState.setDepthFunction(GL_LESS)
             glDrawArrays(mesh.material.settings["drawStyle"], 0, mesh.geometry.vertexCount)
+            if profiler is not None:
+                drawTime += time.perf_counter() - uploadEnd
+
+        if prepassMeshes is not None:
+            self.renderState.setDepthFunction(GL_LESS)
+
+        if profiler is not None:
+            profiler.addTime("uniforms", uniformTime)
+            profiler.addTime("draw", drawTime)
+
+    #assign the lights to view space clusters (see
+    #light/clusteredLighting.py); returns the uniform data
+    def updateClusters(self, lights, camera):
+        if self.clusteredLighting is None:
+            self.clusteredLighting = ClusteredLighting()
+        if self.profiler is not None:
+            self.profiler.begin("lightClusters")
+        clusterData = self.clusteredLighting.update(lights, camera)
+        if self.profiler is not None:
+            self.profiler.end()
+        return clusterData
+
+    #update the shadow maps of the lights (light numbers are positions
+    #in the scene's light list); returns the uniform data of the first directional
+    #and the first point light shadow, which materials receive
+    def renderShadows(self, meshList, lightList, camera):
+        shadowData = {}
+        shadowLights = [(lightNumber, light) for lightNumber, light in enumerate(lightList)
+                        if light.shadow is not None]
+        if len(shadowLights) == 0:
+            return shadowData
+
+        if self.profiler is not None:
+            self.profiler.begin("shadows", gpu=True)
+        visible = [mesh for mesh in meshList if mesh.visible]
+        #only filled triangles write depth
+        casters = [mesh for mesh in visible if mesh.castShadow
+                   and mesh.material.settings["drawStyle"] in [GL_TRIANGLES, GL_TRIANGLE_STRIP, GL_TRIANGLE_FAN]]
+        receivers = [mesh for mesh in visible if mesh.receiveShadow]
+        for lightNumber, light in shadowLights:
+            #one directional and one point light shadow per material
+            uniformName = "shadowLight" if light.lightType == Light.DIRECTIONAL else "pointShadowLight"
+            if uniformName in shadowData:
+                continue
+            light.shadow.update(casters, receivers, camera)
+            shadowData.update(light.shadow.getUniformData(lightNumber))
+        if self.profiler is not None:
+            self.profiler.end()
+        return shadowData
+
+    #slots: light numbers of the mesh's light0..light3 (None when the
+    #material reads all lights, numbered like the scene's light list)
+    def setShadowUniforms(self, mesh, shadowData, slots=None):
+        uniforms = mesh.material.uniforms
+        for variableName, data in shadowData.items():
+            uniforms[variableName].data = data
+        #shadow light numbers are positions in the scene's light list
+        if slots is not None:
+            for variableName in ["shadowLight", "pointShadowLight"]:
+                if variableName in shadowData:
+                    lightNumber = shadowData[variableName]
+                    uniforms[variableName].data = slots.index(lightNumber) if lightNumber in slots else -1
+        #no shadow on meshes that do not receive them (or without lights
+        #that cast shadows)
+        if not mesh.receiveShadow or "shadowLight" not in shadowData:
+            uniforms["shadowLight"].data = -1
+        if not mesh.receiveShadow or "pointShadowLight" not in shadowData:
+            uniforms["pointShadowLight"].data = -1
+
+    #start an asynchronous readback (see core/frameCapture.py) of the
+    #window, or of a render target; call after render, before flip
+    def captureFrame(self, frameCapture, renderTarget=None):
+        if renderTarget is None:
+            renderTarget = self.windowTarget
+        if renderTarget is not None:
+            renderTarget.captureFrame(frameCapture)
+            return
+
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if glGetIntegerv(GL_SAMPLE_BUFFERS) == 0:
+            frameCapture.readFramebuffer(0)
+            return
+
+        #multisampled pixels cannot be read directly; resolve first
+        if self.captureTarget is None:
+            self.captureTarget = RenderTarget(self.windowSize)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        glReadBuffer(GL_BACK)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.captureTarget.framebufferRef)
+        glBlitFramebuffer(0, 0, self.windowSize[0], self.windowSize[1],
+                        0, 0, self.windowSize[0], self.windowSize[1],
+                        GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        self.captureTarget.captureFrame(frameCapture)
@@ -1,16 +1,26 @@
-import pygame
 from OpenGL.GL import *
 
 from core.texture import Texture
 
 
 class RenderTarget(object):
-    def __init__(self, resolution=[512,512], texture=None, properties={}):
+    def __init__(self, resolution=[512,512], texture=None, properties={}, internalFormat=GL_RGBA8, samples=0,
+                depthTexture=False):
         #values should equal texture dimensions
         self.width, self.height = resolution
+        #color storage format; floating point formats
+        #(GL_RGBA16F, GL_R11F_G11F_B10F, GL_RGBA32F) keep values above 1.0;
+        #None for a depth only target (e.g. a shadow map)
+        self.internalFormat = internalFormat
+        #store depth in a texture that can be sampled (self.depthTexture,
+        #compared against a reference depth by sampler2DShadow) instead
+        #of a renderbuffer; not available for multisampled targets
+        self.depthTexture = None
 
         if texture is not None:
             self.texture = texture
+        elif internalFormat is None:
+            self.texture = None
         else:
             self.texture = Texture(None, 
             {
@@ -19,23 +29,107 @@ class RenderTarget(object):
                 "wrap":GL_CLAMP_TO_EDGE
             })
             self.texture.setProperties(properties)
-            self.texture.surface = pygame.Surface(resolution)
-            self.texture.uploadData()
-        
+            #allocate storage directly; no pixel data is uploaded
+            self.texture.allocateData(self.width, self.height, self.internalFormat)
 
-            #create a framebuffer
-            self.framebufferRef = glGenFramebuffers(1)
-            glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+        #number of samples per pixel; when greater than zero the scene
+        #is drawn into multisampled renderbuffers and resolved into
+        #the texture at the end of each render pass
+        self.samples = min(samples, glGetIntegerv(GL_MAX_SAMPLES)) if samples > 0 else 0
 
-            #configure color buffer to use this texture
+        #create a framebuffer
+        self.framebufferRef = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+
+        #configure color buffer to use this texture
+        if self.texture is not None:
             glFramebufferTexture(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, self.texture.textureRef, 0)
+        else:
+            glDrawBuffer(GL_NONE)
+            glReadBuffer(GL_NONE)
 
+        if depthTexture and self.samples == 0:
+            self.depthTexture = Texture(None,
+            {
+                "magFilter":GL_LINEAR,
+                "minFilter":GL_LINEAR,
+                "wrap":GL_CLAMP_TO_BORDER,
+                "compare":True
+            })
+            self.depthTexture.allocateData(self.width, self.height, GL_DEPTH_COMPONENT24)
+            glFramebufferTexture(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.depthTexture.textureRef, 0)
+            self.checkStatus()
+            self.drawFramebufferRef = self.framebufferRef
+        elif self.samples == 0:
             #generate a buffer to store depth information
-            depthBufferRef = glGenRenderbuffers(1)
-            glBindRenderbuffer(GL_RENDERBUFFER, depthBufferRef)
+            self.depthBufferRef = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depthBufferRef)
+            glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width, self.height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depthBufferRef)
+            self.checkStatus()
+            #framebuffer that render passes draw into
+            self.drawFramebufferRef = self.framebufferRef
+        else:
+            #texture framebuffer only receives the resolved colors
+            self.checkStatus()
+
+            #multisampled framebuffer with color and depth renderbuffers
+            self.multisampleFramebufferRef = glGenFramebuffers(1)
+            glBindFramebuffer(GL_FRAMEBUFFER, self.multisampleFramebufferRef)
+            self.colorBufferRef = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.colorBufferRef)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, self.internalFormat, self.width, self.height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.colorBufferRef)
+            self.depthBufferRef = glGenRenderbuffers(1)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depthBufferRef)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, GL_DEPTH_COMPONENT24, self.width, self.height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depthBufferRef)
+            self.checkStatus()
+            self.drawFramebufferRef = self.multisampleFramebufferRef
+
+    #check status of currently bound framebuffer
+    def checkStatus(self):
+        if(glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE):
+            raise Exception("Framebuffer status error!")
+
+    #copy (average) multisampled colors into the texture;
+    #called by the renderer after drawing into this target
+    def resolve(self):
+        if self.samples == 0:
+            return
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.multisampleFramebufferRef)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self.framebufferRef)
+        glBlitFramebuffer(0, 0, self.width, self.height,
+                        0, 0, self.width, self.height,
+                        GL_COLOR_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebufferRef)
+
+    #start an asynchronous readback of this target's colors
+    #(see core/frameCapture.py); sizes must match
+    def captureFrame(self, frameCapture):
+        if frameCapture.width != self.width or frameCapture.height != self.height:
+            raise Exception("Frame capture size does not match render target size")
+        frameCapture.readFramebuffer(self.framebufferRef)
+
+    #reallocate color and depth storage at a new resolution;
+    #texture and framebuffer references stay the same, so materials
+    #already sampling this target keep working
+    def resize(self, resolution):
+        width, height = int(resolution[0]), int(resolution[1])
+        if width == self.width and height == self.height:
+            return
+        self.width, self.height = width, height
+
+        if self.texture is not None:
+            self.texture.allocateData(self.width, self.height, self.internalFormat)
+
+        if self.depthTexture is not None:
+            self.depthTexture.allocateData(self.width, self.height, GL_DEPTH_COMPONENT24)
+        elif self.samples == 0:
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depthBufferRef)
             glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT, self.width, self.height)
-            glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, depthBufferRef)
-            
-            #check framebuffer status
-            if(glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE):
-                raise Exception("Framebuffer status error!")
+        else:
+            glBindRenderbuffer(GL_RENDERBUFFER, self.colorBufferRef)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, self.internalFormat, self.width, self.height)
+            glBindRenderbuffer(GL_RENDERBUFFER, self.depthBufferRef)
+            glRenderbufferStorageMultisample(GL_RENDERBUFFER, self.samples, GL_DEPTH_COMPONENT24, self.width, self.height)
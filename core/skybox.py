@@ -0,0 +1,46 @@
+from numpy.linalg import inv
+from OpenGL.GL import *
+
+from core.mesh import Mesh
+from core.object3D import Object3D
+from core.renderState import RenderState
+from geometry.geometry import Geometry
+from material.skyboxMaterial import SkyboxMaterial
+
+
+#a cube map texture (see Texture.loadCubeImages and
+#Texture.loadEquirectangularImage) surrounding the scene at infinite
+#distance; rotate it like any object. Renderer.render draws the
+#skyboxes of a scene after the meshes writing depth as one triangle
+#covering the screen at the far plane, so only the pixels no opaque
+#mesh covered are shaded; meshes without depth writes (transparent
+#ones) are drawn afterwards and blend over the sky
+class Skybox(Object3D):
+    def __init__(self, texture, properties={}):
+        super().__init__()
+        self.visible = True
+        #a triangle containing all of clip space [-1, 1]
+        geometry = Geometry()
+        geometry.addAttribute("vec2", "vertexPosition", [[-1, -1], [3, -1], [-1, 3]])
+        geometry.countVertices()
+        self.material = SkyboxMaterial(texture, properties)
+        self.mesh = Mesh(geometry, self.material)
+
+    #draw into the bound framebuffer, seen by camera (view matrix
+    #already updated)
+    def draw(self, camera):
+        #only the rotations: the sky is infinitely far away
+        viewRotation = camera.viewMatrix.copy()
+        viewRotation[0:3, 3] = 0
+        skyRotation = self.getWorldMatrix().copy()
+        skyRotation[0:3, 3] = 0
+        self.material.uniforms["directionMatrix"].data = inv(camera.projectionMatrix @ viewRotation @ skyRotation)
+
+        renderState = RenderState.getCurrent()
+        renderState.useProgram(self.material.programRef)
+        self.material.updateRenderSettings()
+        for variableName, uniformObject in self.material.uniforms.items():
+            uniformObject.uploadData()
+        renderState.bindVertexArray(self.mesh.vaoRef)
+        glDrawArrays(GL_TRIANGLES, 0, self.mesh.geometry.vertexCount)
+        renderState.setDepthFunction(GL_LESS)
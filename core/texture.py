@@ -1,10 +1,29 @@
+import numpy
 import pygame
 import os
 from OpenGL.GL import *
 from PIL import Image
 
+from core.renderState import RenderState
+
 
 class Texture(object):
+    #pixel transfer format and type matching each supported
+    #internal format; used when allocating storage without data
+    pixelFormats = {
+        GL_RGBA8: (GL_RGBA, GL_UNSIGNED_BYTE),
+        GL_RGBA16F: (GL_RGBA, GL_HALF_FLOAT),
+        GL_RGBA32F: (GL_RGBA, GL_FLOAT),
+        GL_R11F_G11F_B10F: (GL_RGB, GL_FLOAT),
+        GL_RGB16F: (GL_RGB, GL_HALF_FLOAT),
+        GL_RGB32F: (GL_RGB, GL_FLOAT),
+        GL_R32F: (GL_RED, GL_FLOAT),
+        GL_RG32F: (GL_RG, GL_FLOAT),
+        #depth textures (shadow maps)
+        GL_DEPTH_COMPONENT24: (GL_DEPTH_COMPONENT, GL_FLOAT),
+        GL_DEPTH_COMPONENT32F: (GL_DEPTH_COMPONENT, GL_FLOAT),
+    }
+
     def __init__(self, fileName=None, properties={}):
         #pygame surface object for storing pixel data;
         #can load from image or manipulation directly
@@ -17,7 +36,11 @@ class Texture(object):
         self.properties = {
             "magFilter":GL_LINEAR,
             "minFilter":GL_LINEAR_MIPMAP_LINEAR,
-            "wrap":GL_REPEAT
+            "wrap":GL_REPEAT,
+            #depth textures only: compare with a reference depth when
+            #sampled (sampler2DShadow / samplerCubeShadow); with linear
+            #filtering the hardware averages four comparisons
+            "compare":False
         }
         
         #Overwrite default property values
@@ -112,3 +135,153 @@ class Texture(object):
         #set default border color to white; 
         #important for rendering shadaws
         glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, [1,1,1,1])
+
+    #allocate GPU storage of the given size and internal format
+    #without uploading pixel data (contents stay undefined until
+    #rendered to); supports floating point formats such as GL_RGBA16F
+    def allocateData(self, width, height, internalFormat=GL_RGBA8):
+        if internalFormat not in Texture.pixelFormats.keys():
+            raise Exception("Unsupported texture internal format: " + str(internalFormat))
+        pixelFormat, pixelType = Texture.pixelFormats[internalFormat]
+
+        glBindTexture(GL_TEXTURE_2D, self.textureRef)
+        glTexImage2D(GL_TEXTURE_2D, 0, internalFormat,
+                    width, height, 0, pixelFormat,
+                    pixelType, None)
+        self.setParameters(GL_TEXTURE_2D)
+
+    #upload a float32 numpy array of shape (height, width, channels)
+    #with 1, 2 or 4 channels as a float texture; for data read in
+    #shaders with texelFetch (use GL_NEAREST filters)
+    def uploadArrayData(self, data):
+        internalFormat = {1: GL_R32F, 2: GL_RG32F, 4: GL_RGBA32F}[data.shape[2]]
+        pixelFormat, pixelType = Texture.pixelFormats[internalFormat]
+
+        glBindTexture(GL_TEXTURE_2D, self.textureRef)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexImage2D(GL_TEXTURE_2D, 0, internalFormat,
+                    data.shape[1], data.shape[0], 0, pixelFormat,
+                    pixelType, numpy.ascontiguousarray(data, dtype=numpy.float32))
+        self.setParameters(GL_TEXTURE_2D)
+
+    #allocate the six square faces of a cube map texture, in the order
+    #+x, -x, +y, -y, +z, -z (bind it as GL_TEXTURE_CUBE_MAP)
+    def allocateCubeData(self, size, internalFormat=GL_RGBA8):
+        if internalFormat not in Texture.pixelFormats.keys():
+            raise Exception("Unsupported texture internal format: " + str(internalFormat))
+        pixelFormat, pixelType = Texture.pixelFormats[internalFormat]
+
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.textureRef)
+        for face in range(6):
+            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + face, 0, internalFormat,
+                        size, size, 0, pixelFormat, pixelType, None)
+        self.setParameters(GL_TEXTURE_CUBE_MAP)
+        glTexParameteri(GL_TEXTURE_CUBE_MAP, GL_TEXTURE_WRAP_R, self.properties["wrap"])
+
+    #load six square images of equal size into a cube map texture
+    #(bind it as GL_TEXTURE_CUBE_MAP), in the order +x, -x, +y, -y,
+    #+z, -z; faces follow the cube map convention of not being flipped
+    def loadCubeImages(self, fileNames):
+        faces = []
+        for fileName in fileNames:
+            self.loadImage(fileName)
+            faces.append(self.getSurfaceArray())
+        self.uploadCubeData(numpy.stack(faces))
+
+    #load an equirectangular panorama (longitude along x, latitude
+    #along y) into a cube map texture with faces of size pixels; the
+    #conversion runs once on the CPU
+    def loadEquirectangularImage(self, fileName, size=512):
+        self.loadImage(fileName)
+        self.uploadCubeData(Texture.equirectangularToCube(self.getSurfaceArray(), size))
+
+    #pixels of the loaded surface as a (height, width, 4) uint8 array,
+    #first row at the top of the image
+    def getSurfaceArray(self):
+        pixelData = pygame.image.tostring(self.surface, "RGBA", False)
+        return numpy.frombuffer(pixelData, dtype=numpy.uint8).reshape(
+            self.surface.get_height(), self.surface.get_width(), 4)
+
+    #world direction of each texel of each cube map face, as
+    #(6, size, size, 3) unit vectors; texel rows follow the face's t
+    #coordinate (OpenGL cube map face selection, inverted)
+    @staticmethod
+    def getCubeDirections(size):
+        centers = (numpy.arange(size) + 0.5) / size * 2 - 1
+        sc, tc = numpy.meshgrid(centers, centers)
+        one = numpy.ones_like(sc)
+        directions = numpy.stack([
+            numpy.stack([one, -tc, -sc], axis=-1),
+            numpy.stack([-one, -tc, sc], axis=-1),
+            numpy.stack([sc, one, tc], axis=-1),
+            numpy.stack([sc, -one, -tc], axis=-1),
+            numpy.stack([sc, -tc, one], axis=-1),
+            numpy.stack([-sc, -tc, -one], axis=-1)
+        ])
+        return directions / numpy.linalg.norm(directions, axis=-1, keepdims=True)
+
+    #cube map faces (6, size, size, channels) from an equirectangular
+    #uint8 image (height, width, channels), with bilinear filtering; the
+    #image center looks along -z
+    @staticmethod
+    def equirectangularToCube(image, size):
+        height, width = image.shape[0:2]
+        directions = Texture.getCubeDirections(size)
+        longitude = numpy.arctan2(directions[..., 0], -directions[..., 2])
+        latitude = numpy.arcsin(numpy.clip(directions[..., 1], -1, 1))
+        x = (0.5 + longitude / (2 * numpy.pi)) * width - 0.5
+        y = (0.5 - latitude / numpy.pi) * height - 0.5
+        x0 = numpy.floor(x).astype(int)
+        y0 = numpy.floor(y).astype(int)
+        fx = (x - x0)[..., None]
+        fy = (y - y0)[..., None]
+        #longitude wraps around, latitude stops at the poles
+        x1 = (x0 + 1) % width
+        x0 = x0 % width
+        y1 = numpy.clip(y0 + 1, 0, height - 1)
+        y0 = numpy.clip(y0, 0, height - 1)
+        image = image.astype(float)
+        top = image[y0, x0] * (1 - fx) + image[y0, x1] * fx
+        bottom = image[y1, x0] * (1 - fx) + image[y1, x1] * fx
+        faces = top * (1 - fy) + bottom * fy
+        return numpy.rint(faces).astype(numpy.uint8)
+
+    #upload (6, size, size, 4) uint8 faces (see allocateCubeData for
+    #the order) and generate mipmaps
+    def uploadCubeData(self, faces):
+        faces = numpy.ascontiguousarray(faces, dtype=numpy.uint8)
+        size = faces.shape[1]
+        glBindTexture(GL_TEXTURE_CUBE_MAP, self.textureRef)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        for face in range(6):
+            glTexImage2D(GL_TEXTURE_CUBE_MAP_POSITIVE_X + face, 0, GL_RGBA8,
+                        size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE, faces[face])
+        glGenerateMipmap(GL_TEXTURE_CUBE_MAP)
+        self.setParameters(GL_TEXTURE_CUBE_MAP)
+        #faces meet without seams: filter across edges, never wrap
+        for wrap in [GL_TEXTURE_WRAP_S, GL_TEXTURE_WRAP_T, GL_TEXTURE_WRAP_R]:
+            glTexParameteri(GL_TEXTURE_CUBE_MAP, wrap, GL_CLAMP_TO_EDGE)
+        RenderState.getCurrent().setCapability(GL_TEXTURE_CUBE_MAP_SEAMLESS, True)
+
+    #allocate an array of layers equally sized 2D images (bind it as
+    #GL_TEXTURE_2D_ARRAY); e.g. the cascades of a shadow map
+    def allocateArrayData(self, width, height, layers, internalFormat=GL_RGBA8):
+        if internalFormat not in Texture.pixelFormats.keys():
+            raise Exception("Unsupported texture internal format: " + str(internalFormat))
+        pixelFormat, pixelType = Texture.pixelFormats[internalFormat]
+
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.textureRef)
+        glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, internalFormat,
+                    width, height, layers, 0, pixelFormat, pixelType, None)
+        self.setParameters(GL_TEXTURE_2D_ARRAY)
+
+    #filtering, wrapping and comparison of the texture bound to target
+    def setParameters(self, target):
+        glTexParameteri(target, GL_TEXTURE_MAG_FILTER, self.properties["magFilter"])
+        glTexParameteri(target, GL_TEXTURE_MIN_FILTER, self.properties["minFilter"])
+        glTexParameteri(target, GL_TEXTURE_WRAP_S, self.properties["wrap"])
+        glTexParameteri(target, GL_TEXTURE_WRAP_T, self.properties["wrap"])
+        glTexParameterfv(target, GL_TEXTURE_BORDER_COLOR, [1,1,1,1])
+        if self.properties["compare"]:
+            glTexParameteri(target, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE)
+            glTexParameteri(target, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
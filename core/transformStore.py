@@ -0,0 +1,187 @@
+import numpy
+
+from core.matrix import Matrix, uploadType
+
+
+#structure of arrays storage for the transforms of a scene graph: the
+#local and world matrices of all nodes live in two contiguous (N,4,4)
+#arrays (local float64, world float32 for uploading; see
+#core/matrix.py) and every attached Object3D holds an index into them, so
+#world matrices are computed with one batched matmul per hierarchy
+#level and many nodes can be moved with a single numpy operation.
+#  store = TransformStore()
+#  store.attach(scene)              #scene and everything below it
+#  store.rotateY(meshes, angles)    #many nodes at once
+#  store.update()                   #Renderer.render does this
+#an attached node's transform is a view into the local array, so the
+#usual Object3D methods keep working; getWorldMatrix returns the world
+#matrix computed by the last update()
+class TransformStore(object):
+    def __init__(self, capacity=1024):
+        self.capacity = max(1, capacity)
+        self.localMatrices = Matrix.makeIdentities(self.capacity)
+        self.worldMatrices = Matrix.makeIdentities(self.capacity).astype(uploadType)
+        #index of the parent of each node; -1 for roots and free slots
+        self.parentIndices = numpy.full(self.capacity, -1, dtype=numpy.int64)
+        #node stored at each index (None: free)
+        self.nodes = [None] * self.capacity
+        self.freeIndices = list(range(self.capacity - 1, -1, -1))
+        #attached subtrees whose parent is not part of the store
+        self.roots = []
+        #(indices, parent indices) of each hierarchy level below the
+        #roots; rebuilt after structure changes
+        self.levels = None
+        #objects using enableTRS whose matrices must be composed
+        self.dirtyNodes = set()
+
+    def getCount(self):
+        return self.capacity - len(self.freeIndices)
+
+    #store the transforms of node and all of its descendants
+    def attach(self, node):
+        for descendant in node.traverse():
+            self.addNode(descendant)
+        self.roots.append(node)
+        self.levels = None
+        #Renderer.render finds the stores to update among the scene's
+        #descendants
+        node.invalidateDescendants()
+
+    #give the transforms of node and its descendants back to them
+    def detach(self, node):
+        if node in self.roots:
+            self.roots.remove(node)
+        for descendant in node.traverse():
+            self.removeNode(descendant)
+        self.levels = None
+        node.invalidateDescendants()
+
+    def addNode(self, node):
+        if node.transformStore is self:
+            return
+        if node.transformStore is not None:
+            raise Exception("Object3D is already part of another TransformStore")
+        if len(self.freeIndices) == 0:
+            self.grow(2 * self.capacity)
+        index = self.freeIndices.pop()
+        self.localMatrices[index] = node.transform
+        self.nodes[index] = node
+        node.transformStore = self
+        node.transformIndex = index
+        node.localMatrix = self.localMatrices[index]
+        #until the next update
+        self.worldMatrices[index] = node.transform
+
+    def removeNode(self, node):
+        if node.transformStore is not self:
+            return
+        index = node.transformIndex
+        node.localMatrix = self.localMatrices[index].copy()
+        node.transformStore = None
+        node.transformIndex = None
+        self.nodes[index] = None
+        self.parentIndices[index] = -1
+        self.freeIndices.append(index)
+
+    #larger arrays; the nodes' transforms become views into them
+    def grow(self, capacity):
+        count = self.capacity
+        for name in ["localMatrices", "worldMatrices"]:
+            matrices = Matrix.makeIdentities(capacity).astype(getattr(self, name).dtype)
+            matrices[:count] = getattr(self, name)
+            setattr(self, name, matrices)
+        parentIndices = numpy.full(capacity, -1, dtype=numpy.int64)
+        parentIndices[:count] = self.parentIndices
+        self.parentIndices = parentIndices
+        self.nodes += [None] * (capacity - count)
+        self.freeIndices = list(range(capacity - 1, count - 1, -1)) + self.freeIndices
+        self.capacity = capacity
+        for node in self.nodes[:count]:
+            if node is not None:
+                node.localMatrix = self.localMatrices[node.transformIndex]
+
+    #called by Object3D.add and remove for nodes in this store
+    def structureChanged(self):
+        self.levels = None
+
+    #group the stored nodes by depth below the roots
+    def buildLevels(self):
+        self.parentIndices[:] = -1
+        self.levels = []
+        level = [node for root in self.roots for node in root.children]
+        while len(level) > 0:
+            indices = numpy.array([node.transformIndex for node in level], dtype=numpy.int64)
+            parents = numpy.array([node.parent.transformIndex for node in level], dtype=numpy.int64)
+            self.parentIndices[indices] = parents
+            self.levels.append((indices, parents))
+            level = [child for node in level for child in node.children]
+
+    #recompute the world matrices of all stored nodes
+    def update(self):
+        if self.levels is None:
+            self.buildLevels()
+        for node in self.dirtyNodes:
+            if node.transformStore is self and node.matrixDirty:
+                node.composeMatrix()
+        self.dirtyNodes.clear()
+        for root in self.roots:
+            index = root.transformIndex
+            if root.parent is None:
+                self.worldMatrices[index] = self.localMatrices[index]
+            else:
+                self.worldMatrices[index] = root.parent.getWorldMatrix() @ self.localMatrices[index]
+        for indices, parents in self.levels:
+            self.worldMatrices[indices] = numpy.matmul(self.worldMatrices[parents],
+                                                      self.localMatrices[indices])
+
+    #indices of a list of stored nodes (or an index array, unchanged)
+    def getIndices(self, nodes):
+        if isinstance(nodes, numpy.ndarray):
+            return nodes
+        return numpy.array([node.transformIndex for node in nodes], dtype=numpy.int64)
+
+    #multiply the local matrices of many nodes by an (N,4,4) array of
+    #matrices (or one 4x4 matrix); nodes must not contain duplicates
+    #or objects using enableTRS, whose matrices are composed from
+    #their position, quaternion and scale factors
+    def applyMatrices(self, nodes, matrices, localCoord=True):
+        indices = self.getIndices(nodes)
+        if localCoord:
+            self.localMatrices[indices] = numpy.matmul(self.localMatrices[indices], matrices)
+        else:
+            self.localMatrices[indices] = numpy.matmul(matrices, self.localMatrices[indices])
+
+    #offsets is an (N,3) array, or one offset for every node
+    def translate(self, nodes, offsets, localCoord=True):
+        indices = self.getIndices(nodes)
+        offsets = numpy.broadcast_to(numpy.asarray(offsets, dtype=float), (len(indices), 3))
+        self.applyMatrices(indices, Matrix.makeTranslations(offsets), localCoord)
+
+    #angles in radians, an array or one angle for every node
+    def rotateX(self, nodes, angles, localCoord=True):
+        self.rotate(nodes, Matrix.makeRotationsX, angles, localCoord)
+
+    def rotateY(self, nodes, angles, localCoord=True):
+        self.rotate(nodes, Matrix.makeRotationsY, angles, localCoord)
+
+    def rotateZ(self, nodes, angles, localCoord=True):
+        self.rotate(nodes, Matrix.makeRotationsZ, angles, localCoord)
+
+    #makeRotations is one of the batched Matrix.makeRotations* functions
+    def rotate(self, nodes, makeRotations, angles, localCoord=True):
+        indices = self.getIndices(nodes)
+        angles = numpy.broadcast_to(numpy.asarray(angles, dtype=float), (len(indices),))
+        self.applyMatrices(indices, makeRotations(angles), localCoord)
+
+    #uniform scale factors, an array or one factor for every node
+    def scale(self, nodes, factors, localCoord=True):
+        indices = self.getIndices(nodes)
+        factors = numpy.broadcast_to(numpy.asarray(factors, dtype=float), (len(indices),))
+        self.applyMatrices(indices, Matrix.makeScales(factors), localCoord)
+
+    #(N,3) array of the local positions of many nodes
+    def getPositions(self, nodes):
+        return self.localMatrices[self.getIndices(nodes), 0:3, 3]
+
+    def setPositions(self, nodes, positions):
+        self.localMatrices[self.getIndices(nodes), 0:3, 3] = positions
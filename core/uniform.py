@@ -1,10 +1,14 @@
+import numpy
 from OpenGL.GL import *
 
 
 class Uniform(object):
     def __init__(self, dataType, data):
         #type of data:
-        # int | bool | float | vec2 | vec3 | vec4 | sampler2D
+        # int | bool | float | vec2 | vec3 | vec4 | mat4 | sampler2D |
+        # sampler2DShadow | sampler2DArrayShadow | samplerCube |
+        # samplerCubeShadow | Light | vec3[] (array of vec3, data (N,3));
+        # sampler data is [texture reference, texture unit]
         self.dataType = dataType
 
         #data to be sent to uniform variable
@@ -46,8 +50,13 @@ class Uniform(object):
             glUniform3f(self.variableRef, self.data[0], self.data[1], self.data[2])
         elif self.dataType == "vec4":
             glUniform4f(self.variableRef, self.data[0], self.data[1], self.data[2], self.data[3])
+        elif self.dataType == "vec3[]":
+            glUniform3fv(self.variableRef, len(self.data), numpy.asarray(self.data, dtype=numpy.float32))
         elif self.dataType == "mat4":
-            glUniformMatrix4fv(self.variableRef, 1, GL_TRUE, self.data)
+            #world and camera matrices are float32 already and pass
+            #through without a copy; others are converted (see
+            #core/matrix.py)
+            glUniformMatrix4fv(self.variableRef, 1, GL_TRUE, numpy.asarray(self.data, dtype=numpy.float32))
         elif self.dataType == "sampler2D":
             textureObjectRef, textureUnitRef = self.data
             #activate texture unit
@@ -56,6 +65,21 @@ class Uniform(object):
             glBindTexture(GL_TEXTURE_2D, textureObjectRef)
             #upload texture unit number (0...15) to uniform variable in shader
             glUniform1i(self.variableRef, textureUnitRef)
+        elif self.dataType == "sampler2DShadow":
+            textureObjectRef, textureUnitRef = self.data
+            glActiveTexture(GL_TEXTURE0 + textureUnitRef)
+            glBindTexture(GL_TEXTURE_2D, textureObjectRef)
+            glUniform1i(self.variableRef, textureUnitRef)
+        elif self.dataType == "sampler2DArrayShadow":
+            textureObjectRef, textureUnitRef = self.data
+            glActiveTexture(GL_TEXTURE0 + textureUnitRef)
+            glBindTexture(GL_TEXTURE_2D_ARRAY, textureObjectRef)
+            glUniform1i(self.variableRef, textureUnitRef)
+        elif self.dataType in ["samplerCube", "samplerCubeShadow"]:
+            textureObjectRef, textureUnitRef = self.data
+            glActiveTexture(GL_TEXTURE0 + textureUnitRef)
+            glBindTexture(GL_TEXTURE_CUBE_MAP, textureObjectRef)
+            glUniform1i(self.variableRef, textureUnitRef)
         elif self.dataType == "Light":
             glUniform1i(self.variableRef["lightType"], self.data.lightType)
             glUniform3f(self.variableRef["color"], self.data.color[0], self.data.color[1], self.data.color[2])
@@ -0,0 +1,286 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, sqrt
+
+import numpy
+from core.texture import Texture
+from geometry.geometry import Geometry
+from light.light import Light
+from light.shadow import DirectionalShadow
+from material.surfaceMaterial import SurfaceMaterial
+from material.textureMaterial import TextureMaterial
+from OpenGL.GL import *
+
+#offline lighting for static scenes: the diffuse part of the lit
+#materials' lightCalc (ambient, directional and point lights, with
+#optional shadow maps of the directional lights) is evaluated once with
+#numpy and stored in each mesh, either per vertex (attribute
+#vertexColor, drawn with SurfaceMaterial) or in a lightmap texture
+#read at generated coordinates vertexUV2 (drawn with TextureMaterial).
+#Baked meshes then cost as little as unlit ones, but no longer respond
+#to lights: the lights and meshes must not move afterwards, and view
+#dependent specular highlights are left out. Meshes are baked in
+#parallel worker processes.
+
+#lights and shadow maps of a worker process (see setBakeLights)
+bakeLights = None
+bakeShadows = None
+
+
+#process pool initializer: the lights are sent to each worker once
+#instead of with every mesh
+def setBakeLights(lights, shadows):
+    global bakeLights, bakeShadows
+    bakeLights = lights
+    bakeShadows = shadows
+
+
+#plain data of lights (picklable, for the worker processes)
+def getLightData(lights):
+    return [{
+        "lightType": light.lightType,
+        "color": numpy.array(light.color, dtype=float),
+        "direction": numpy.array(light.getDirection(), dtype=float),
+        "position": numpy.array(light.getWorldPosition(), dtype=float),
+        "attenuation": numpy.array(light.attenuation, dtype=float)
+    } for light in lights]
+
+
+#fraction of light reaching points (N,3) by a shadow map read back
+#from the GPU: the shader's 3x3 texel comparison, without filtering
+def shadowFactor(positions, shadow):
+    coords = positions @ shadow["matrix"][0:3, 0:3].T + shadow["matrix"][0:3, 3]
+    depth = shadow["depth"]
+    height, width = depth.shape
+    x = numpy.floor(coords[:, 0] * width).astype(int)
+    y = numpy.floor(coords[:, 1] * height).astype(int)
+    lit = numpy.zeros(len(positions))
+    for dx in [-1, 0, 1]:
+        for dy in [-1, 0, 1]:
+            texels = depth[numpy.clip(y + dy, 0, height - 1), numpy.clip(x + dx, 0, width - 1)]
+            lit += texels >= coords[:, 2] - shadow["bias"]
+    lit /= 9
+    #beyond the map (the shader's border color and far plane test)
+    outside = (coords[:, 2] > 1) | (coords[:, 0] < 0) | (coords[:, 0] > 1) | (coords[:, 1] < 0) | (coords[:, 1] > 1)
+    lit[outside] = 1
+    return 1 - shadow["strength"] * (1 - lit)
+
+
+#light reaching world space points (N,3) with normals (N,3): lightCalc
+#of LambertMaterial for every light, times its shadow factor; shadows
+#maps light numbers to shadow data. Returns (N,3) colors
+def calculateLight(positions, normals, lights, shadows={}):
+    normals = normals / numpy.maximum(numpy.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+    total = numpy.zeros((len(positions), 3))
+    for lightNumber, light in enumerate(lights):
+        if light["lightType"] == Light.AMBIENT:
+            total += light["color"]
+            continue
+        if light["lightType"] == Light.DIRECTIONAL:
+            lightDirection = light["direction"] / numpy.linalg.norm(light["direction"])
+            diffuse = numpy.maximum(normals @ -lightDirection, 0)
+        elif light["lightType"] == Light.POINT:
+            offsets = positions - light["position"]
+            distance = numpy.linalg.norm(offsets, axis=1)
+            lightDirection = offsets / numpy.maximum(distance, 1e-12)[:, None]
+            diffuse = numpy.maximum(numpy.einsum("nd,nd->n", normals, -lightDirection), 0)
+            constant, linear, quadratic = light["attenuation"]
+            diffuse /= constant + linear * distance + quadratic * distance * distance
+        else:
+            continue
+        if lightNumber in shadows:
+            diffuse *= shadowFactor(positions, shadows[lightNumber])
+        total += diffuse[:, None] * light["color"]
+    return total
+
+
+#lightmap layout of a mesh with triangleCount triangles: each pair of
+#triangles shares a square cell of a size x size map, one in each
+#half, so every texel belongs to exactly one triangle; returns cells
+#per row and texels per cell side
+def getLightMapLayout(triangleCount, size):
+    columns = ceil(sqrt(ceil(triangleCount / 2)))
+    cellSize = size // columns
+    if cellSize < 4:
+        raise Exception("Lightmap of size " + str(size) + " is too small for " + str(triangleCount) + " triangles")
+    return columns, cellSize
+
+#corners (in cell coordinates, 0 to 1) of the lower and upper triangle
+#of a cell, one texel inside its edges and apart from each other
+def getCellCorners(cellSize):
+    e = 1.0 / cellSize
+    lower = numpy.array([[e, e], [1 - 2*e, e], [e, 1 - 2*e]])
+    upper = numpy.array([[1 - e, 1 - e], [2*e, 1 - e], [1 - e, 2*e]])
+    return lower, upper
+
+#vertexUV2 of the 3 * triangleCount vertices of a mesh, as (3T,2)
+def makeLightMapUVs(triangleCount, size):
+    columns, cellSize = getLightMapLayout(triangleCount, size)
+    lower, upper = getCellCorners(cellSize)
+    triangles = numpy.arange(triangleCount)
+    cells = triangles // 2
+    origins = numpy.stack([cells % columns, cells // columns], axis=1) * cellSize
+    corners = numpy.where((triangles % 2 == 0)[:, None, None], lower, upper)
+    return ((origins[:, None, :] + corners * cellSize) / size).reshape(-1, 2)
+
+#barycentric weights (cellSize, cellSize, 3) of each texel center of a
+#cell (rows along v) relative to the triangle of its half, clamped to
+#the triangle so texels between the halves repeat the nearest edge;
+#and the mask of texels of the upper triangle
+def getCellWeights(cellSize):
+    lower, upper = getCellCorners(cellSize)
+    centers = (numpy.arange(cellSize) + 0.5) / cellSize
+    u, v = numpy.meshgrid(centers, centers)
+    isUpper = u + v >= 1
+    #lower: corner 1 along +u, corner 2 along +v; upper mirrored
+    span = lower[1, 0] - lower[0, 0]
+    b = numpy.where(isUpper, upper[0, 0] - u, u - lower[0, 0]) / span
+    c = numpy.where(isUpper, upper[0, 1] - v, v - lower[0, 1]) / span
+    b = numpy.maximum(b, 0)
+    c = numpy.maximum(c, 0)
+    scale = numpy.maximum(b + c, 1)
+    b /= scale
+    c /= scale
+    return numpy.stack([1 - b - c, b, c], axis=-1), isUpper
+
+
+#bake one mesh (world space positions and normals of its vertices,
+#(N,3)) with the worker's lights; returns (N,3) vertex colors, or with
+#lightMapSize the lightmap (size, size, 3) and vertexUV2 (N,2)
+def bakeMesh(positions, normals, lightMapSize=None):
+    if lightMapSize is None:
+        return calculateLight(positions, normals, bakeLights, bakeShadows)
+
+    triangleCount = len(positions) // 3
+    columns, cellSize = getLightMapLayout(triangleCount, lightMapSize)
+    weights, isUpper = getCellWeights(cellSize)
+    positions = positions[0:3 * triangleCount].reshape(-1, 3, 3)
+    normals = normals[0:3 * triangleCount].reshape(-1, 3, 3)
+    #triangles of the lower and upper half of each cell (an odd last
+    #triangle fills its whole cell)
+    cellCount = ceil(triangleCount / 2)
+    lowerTriangles = numpy.arange(cellCount) * 2
+    upperTriangles = numpy.minimum(lowerTriangles + 1, triangleCount - 1)
+
+    def interpolate(vertexData):
+        lowerData = numpy.einsum("ijv,kvd->kijd", weights, vertexData[lowerTriangles])
+        upperData = numpy.einsum("ijv,kvd->kijd", weights, vertexData[upperTriangles])
+        return numpy.where(isUpper[None, :, :, None], upperData, lowerData).reshape(-1, 3)
+
+    texelLight = calculateLight(interpolate(positions), interpolate(normals), bakeLights, bakeShadows)
+    #cells into rows of the map (row 0 at v = 0)
+    rows = ceil(cellCount / columns)
+    cells = numpy.zeros((rows * columns, cellSize, cellSize, 3))
+    cells[0:cellCount] = texelLight.reshape(cellCount, cellSize, cellSize, 3)
+    image = cells.reshape(rows, columns, cellSize, cellSize, 3).transpose(0, 2, 1, 3, 4)
+    lightMap = numpy.zeros((lightMapSize, lightMapSize, 3))
+    lightMap[0:rows * cellSize, 0:columns * cellSize] = image.reshape(rows * cellSize, columns * cellSize, 3)
+    return lightMap, makeLightMapUVs(triangleCount, lightMapSize)
+
+
+#bakes the light of a fixed set of lights into meshes, replacing their
+#geometry (shared attributes plus the baked ones) and lit material
+class LightBaker(object):
+    def __init__(self, lights, shadows=False, shadowResolution=2048, shadowStrength=0.5,
+                shadowBias=0.001, workers=None):
+        self.lights = lights
+        #darken directional lights by shadow maps of the baked meshes
+        #(and of the casters passed to bake)
+        self.shadows = shadows
+        self.shadowResolution = shadowResolution
+        self.shadowStrength = shadowStrength
+        self.shadowBias = shadowBias
+        #worker processes; 1 bakes in this process
+        self.workers = workers if workers is not None else os.cpu_count()
+        #texture of untextured lightmapped meshes (created when needed)
+        self.whiteTexture = None
+
+    #render a shadow map per directional light and read it back;
+    #returns the shadow data of calculateLight
+    def renderShadows(self, casters, receivers):
+        shadows = {}
+        for lightNumber, light in enumerate(self.lights):
+            if light.lightType != Light.DIRECTIONAL:
+                continue
+            shadow = DirectionalShadow(light, self.shadowResolution, self.shadowStrength, self.shadowBias)
+            shadow.render(casters, receivers)
+            glBindTexture(GL_TEXTURE_2D, shadow.renderTarget.depthTexture.textureRef)
+            depth = glGetTexImage(GL_TEXTURE_2D, 0, GL_DEPTH_COMPONENT, GL_FLOAT)
+            shadows[lightNumber] = {
+                "depth": numpy.asarray(depth, dtype=numpy.float32).reshape(self.shadowResolution, self.shadowResolution),
+                "matrix": numpy.array(shadow.shadowMatrix, dtype=float),
+                "strength": shadow.strength,
+                "bias": shadow.bias
+            }
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        return shadows
+
+    #bake the lights into meshes (drawn as triangles, with vertexNormal
+    #in their geometry); lightMapSize None stores vertex colors,
+    #otherwise each mesh gets a lightmap of that size. casters are
+    #additional meshes casting shadows. Meshes keep their base color
+    #and (lightmaps only) their texture
+    def bake(self, meshes, lightMapSize=None, casters=[]):
+        shadows = {}
+        if self.shadows:
+            shadowCasters = [mesh for mesh in list(meshes) + list(casters) if mesh.castShadow]
+            shadows = self.renderShadows(shadowCasters, meshes)
+        lights = getLightData(self.lights)
+
+        positions = []
+        normals = []
+        for mesh in meshes:
+            matrix = mesh.getWorldMatrix()
+            localPositions = numpy.array(mesh.geometry.attributes["vertexPosition"].data, dtype=float).reshape(-1, 3)
+            localNormals = numpy.array(mesh.geometry.attributes["vertexNormal"].data, dtype=float).reshape(-1, 3)
+            positions.append(localPositions @ matrix[0:3, 0:3].T + matrix[0:3, 3])
+            normals.append(localNormals @ matrix[0:3, 0:3].T)
+
+        sizes = [lightMapSize] * len(meshes)
+        if self.workers > 1 and len(meshes) > 1:
+            with ProcessPoolExecutor(self.workers, initializer=setBakeLights,
+                                     initargs=(lights, shadows)) as executor:
+                results = list(executor.map(bakeMesh, positions, normals, sizes))
+        else:
+            setBakeLights(lights, shadows)
+            results = [bakeMesh(*arguments) for arguments in zip(positions, normals, sizes)]
+
+        for mesh, result in zip(meshes, results):
+            self.applyBake(mesh, result, lightMapSize)
+
+    #give a mesh its own geometry with the baked attributes and an
+    #unlit material
+    def applyBake(self, mesh, result, lightMapSize):
+        oldMaterial = mesh.material
+        geometry = Geometry()
+        geometry.attributes = dict(mesh.geometry.attributes)
+        geometry.vertexCount = mesh.geometry.vertexCount
+        geometry.boundingBox = mesh.geometry.boundingBox
+        baseColor = [1, 1, 1]
+        if "baseColor" in oldMaterial.uniforms.keys():
+            baseColor = oldMaterial.uniforms["baseColor"].data
+
+        if lightMapSize is None:
+            geometry.addAttribute("vec3", "vertexColor", result)
+            material = SurfaceMaterial({"useVertexColors": True, "baseColor": baseColor})
+        else:
+            lightMap, uvs = result
+            geometry.addAttribute("vec2", "vertexUV2", uvs)
+            lightMapTexture = Texture(None, {"magFilter": GL_LINEAR, "minFilter": GL_LINEAR,
+                                             "wrap": GL_CLAMP_TO_EDGE})
+            alpha = numpy.ones(lightMap.shape[0:2] + (1,))
+            lightMapTexture.uploadArrayData(numpy.concatenate([lightMap, alpha], axis=2))
+            #untextured meshes read a white texel
+            if self.whiteTexture is None:
+                self.whiteTexture = Texture(None, {"magFilter": GL_NEAREST, "minFilter": GL_NEAREST})
+                self.whiteTexture.uploadArrayData(numpy.ones((1, 1, 4)))
+            material = TextureMaterial(self.whiteTexture, {"baseColor": baseColor}, lightMap=lightMapTexture)
+            if "useTexture" in oldMaterial.uniforms.keys() and oldMaterial.uniforms["useTexture"].data:
+                material.uniforms["texture"].data = oldMaterial.uniforms["texture"].data
+
+        for name in ["drawStyle", "doubleSide", "wireframe", "lineWidth"]:
+            if name in oldMaterial.settings.keys():
+                material.settings[name] = oldMaterial.settings[name]
+        mesh.geometry = geometry
+        mesh.material = material
+        mesh.associateAttributes()
@@ -9,6 +9,7 @@ class MovementRig(Object3D):
         self.lookAttachment = Object3D()
         self.children = [self.lookAttachment]
         self.lookAttachment.parent = self
+        self.invalidateDescendants()
 
         #control rate of movement
         self.unitsPerSecond = unitsPerSecond
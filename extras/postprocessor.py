@@ -1,3 +1,5 @@
+from OpenGL.GL import *
+
 from core.camera import Camera
 from core.mesh import Mesh
 from core.renderer import Renderer
@@ -13,6 +15,10 @@ class Postprocessor(object):
         self.cameraList = [camera]
         self.renderTargetList = [finalRenderTarget]
         self.finalRenderTarget = finalRenderTarget
+        #intermediate targets are sized at resolution * resolutionScale;
+        #the last pass always writes the full resolution final target
+        self.resolution = list(self.renderer.windowSize)
+        self.resolutionScale = 1.0
         self.orthoCamera = Camera()
         #aligned with clip space by default
         self.orthoCamera.setOrthographic()
@@ -27,10 +33,14 @@ class Postprocessor(object):
         self.rectangleGeo.addAttribute("vec2", "vertexUV", uvData)
         self.rectangleGeo.countVertices()
 
-    def addEffect(self, effect):
+    #internalFormat is the color format of the target this effect reads,
+    #i.e. the output of the previous pass (the scene for the first effect);
+    #use GL_RGBA16F / GL_R11F_G11F_B10F / GL_RGBA32F to keep HDR values;
+    #samples > 0 antialiases that pass (useful for the scene pass)
+    def addEffect(self, effect, internalFormat=GL_RGBA8, samples=0):
         postScene = Scene()
-        resolution = self.renderer.windowSize
-        target = RenderTarget(resolution)
+        resolution = self.getScaledResolution()
+        target = RenderTarget(resolution, internalFormat=internalFormat, samples=samples)
 
         #change the previous entry in the render target list
         # to this newly created render target
@@ -40,6 +50,8 @@ class Postprocessor(object):
         #that was written to in the previous render pass
         effect.uniforms["texture"].data[0] = target.texture.textureRef
 
+        #one screen filling rectangle, nothing for a depth pre-pass to save
+        effect.settings["depthPrepass"] = False
         mesh = Mesh(self.rectangleGeo, effect)
         postScene.add(mesh)
 
@@ -47,12 +59,35 @@ class Postprocessor(object):
         self.cameraList.append(self.orthoCamera)
         self.renderTargetList.append(self.finalRenderTarget)
 
+    #resolution of the intermediate render targets
+    def getScaledResolution(self):
+        return [
+            max(1, int(self.resolution[0] * self.resolutionScale)),
+            max(1, int(self.resolution[1] * self.resolutionScale))
+        ]
 
+    #resize every intermediate target; the scene and all but the last
+    #effect render at the reduced size and the last effect upscales
+    #while writing to the final target
+    def setResolutionScale(self, scale):
+        self.resolutionScale = scale
+        resolution = self.getScaledResolution()
+        for target in self.renderTargetList[:-1]:
+            target.resize(resolution)
 
     def render(self):
+        profiler = self.renderer.profiler
         passes = len(self.sceneList)
         for n in range(passes):
             scene = self.sceneList[n]
             camera = self.cameraList[n]
             target = self.renderTargetList[n]
+            if profiler is not None:
+                #name each pass after its effect
+                if n == 0:
+                    profiler.begin("scene")
+                else:
+                    profiler.begin(str(n) + " " + scene.children[0].material.__class__.__name__)
             self.renderer.render(scene, camera, renderTarget=target)
+            if profiler is not None:
+                profiler.end()
@@ -0,0 +1,51 @@
+import time
+
+from core.camera import Camera
+from core.mesh import Mesh
+from core.scene import Scene
+from extras.textTexture import TextTexture
+from geometry.rectangleGeometry import RectangleGeometry
+from material.textureMaterial import TextureMaterial
+
+
+#on-screen table of profiler statistics (mean / p95 / max, in ms),
+#drawn in the top left corner of the window after everything else
+class ProfilerOverlay(object):
+    def __init__(self, profiler, renderer, refreshInterval=0.5, maxLines=16,
+                fontSize=14, imageSize=[420, 300]):
+        self.profiler = profiler
+        self.renderer = renderer
+        #seconds between text updates; re-rendering text every frame
+        #would cost more than most of what is being measured
+        self.refreshInterval = refreshInterval
+        self.lastRefresh = 0
+        self.maxLines = maxLines
+
+        self.texture = TextTexture(text="profiler", systemFontName="Courier New,DejaVu Sans Mono,monospace",
+            fontSize=fontSize, fontColor=[255,255,255], backgroundColor=[0,0,0,160],
+            imageWidth=imageSize[0], imageHeight=imageSize[1])
+        #text is drawn at 1:1 scale; mipmap filtering would only blur it
+        self.texture.properties["minFilter"] = self.texture.properties["magFilter"]
+
+        #rectangle in clip space, aligned with the top left corner
+        width = 2 * imageSize[0] / renderer.windowSize[0]
+        height = 2 * imageSize[1] / renderer.windowSize[1]
+        geometry = RectangleGeometry(width, height, position=[-1, 1], alignment=[0, 1])
+        material = TextureMaterial(self.texture)
+        self.scene = Scene()
+        self.scene.add(Mesh(geometry, material))
+        self.camera = Camera()
+        self.camera.setOrthographic()
+
+    def render(self, renderTarget=None):
+        currentTime = time.perf_counter()
+        if currentTime - self.lastRefresh >= self.refreshInterval:
+            self.lastRefresh = currentTime
+            lines = ["%-24s %7s %7s %7s" % ("scope (ms)", "mean", "p95", "max")]
+            lines += self.profiler.getReport()[0:self.maxLines]
+            self.texture.setText("\n".join(lines))
+        #keep the overlay itself out of the statistics
+        profiler = self.renderer.profiler
+        self.renderer.profiler = None
+        self.renderer.render(self.scene, self.camera, clearColor=False, renderTarget=renderTarget)
+        self.renderer.profiler = profiler
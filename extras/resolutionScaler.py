@@ -0,0 +1,99 @@
+import math
+import time
+from collections import deque
+
+from OpenGL.GL import *
+
+from effects.templateEffect import TemplateEffect
+
+
+#picks the render resolution of a Postprocessor every frame so that
+#the measured frame time stays close to a target budget
+class ResolutionScaler(object):
+    def __init__(self, postprocessor, targetFrameTime=1/60, minScale=0.5,
+                maxScale=1.0, scaleStep=0.05, hysteresis=0.1,
+                sampleCount=10, cooldownFrames=30, synchronize=True):
+        self.postprocessor = postprocessor
+        #frame time budget in seconds
+        self.targetFrameTime = targetFrameTime
+        #limits of the scale factor applied to width and height
+        self.minScale = minScale
+        self.maxScale = maxScale
+        #scales are rounded to multiples of this step, so render
+        #targets are only reallocated for meaningful changes
+        self.scaleStep = scaleStep
+        #no change while the average frame time is within
+        #targetFrameTime * (1 +/- hysteresis)
+        self.hysteresis = hysteresis
+        #number of frames averaged before making a decision
+        self.frameTimes = deque(maxlen=sampleCount)
+        #minimum number of frames between two scale changes
+        self.cooldownFrames = cooldownFrames
+        self.framesSinceChange = 0
+        #wait for the GPU to finish each frame before reading the clock;
+        #without it only the CPU submission time is measured
+        self.synchronize = synchronize
+
+        #current scale and the average frame time it was chosen from;
+        #exposed for logging
+        self.scale = postprocessor.resolutionScale
+        self.averageFrameTime = 0
+
+        #a scene rendered straight to the final target cannot be
+        #scaled; add a copy pass that performs the final upscale
+        if len(postprocessor.sceneList) == 1:
+            postprocessor.addEffect(TemplateEffect())
+
+        self.setScale(min(max(self.scale, minScale), maxScale))
+
+    #render all passes, measure the frame and adjust the scale
+    def render(self):
+        startTime = time.perf_counter()
+        self.postprocessor.render()
+        if self.synchronize:
+            glFinish()
+        self.update(time.perf_counter() - startTime)
+
+    #feed one frame time measurement (seconds) to the controller;
+    #can be called directly when frames are timed elsewhere
+    def update(self, frameTime):
+        self.frameTimes.append(frameTime)
+        self.framesSinceChange += 1
+
+        if len(self.frameTimes) < self.frameTimes.maxlen:
+            return
+        self.averageFrameTime = sum(self.frameTimes) / len(self.frameTimes)
+        if self.framesSinceChange < self.cooldownFrames:
+            return
+
+        upperLimit = self.targetFrameTime * (1 + self.hysteresis)
+        lowerLimit = self.targetFrameTime * (1 - self.hysteresis)
+        if lowerLimit <= self.averageFrameTime <= upperLimit:
+            return
+
+        #fragment cost grows with the pixel count (scale squared),
+        #so estimate the scale that would exactly meet the budget
+        estimate = self.scale * math.sqrt(self.targetFrameTime / max(self.averageFrameTime, 1e-6))
+        if self.averageFrameTime > upperLimit:
+            #drop quickly, at least one step
+            newScale = min(estimate, self.scale - self.scaleStep)
+        else:
+            #recover slowly, one step at a time
+            newScale = min(estimate, self.scale + self.scaleStep)
+        self.setScale(newScale)
+
+    def setScale(self, scale):
+        scale = min(max(scale, self.minScale), self.maxScale)
+        scale = round(scale / self.scaleStep) * self.scaleStep
+        scale = min(max(scale, self.minScale), self.maxScale)
+        if scale == self.postprocessor.resolutionScale and scale == self.scale:
+            return
+        self.scale = scale
+        self.postprocessor.setResolutionScale(scale)
+        #measurements taken at the old scale no longer apply
+        self.frameTimes.clear()
+        self.framesSinceChange = 0
+
+    #resolution currently used by the scene pass
+    def getResolution(self):
+        return self.postprocessor.getScaledResolution()
@@ -5,49 +5,69 @@ from core.texture import Texture
 class TextTexture(Texture):
     def __init__(self, text="Enter text here!", systemFontName="Arial",
                 fontFileName=None, fontSize=24, fontColor=[0,0,0],
-                backgroundColor=[255,255,255], transparent=False, 
+                backgroundColor=[255,255,255], transparent=False,
                 imageWidth=None, imageHeight=None, alignHorizontal=0.0,
                 alignVertical=0.0, imageBorderWidth=0, imageBorderColor=[0,0,0]):
                 super().__init__()
-                
+
                 #default font
-                font = pygame.font.SysFont(systemFontName, fontSize)
+                self.font = pygame.font.SysFont(systemFontName, fontSize)
                 #can override by loading font file
                 if fontFileName is not None:
-                    font = pygame.font.Font(fontFileName, fontSize)
-                
-                #render text to (antialiased) surface
-                fontSurface = font.render(text, True, fontColor)
-
-                #determine size of rendered text for aligment purpose
-                (textWidth, textHeight) = font.size(text)
-
-                #if image dimensions are not specified use font surface size default
-
-                if imageWidth is None:
-                    imageWidth = textWidth
-                if imageHeight is None:
-                    imageHeight = textHeight
-
-                #create surface to store image of text (with transparent
-                # channel by default) 
-                self.surface = pygame.Surface((imageWidth, imageHeight), pygame.SRCALPHA)
-
-                #background color used when not transparent i not transparent
-                self.surface.fill(backgroundColor)
-
-                #alignHorizontal, alignVertical are percentages, 
-                #measured from top-left corner
-                cornerPoint = (alignHorizontal * (imageWidth-textWidth),
-                                alignVertical * (imageHeight-textHeight))
-                
-                destinationRectangle = fontSurface.get_rect(topleft=cornerPoint)
-
-                #optional: add border
-                if imageBorderWidth > 0:
-                    pygame.draw.rect(self.surface, imageBorderColor,
-                    [0,0, imageWidth, imageHeight], imageBorderWidth)
-
-                #apply fontSurface to correct position on final surface
-                self.surface.blit(fontSurface, destinationRectangle)
-                self.uploadData()
+                    self.font = pygame.font.Font(fontFileName, fontSize)
+
+                #keep settings so the text can be changed later
+                self.fontColor = fontColor
+                self.backgroundColor = backgroundColor
+                self.imageWidth = imageWidth
+                self.imageHeight = imageHeight
+                self.alignHorizontal = alignHorizontal
+                self.alignVertical = alignVertical
+                self.imageBorderWidth = imageBorderWidth
+                self.imageBorderColor = imageBorderColor
+
+                self.setText(text)
+
+    #render text (may contain line breaks) and upload it to the
+    #existing texture object
+    def setText(self, text):
+        lines = text.split("\n")
+        #render text to (antialiased) surfaces
+        fontSurfaces = [self.font.render(line, True, self.fontColor) for line in lines]
+
+        #determine size of rendered text for aligment purpose
+        lineHeight = self.font.get_linesize()
+        textWidth = max([self.font.size(line)[0] for line in lines])
+        textHeight = lineHeight * (len(lines) - 1) + self.font.size(lines[-1])[1]
+
+        #if image dimensions are not specified use font surface size default
+        imageWidth = self.imageWidth
+        imageHeight = self.imageHeight
+        if imageWidth is None:
+            imageWidth = textWidth
+        if imageHeight is None:
+            imageHeight = textHeight
+
+        #create surface to store image of text (with transparent
+        # channel by default)
+        self.surface = pygame.Surface((imageWidth, imageHeight), pygame.SRCALPHA)
+
+        #background color used when not transparent i not transparent
+        self.surface.fill(self.backgroundColor)
+
+        #alignHorizontal, alignVertical are percentages,
+        #measured from top-left corner
+        cornerPoint = (self.alignHorizontal * (imageWidth-textWidth),
+                        self.alignVertical * (imageHeight-textHeight))
+
+        #optional: add border
+        if self.imageBorderWidth > 0:
+            pygame.draw.rect(self.surface, self.imageBorderColor,
+            [0,0, imageWidth, imageHeight], self.imageBorderWidth)
+
+        #apply fontSurfaces to correct position on final surface
+        for lineNumber, fontSurface in enumerate(fontSurfaces):
+            destinationRectangle = fontSurface.get_rect(
+                topleft=(cornerPoint[0], cornerPoint[1] + lineNumber * lineHeight))
+            self.surface.blit(fontSurface, destinationRectangle)
+        self.uploadData()
@@ -13,6 +13,10 @@ class Geometry(object):
        #number of vertices
        self.vertexCount = None
 
+       #(minimum, maximum) corners of the vertex positions, computed
+       #when first needed (see getBoundingBox)
+       self.boundingBox = None
+
     def addAttribute(self, dataType, variableName, data):
         self.attributes[variableName] = Attribute(
             dataType, data)
@@ -25,6 +29,31 @@ class Geometry(object):
         self.vertexCount = len(attrib.data)
 
 
+    #axis aligned bounds of the vertex positions, as two numpy arrays
+    #of 3 coordinates (positions with fewer components, e.g. vec2, lie
+    #at 0 on the missing axes; vec4 positions use x, y and z)
+    def getBoundingBox(self):
+        if self.boundingBox is None:
+            attribute = self.attributes["vertexPosition"]
+            size = {"float": 1, "vec2": 2, "vec3": 3, "vec4": 4}[attribute.dataType]
+            data = numpy.array(attribute.data, dtype=float).reshape(-1, size)
+            positions = numpy.zeros((len(data), 3))
+            positions[:, 0:min(size, 3)] = data[:, 0:3]
+            self.boundingBox = (positions.min(axis=0), positions.max(axis=0))
+        return self.boundingBox
+
+    #(center, radius) of a sphere containing the bounding box
+    def getBoundingSphere(self):
+        low, high = self.getBoundingBox()
+        return (low + high) * 0.5, numpy.linalg.norm(high - low) * 0.5
+
+    #the 8 corners of the bounding box, as an (8,4) array of
+    #homogeneous coordinates
+    def getBoundingCorners(self):
+        low, high = self.getBoundingBox()
+        return numpy.array([[x, y, z, 1] for x in (low[0], high[0])
+                            for y in (low[1], high[1]) for z in (low[2], high[2])])
+
     #transform the data in an attribute using a matrix
     def applyMatrix(self, matrix, variableName = "vertexPosition"):
         oldPositionData = self.attributes[variableName].data
@@ -56,7 +85,7 @@ class Geometry(object):
             newNormal = oldNormal.copy()
             newNormal = rotationMatrix @ newNormal
             newVertexNormalData.append(newNormal)
-        self.addAttribute["vertexNormal"].data = newVertexNormalData
+        self.attributes["vertexNormal"].data = newVertexNormalData
 
         oldFaceNormalData = self.attributes["faceNormal"].data
 
@@ -68,6 +97,9 @@ class Geometry(object):
         self.attributes["faceNormal"].data = newFaceNormalData
         #new data must be uplouded
         self.attributes[variableName].uploadData()
+        self.attributes["vertexNormal"].uploadData()
+        self.attributes["faceNormal"].uploadData()
+        self.boundingBox = None
 
     #merge data from attributes of other geometry into this object
     #requires both geometries to have attributes with same names
@@ -79,3 +111,4 @@ class Geometry(object):
 
         #update the number of vertices
         self.countVertices()
+        self.boundingBox = None
@@ -0,0 +1,258 @@
+from math import ceil
+
+import numpy
+from OpenGL.GL import *
+
+from core.texture import Texture
+from light.shadow import getPerspectiveRange
+
+#clustered forward lighting: materials created with clustered=True
+#read the lights of the scene from textures instead of the uniforms
+#light0..light3, so scenes may contain any number of lights. The view
+#frustum is divided into a grid of clusters (screen tiles times
+#depth slices, the slices growing logarithmically with distance);
+#each frame Renderer.render lists the point lights whose radius
+#(PointLight.getRadius) reaches each cluster, and a fragment only
+#evaluates the ambient and directional lights plus the point lights
+#of its own cluster
+
+#texture units of the light textures
+lightDataUnit = 6
+clusterDataUnit = 7
+lightIndicesUnit = 8
+
+#width of the light index texture (rows are added as needed)
+indexTextureWidth = 1024
+
+#GLSL shared by lit materials: totalLight(position, normal) sums the
+#light at a point, using lightCalc(Light, position, normal) and
+#shadowFactor(lightNumber, position), which must be declared before
+
+#up to four lights uploaded as uniforms light0..light3, chosen per
+#mesh by the renderer (see light/lightCulling.py); only the first
+#lightCount are evaluated. The count is the same for the whole draw,
+#so the skipped lights cost no shading work
+fixedLightsShaderCode = """
+uniform Light light0;
+uniform Light light1;
+uniform Light light2;
+uniform Light light3;
+uniform int lightCount;
+
+vec3 totalLight(vec3 pointPosition, vec3 pointNormal)
+{
+    vec3 total = vec3(0,0,0);
+    if(lightCount > 0)
+        total += lightCalc(light0, pointPosition, pointNormal) * shadowFactor(0, pointPosition);
+    if(lightCount > 1)
+        total += lightCalc(light1, pointPosition, pointNormal) * shadowFactor(1, pointPosition);
+    if(lightCount > 2)
+        total += lightCalc(light2, pointPosition, pointNormal) * shadowFactor(2, pointPosition);
+    if(lightCount > 3)
+        total += lightCalc(light3, pointPosition, pointNormal) * shadowFactor(3, pointPosition);
+    return total;
+}
+"""
+
+#all lights of the scene, stored in textures (see ClusteredLighting);
+#viewMatrix and projectionMatrix must be declared before
+clusteredLightsShaderCode = """
+//4 texels per light: (type, color), (direction, light number),
+//(position, 0), (attenuation, range)
+uniform sampler2D lightData;
+//(offset in lightIndices, light count) per cluster; x: tile column,
+//y: tile row + depth slice * rows
+uniform sampler2D clusterData;
+uniform sampler2D lightIndices;
+//number of clusters along x, y and depth
+uniform vec3 clusterGrid;
+//view distance of the first and last depth slice (camera near, far)
+uniform vec2 clusterRange;
+//the first lights in lightData affect every cluster (ambient and
+//directional lights)
+uniform int globalLightCount;
+
+const int lightIndexWidth = """ + str(indexTextureWidth) + """;
+
+Light getLight(int row, out int lightNumber)
+{
+    vec4 typeColor = texelFetch(lightData, ivec2(0, row), 0);
+    vec4 direction = texelFetch(lightData, ivec2(1, row), 0);
+    Light sceneLight;
+    sceneLight.lightType = int(typeColor.x);
+    sceneLight.color = typeColor.yzw;
+    sceneLight.direction = direction.xyz;
+    sceneLight.position = texelFetch(lightData, ivec2(2, row), 0).xyz;
+    sceneLight.attenuation = texelFetch(lightData, ivec2(3, row), 0).xyz;
+    lightNumber = int(direction.w);
+    return sceneLight;
+}
+
+//(offset, count) of the cluster containing a world space point
+ivec2 getCluster(vec3 pointPosition)
+{
+    ivec3 grid = ivec3(clusterGrid);
+    vec4 viewPosition = viewMatrix * vec4(pointPosition, 1.0);
+    vec4 clipPosition = projectionMatrix * viewPosition;
+    vec2 screen = clipPosition.xy / clipPosition.w * 0.5 + 0.5;
+    ivec2 tile = clamp(ivec2(screen * vec2(grid.xy)), ivec2(0), grid.xy - 1);
+    float depth = max(-viewPosition.z, clusterRange.x);
+    int slice = int(log(depth / clusterRange.x) / log(clusterRange.y / clusterRange.x) * float(grid.z));
+    slice = clamp(slice, 0, grid.z - 1);
+    return ivec2(texelFetch(clusterData, ivec2(tile.x, tile.y + slice * grid.y), 0).xy);
+}
+
+vec3 totalLight(vec3 pointPosition, vec3 pointNormal)
+{
+    vec3 total = vec3(0,0,0);
+    int lightNumber;
+    for(int row = 0; row < globalLightCount; row++)
+    {
+        Light sceneLight = getLight(row, lightNumber);
+        total += lightCalc(sceneLight, pointPosition, pointNormal) * shadowFactor(lightNumber, pointPosition);
+    }
+    ivec2 cluster = getCluster(pointPosition);
+    for(int i = cluster.x; i < cluster.x + cluster.y; i++)
+    {
+        int row = int(texelFetch(lightIndices, ivec2(i % lightIndexWidth, i / lightIndexWidth), 0).x);
+        Light sceneLight = getLight(row, lightNumber);
+        total += lightCalc(sceneLight, pointPosition, pointNormal) * shadowFactor(lightNumber, pointPosition);
+    }
+    return total;
+}
+"""
+
+#uniforms used by fixedLightsShaderCode
+def addFixedLightUniforms(material):
+    material.addUniform("Light", "light0", None)
+    material.addUniform("Light", "light1", None)
+    material.addUniform("Light", "light2", None)
+    material.addUniform("Light", "light3", None)
+    material.addUniform("int", "lightCount", 0)
+
+#uniforms used by clusteredLightsShaderCode
+def addClusterUniforms(material):
+    material.addUniform("sampler2D", "lightData", [0, lightDataUnit])
+    material.addUniform("sampler2D", "clusterData", [0, clusterDataUnit])
+    material.addUniform("sampler2D", "lightIndices", [0, lightIndicesUnit])
+    material.addUniform("vec3", "clusterGrid", [1, 1, 1])
+    material.addUniform("vec2", "clusterRange", [0.1, 1])
+    material.addUniform("int", "globalLightCount", 0)
+
+
+#view distances bounding the depth slices; returns count + 1 values
+def getSliceDepths(near, far, count):
+    return near * (far / near) ** (numpy.arange(count + 1) / count)
+
+#clusters reached by spheres (view space centers (N,3), radii (N,))
+#in a grid of (columns, rows, slices) clusters of a perspective
+#projection; returns cluster data (slices * rows, columns, 2) of
+#(offset, count) and the indices of the spheres in each cluster,
+#concatenated in cluster order
+def assignLights(centers, radii, projectionMatrix, grid):
+    columns, rows, slices = grid
+    near, far = getPerspectiveRange(projectionMatrix)
+    depths = getSliceDepths(near, far, slices)
+    sliceNear = depths[:-1]
+    sliceFar = depths[1:]
+    centers = numpy.asarray(centers, dtype=float).reshape(-1, 3)
+    radii = numpy.asarray(radii, dtype=float).reshape(-1)
+
+    #distance from each sphere center to the box around each cluster,
+    #per axis; boxes are the extents of each tile over the slice depths
+    def axisDistances(coordinate, count, scale):
+        edges = numpy.linspace(-1, 1, count + 1)
+        #(slices, count) box bounds along the axis
+        low = numpy.minimum(edges[:-1] * sliceNear[:, None], edges[:-1] * sliceFar[:, None]) / scale
+        high = numpy.maximum(edges[1:] * sliceNear[:, None], edges[1:] * sliceFar[:, None]) / scale
+        c = coordinate[:, None, None]
+        return numpy.maximum(numpy.maximum(low - c, c - high), 0)
+
+    dx = axisDistances(centers[:, 0], columns, projectionMatrix[0, 0])
+    dy = axisDistances(centers[:, 1], rows, projectionMatrix[1, 1])
+    depth = -centers[:, 2][:, None]
+    dz = numpy.maximum(numpy.maximum(sliceNear - depth, depth - sliceFar), 0)
+
+    #(N, slices, rows, columns)
+    distanceSquared = (dz * dz)[:, :, None, None] + (dy * dy)[:, :, :, None] + (dx * dx)[:, :, None, :]
+    reached = distanceSquared <= (radii * radii)[:, None, None, None]
+
+    #(clusters, N), clusters in slice, row, column order
+    reached = reached.reshape(len(radii), -1).T
+    counts = reached.sum(axis=1)
+    offsets = numpy.cumsum(counts) - counts
+    indices = numpy.nonzero(reached)[1]
+    clusterData = numpy.stack([offsets, counts], axis=-1).reshape(slices * rows, columns, 2)
+    return clusterData, indices
+
+
+#light textures and cluster lists, updated once per frame by
+#Renderer.render
+class ClusteredLighting(object):
+    def __init__(self, grid=[16, 9, 24]):
+        #clusters along screen x, screen y and depth
+        self.grid = grid
+        properties = {
+            "magFilter":GL_NEAREST,
+            "minFilter":GL_NEAREST,
+            "wrap":GL_CLAMP_TO_EDGE
+        }
+        self.lightData = Texture(None, properties)
+        self.clusterData = Texture(None, properties)
+        self.lightIndices = Texture(None, properties)
+        #for measurement: lights of the last update, and the most
+        #lights a cluster contained
+        self.lightCount = 0
+        self.maxClusterLights = 0
+
+    #upload lights (all lights of the scene; their position in the list
+    #is their light number, used by shadows) as seen by camera;
+    #returns the data of the uniforms added by addClusterUniforms
+    def update(self, lights, camera):
+        #lights affecting every cluster come first
+        globalLights = []
+        pointLights = []
+        pointRanges = []
+        for lightNumber, light in enumerate(lights):
+            lightRange = light.getRadius()
+            if lightRange is None:
+                globalLights.append((lightNumber, light))
+            else:
+                pointLights.append((lightNumber, light))
+                pointRanges.append(lightRange)
+        rows = globalLights + pointLights
+
+        lightData = numpy.zeros((max(len(rows), 1), 4, 4), dtype=numpy.float32)
+        for row, (lightNumber, light) in enumerate(rows):
+            lightData[row, 0] = [light.lightType] + list(light.color)
+            lightData[row, 1, 0:3] = light.getDirection()
+            lightData[row, 1, 3] = lightNumber
+            lightData[row, 2, 0:3] = light.getWorldPosition()
+            lightData[row, 3, 0:3] = light.attenuation
+        lightData[len(globalLights):len(rows), 3, 3] = pointRanges
+
+        #point light positions in view space
+        positions = lightData[len(globalLights):len(rows), 2, 0:3]
+        centers = positions @ camera.viewMatrix[0:3, 0:3].T + camera.viewMatrix[0:3, 3]
+        clusterData, indices = assignLights(centers, pointRanges, camera.projectionMatrix, self.grid)
+        #cluster lists hold rows of lightData
+        indices = indices + len(globalLights)
+
+        indexRows = max(ceil(len(indices) / indexTextureWidth), 1)
+        indexData = numpy.zeros(indexRows * indexTextureWidth, dtype=numpy.float32)
+        indexData[0:len(indices)] = indices
+
+        self.lightData.uploadArrayData(lightData)
+        self.clusterData.uploadArrayData(clusterData.astype(numpy.float32))
+        self.lightIndices.uploadArrayData(indexData.reshape(indexRows, indexTextureWidth, 1))
+        self.lightCount = len(rows)
+        self.maxClusterLights = int(clusterData[:, :, 1].max())
+
+        return {
+            "lightData": [self.lightData.textureRef, lightDataUnit],
+            "clusterData": [self.clusterData.textureRef, clusterDataUnit],
+            "lightIndices": [self.lightIndices.textureRef, lightIndicesUnit],
+            "clusterGrid": self.grid,
+            "clusterRange": list(getPerspectiveRange(camera.projectionMatrix)),
+            "globalLightCount": len(globalLights)
+        }
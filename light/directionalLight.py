@@ -1,4 +1,5 @@
 from light.light import Light
+from light.shadow import CascadedShadow, DirectionalShadow
 
 
 class DirectionalLight(Light):
@@ -6,3 +7,17 @@ class DirectionalLight(Light):
         super().__init__(Light.DIRECTIONAL)
         self.color = color
         self.setDirection(direction)
+
+    #render a shadow map for this light; by default it is fitted to
+    #all shadow casting and receiving meshes, bounds fixes it to a box
+    def enableShadow(self, resolution=1024, strength=0.5, bias=0.001, bounds=None):
+        self.shadow = DirectionalShadow(self, resolution, strength, bias, bounds)
+        return self.shadow
+
+    #shadow of the scene near the camera for large scenes, in
+    #cascadeCount maps (see light.shadow.CascadedShadow)
+    def enableCascadedShadow(self, resolution=1024, cascadeCount=4, maxDistance=100, splitWeight=0.75,
+                            updateIntervals=None, strength=0.5, bias=0.001):
+        self.shadow = CascadedShadow(self, resolution, cascadeCount, maxDistance, splitWeight,
+                                    updateIntervals, strength, bias)
+        return self.shadow
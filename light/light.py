@@ -10,3 +10,10 @@ class Light(Object3D):
         self.lightType = lightType
         self.color = [1,1,1]
         self.attenuation = [1,0,0]
+        #light.shadow.Shadow when this light casts shadows
+        self.shadow = None
+
+    #distance beyond which the light is negligible; None for lights
+    #that reach everything (see PointLight.getRadius)
+    def getRadius(self):
+        return None
@@ -0,0 +1,58 @@
+import numpy
+
+#per mesh light selection for materials with the uniforms
+#light0..light3: each mesh gets the lights that reach everything
+#(ambient, directional) followed by the point lights whose influence
+#sphere (PointLight.getRadius) touches the mesh's bounding sphere,
+#brightest at the mesh first. The tests run on all mesh and light
+#pairs at once. Materials skip the empty slots (uniform lightCount),
+#so meshes reached by fewer lights are cheaper to shade.
+
+
+#world space bounding spheres of meshes: (M,3) centers, (M,) radii
+def getMeshSpheres(meshes):
+    matrices = numpy.array([mesh.getWorldMatrix() for mesh in meshes], dtype=float).reshape(-1, 4, 4)
+    spheres = [mesh.geometry.getBoundingSphere() for mesh in meshes]
+    localCenters = numpy.array([center for center, radius in spheres], dtype=float).reshape(-1, 3)
+    localRadii = numpy.array([radius for center, radius in spheres], dtype=float)
+    centers = numpy.einsum("mij,mj->mi", matrices[:, 0:3, 0:3], localCenters) + matrices[:, 0:3, 3]
+    #the largest scale factor (length of a matrix column) bounds the radius
+    scales = numpy.linalg.norm(matrices[:, 0:3, 0:3], axis=1).max(axis=1, initial=0)
+    return centers, localRadii * scales
+
+#light numbers (positions in lights) of up to maxLights lights for
+#each mesh; returns an (M, maxLights) array padded with -1 and the
+#number of lights of each mesh
+def selectLights(meshes, lights, maxLights=4):
+    slots = numpy.full((len(meshes), maxLights), -1, dtype=int)
+    radii = [light.getRadius() for light in lights]
+    globalLights = [lightNumber for lightNumber, radius in enumerate(radii) if radius is None][0:maxLights]
+    slots[:, 0:len(globalLights)] = globalLights
+    counts = numpy.full(len(meshes), len(globalLights), dtype=int)
+    pointLights = [lightNumber for lightNumber, radius in enumerate(radii) if radius is not None]
+    free = maxLights - len(globalLights)
+    if free == 0 or len(pointLights) == 0 or len(meshes) == 0:
+        return slots, counts
+
+    positions = numpy.array([lights[n].getWorldPosition() for n in pointLights], dtype=float)
+    lightRadii = numpy.array([radii[n] for n in pointLights], dtype=float)
+    brightness = numpy.array([max(lights[n].color) for n in pointLights], dtype=float)
+    attenuation = numpy.array([lights[n].attenuation for n in pointLights], dtype=float)
+    centers, meshRadii = getMeshSpheres(meshes)
+
+    #(M, L) distances between mesh and light spheres
+    distances = numpy.linalg.norm(centers[:, None, :] - positions[None, :, :], axis=2)
+    reached = distances < meshRadii[:, None] + lightRadii[None, :]
+    #brightness at the point of the mesh's sphere nearest to the light
+    gap = numpy.maximum(distances - meshRadii[:, None], 0)
+    score = brightness / (attenuation[:, 0] + attenuation[:, 1] * gap + attenuation[:, 2] * gap * gap)
+    score = numpy.where(reached, score, -numpy.inf)
+
+    #the free slots take the highest scores, highest first
+    count = min(free, len(pointLights))
+    best = numpy.argsort(-score, axis=1)[:, 0:count]
+    bestScores = numpy.take_along_axis(score, best, axis=1)
+    selected = numpy.where(numpy.isfinite(bestScores), numpy.array(pointLights)[best], -1)
+    slots[:, len(globalLights):len(globalLights) + count] = selected
+    counts += numpy.isfinite(bestScores).sum(axis=1)
+    return slots, counts
@@ -0,0 +1,180 @@
+from math import pi
+
+import numpy
+from OpenGL.GL import *
+
+from core.camera import Camera
+from core.cubeRenderTarget import CubeRenderTarget
+from core.matrix import Matrix
+from light.light import Light
+from light.shadow import PointShadow, makeViewMatrix
+
+#irradiance probes: a grid of points storing the light arriving from
+#every direction as 9 spherical harmonics coefficients (bands 0-2),
+#captured offline from the lights (evaluated with numpy) and/or from
+#cube maps of the rendered scene (bounced light). Lit materials
+#created with probes=True evaluate these coefficients at the normal
+#instead of looping over lights; Renderer.render interpolates them at
+#each such mesh's center from Renderer.lightProbes, so a moving mesh
+#costs one uniform upload. Probes see no shadows of their own besides
+#what the captured scene shows, and no specular highlights.
+
+#spherical harmonics basis constants
+shConstants = [0.282095, 0.488603, 1.092548, 0.315392, 0.546274]
+#convolution with the clamped cosine per band (irradiance)
+shCosineBands = [pi, 2 * pi / 3, 2 * pi / 3, 2 * pi / 3,
+                 pi / 4, pi / 4, pi / 4, pi / 4, pi / 4]
+
+#GLSL defining totalLight(position, normal) (see
+#light/clusteredLighting.py) from the mesh's probe coefficients; the
+#coefficients are already convolved, so this is the light a Lambert
+#surface receives
+probeLightsShaderCode = """
+uniform vec3 shCoefficients[9];
+
+vec3 totalLight(vec3 pointPosition, vec3 pointNormal)
+{
+    vec3 n = normalize(pointNormal);
+    vec3 total = shCoefficients[0] * 0.282095
+        + shCoefficients[1] * 0.488603 * n.y
+        + shCoefficients[2] * 0.488603 * n.z
+        + shCoefficients[3] * 0.488603 * n.x
+        + shCoefficients[4] * 1.092548 * n.x * n.y
+        + shCoefficients[5] * 1.092548 * n.y * n.z
+        + shCoefficients[6] * 0.315392 * (3.0 * n.z * n.z - 1.0)
+        + shCoefficients[7] * 1.092548 * n.x * n.z
+        + shCoefficients[8] * 0.546274 * (n.x * n.x - n.y * n.y);
+    return max(total, vec3(0.0));
+}
+"""
+
+#uniforms used by probeLightsShaderCode
+def addProbeUniforms(material):
+    material.addUniform("vec3[]", "shCoefficients", numpy.zeros((9, 3)))
+
+
+#spherical harmonics basis at unit directions (N,3), as (N,9); same
+#order as probeLightsShaderCode
+def getSHBasis(directions):
+    x, y, z = directions[:, 0], directions[:, 1], directions[:, 2]
+    c = shConstants
+    return numpy.stack([
+        numpy.full(len(directions), c[0]),
+        c[1] * y, c[1] * z, c[1] * x,
+        c[2] * x * y, c[2] * y * z, c[3] * (3 * z * z - 1), c[2] * x * z, c[4] * (x * x - y * y)
+    ], axis=1)
+
+#light received at normals (N,3) from coefficients (9,3) or (N,9,3),
+#as probeLightsShaderCode computes it
+def getIrradiance(coefficients, normals):
+    normals = normals / numpy.linalg.norm(normals, axis=1, keepdims=True)
+    basis = getSHBasis(normals)
+    if coefficients.ndim == 2:
+        return numpy.maximum(basis @ coefficients, 0)
+    return numpy.maximum(numpy.einsum("nk,nkc->nc", basis, coefficients), 0)
+
+
+#a box of resolution[0] x resolution[1] x resolution[2] probes between
+#two corners (at least 2 along each axis)
+class LightProbeGrid(object):
+    def __init__(self, low, high, resolution=[4, 4, 4]):
+        if min(resolution) < 2:
+            raise Exception("Light probe grids need at least 2 probes along each axis")
+        self.low = numpy.array(low, dtype=float)
+        self.high = numpy.array(high, dtype=float)
+        self.resolution = list(resolution)
+        #convolved coefficients per probe, (X, Y, Z, 9, 3)
+        self.coefficients = numpy.zeros(tuple(resolution) + (9, 3))
+
+    #world positions of the probes, (X, Y, Z, 3)
+    def getPositions(self):
+        axes = [numpy.linspace(self.low[n], self.high[n], self.resolution[n]) for n in range(3)]
+        return numpy.stack(numpy.meshgrid(*axes, indexing="ij"), axis=-1)
+
+    def clear(self):
+        self.coefficients[:] = 0
+
+    #add the direct light of lights (as LambertMaterial computes it:
+    #ambient, directional and point lights, unshadowed)
+    def addLights(self, lights):
+        positions = self.getPositions().reshape(-1, 3)
+        coefficients = numpy.zeros((len(positions), 9, 3))
+        for light in lights:
+            color = numpy.array(light.color, dtype=float)
+            if light.lightType == Light.AMBIENT:
+                #constant in every direction
+                coefficients[:, 0] += color / shConstants[0]
+                continue
+            if light.lightType == Light.DIRECTIONAL:
+                direction = -numpy.array(light.getDirection(), dtype=float)
+                direction = numpy.tile(direction / numpy.linalg.norm(direction), (len(positions), 1))
+                colors = numpy.tile(color, (len(positions), 1))
+            elif light.lightType == Light.POINT:
+                offsets = numpy.array(light.getWorldPosition(), dtype=float) - positions
+                distance = numpy.maximum(numpy.linalg.norm(offsets, axis=1), 1e-6)
+                direction = offsets / distance[:, None]
+                constant, linear, quadratic = light.attenuation
+                colors = color / (constant + linear * distance + quadratic * distance * distance)[:, None]
+            else:
+                continue
+            #a light from one direction, convolved with the cosine
+            basis = getSHBasis(direction) * shCosineBands
+            coefficients += basis[:, :, None] * colors[:, None, :]
+        self.coefficients += coefficients.reshape(self.coefficients.shape)
+
+    #add the light reflected by the scene: render a cube map of size
+    #pixels per face at every probe (meshes moving through the grid
+    #should be hidden first) and project it. Combined with addLights,
+    #probes hold direct light plus one bounce
+    def addScene(self, renderer, scene, size=32, near=0.05, far=100):
+        target = CubeRenderTarget(size, GL_RGBA16F)
+        camera = Camera()
+        camera.projectionMatrix = Matrix.makePerspective(90, 1, near, far)
+        #direction and solid angle of each pixel of a face, in the
+        #face camera's coordinates (x right, y up, looking along -z)
+        centers = (numpy.arange(size) + 0.5) / size * 2 - 1
+        x, y = numpy.meshgrid(centers, centers)
+        solidAngles = (4.0 / (size * size)) / (1 + x * x + y * y) ** 1.5
+        localDirections = numpy.stack([x, y, -numpy.ones_like(x)], axis=-1).reshape(-1, 3)
+        localDirections /= numpy.linalg.norm(localDirections, axis=1, keepdims=True)
+
+        positions = self.getPositions().reshape(-1, 3)
+        coefficients = numpy.zeros((len(positions), 9, 3))
+        for probe, position in enumerate(positions):
+            for face in range(6):
+                viewMatrix = makeViewMatrix(position, PointShadow.faceDirections[face], PointShadow.faceUps[face])
+                camera.transform = numpy.linalg.inv(viewMatrix)
+                glBindFramebuffer(GL_FRAMEBUFFER, target.framebufferRef)
+                target.selectFace(face)
+                renderer.render(scene, camera, renderTarget=target)
+                glBindFramebuffer(GL_FRAMEBUFFER, target.framebufferRef)
+                pixels = glReadPixels(0, 0, size, size, GL_RGB, GL_FLOAT)
+                radiance = numpy.asarray(pixels, dtype=float).reshape(-1, 3)
+                #world directions: rows of the view rotation are the
+                #camera axes
+                directions = localDirections @ viewMatrix[0:3, 0:3]
+                weights = getSHBasis(directions) * solidAngles.reshape(-1, 1)
+                coefficients[probe] += weights.T @ radiance
+        #convolve with the cosine; a Lambert surface reflects 1/pi of
+        #the irradiance
+        coefficients *= (numpy.array(shCosineBands) / pi)[None, :, None]
+        self.coefficients += coefficients.reshape(self.coefficients.shape)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+    #coefficients at points (N,3), trilinearly interpolated between the
+    #8 surrounding probes (points outside use the nearest border);
+    #returns (N,9,3)
+    def sample(self, points):
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        resolution = numpy.array(self.resolution)
+        grid = (points - self.low) / (self.high - self.low) * (resolution - 1)
+        grid = numpy.clip(grid, 0, resolution - 1)
+        cell = numpy.minimum(numpy.floor(grid).astype(int), resolution - 2)
+        fraction = grid - cell
+        result = numpy.zeros((len(points), 9, 3))
+        for corner in range(8):
+            offset = numpy.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            weight = numpy.prod(numpy.where(offset == 1, fraction, 1 - fraction), axis=1)
+            index = cell + offset
+            result += weight[:, None, None] * self.coefficients[index[:, 0], index[:, 1], index[:, 2]]
+        return result
@@ -1,4 +1,7 @@
+from math import sqrt
+
 from light.light import Light
+from light.shadow import PointShadow
 
 
 class PointLight(Light):
@@ -7,3 +10,26 @@ class PointLight(Light):
         self.color = color
         self.setPosition(position)
         self.attenuation = attenuation
+        #the light is ignored where it adds less than this to a color
+        #channel (see getRadius)
+        self.cutoff = 1.0 / 256
+
+    #influence radius: distance at which the brightest color channel,
+    #divided by the attenuation, drops to cutoff; None when the light
+    #does not fall off with distance
+    def getRadius(self):
+        constant, linear, quadratic = self.attenuation
+        #solve constant + linear d + quadratic d^2 = max(color) / cutoff
+        limit = max(self.color) / self.cutoff - constant
+        if limit <= 0:
+            return 0.0
+        if quadratic > 0:
+            return (-linear + sqrt(linear * linear + 4 * quadratic * limit)) / (2 * quadratic)
+        if linear > 0:
+            return limit / linear
+        return None
+
+    #render a cube shadow map for this light, covering near to far
+    def enableShadow(self, resolution=512, strength=0.5, bias=0.05, near=0.1, far=50):
+        self.shadow = PointShadow(self, resolution, strength, bias, near, far)
+        return self.shadow
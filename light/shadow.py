@@ -0,0 +1,522 @@
+import numpy
+from OpenGL.GL import *
+
+from core.arrayRenderTarget import ArrayRenderTarget
+from core.cubeRenderTarget import CubeRenderTarget
+from core.matrix import Matrix
+from core.renderState import RenderState
+from core.rendererTarget import RenderTarget
+from material.depthMaterial import DepthMaterial
+
+#shadow maps: Renderer.render draws a depth only pass per shadow
+#casting light (see DirectionalLight.enableShadow and
+#PointLight.enableShadow) before the scene, and lit materials created
+#with useShadow=True darken that light's contribution where the map
+#says the point is hidden. A map is only redrawn when a caster or the
+#light moved. Materials receive at most one directional and one
+#point light shadow, of the first such lights of the scene.
+#Large scenes use DirectionalLight.enableCascadedShadow instead: one
+#map per slice of the camera's view distance, nearer slices covering
+#less area at the same resolution.
+
+#texture units of the shadow maps (material textures use 1 and 2)
+shadowMapUnit = 3
+pointShadowMapUnit = 4
+cascadeMapUnit = 5
+#cascadeSplits is a vec4
+maxCascadeCount = 4
+
+#GLSL for the fragment shader of lit materials with useShadow=True;
+#shadowFactor(lightNumber, position) scales the contribution of
+#light number lightNumber (0-3)
+shadowShaderCode = """
+uniform int shadowLight;
+uniform sampler2DShadow shadowMap;
+uniform mat4 shadowMatrix;
+uniform float shadowStrength;
+uniform float shadowBias;
+uniform int pointShadowLight;
+uniform samplerCubeShadow pointShadowMap;
+uniform vec3 pointShadowPosition;
+uniform vec2 pointShadowRange;
+uniform float pointShadowStrength;
+uniform float pointShadowBias;
+//cascaded directional shadow (cascadeCount 0: shadowMap is used)
+uniform int cascadeCount;
+uniform sampler2DArrayShadow cascadeMaps;
+uniform mat4 cascadeMatrix0;
+uniform mat4 cascadeMatrix1;
+uniform mat4 cascadeMatrix2;
+uniform mat4 cascadeMatrix3;
+//view distance up to which each cascade is used
+uniform vec4 cascadeSplits;
+uniform vec3 cascadeViewPosition;
+uniform vec3 cascadeViewDirection;
+
+//fraction of light reaching the point (1: fully lit), averaged over
+//3x3 texels (each lookup compares and filters 2x2 texels itself)
+float directionalShadow(vec3 pointPosition)
+{
+    vec4 shadowCoord = shadowMatrix * vec4(pointPosition, 1.0);
+    vec3 coord = shadowCoord.xyz / shadowCoord.w;
+    //beyond the far plane of the shadow map
+    if(coord.z > 1.0)
+        return 1.0;
+    vec2 texelSize = 1.0 / vec2(textureSize(shadowMap, 0));
+    float lit = 0.0;
+    for(int x = -1; x <= 1; x++)
+        for(int y = -1; y <= 1; y++)
+            lit += texture(shadowMap, vec3(coord.xy + vec2(x, y) * texelSize, coord.z - shadowBias));
+    return lit / 9.0;
+}
+
+mat4 cascadeMatrix(int cascade)
+{
+    if(cascade == 0)
+        return cascadeMatrix0;
+    if(cascade == 1)
+        return cascadeMatrix1;
+    if(cascade == 2)
+        return cascadeMatrix2;
+    return cascadeMatrix3;
+}
+
+//the nearest cascade containing the point; cascades that were not
+//updated in this frame may not cover their whole slice, so the
+//next one is tried when the point is outside
+float cascadeShadow(vec3 pointPosition)
+{
+    float viewDistance = dot(pointPosition - cascadeViewPosition, cascadeViewDirection);
+    for(int cascade = 0; cascade < cascadeCount; cascade++)
+    {
+        if(viewDistance > cascadeSplits[cascade])
+            continue;
+        vec4 shadowCoord = cascadeMatrix(cascade) * vec4(pointPosition, 1.0);
+        vec3 coord = shadowCoord.xyz / shadowCoord.w;
+        if(any(lessThan(coord, vec3(0.0))) || any(greaterThan(coord, vec3(1.0))))
+            continue;
+        vec2 texelSize = 1.0 / vec2(textureSize(cascadeMaps, 0).xy);
+        float lit = 0.0;
+        for(int x = -1; x <= 1; x++)
+            for(int y = -1; y <= 1; y++)
+                lit += texture(cascadeMaps, vec4(coord.xy + vec2(x, y) * texelSize, cascade, coord.z - shadowBias));
+        return lit / 9.0;
+    }
+    return 1.0;
+}
+
+float pointShadow(vec3 pointPosition)
+{
+    vec3 direction = pointPosition - pointShadowPosition;
+    vec3 absolute = abs(direction);
+    //distance along the axis of the cube face that is sampled
+    float distance = max(absolute.x, max(absolute.y, absolute.z)) - pointShadowBias;
+    float near = pointShadowRange.x;
+    float far = pointShadowRange.y;
+    if(distance >= far)
+        return 1.0;
+    //depth the face's perspective projection stores at that distance
+    float depth = (far + near) / (far - near) - 2.0 * far * near / ((far - near) * distance);
+    depth = depth * 0.5 + 0.5;
+    float offset = 1.5 * distance / float(textureSize(pointShadowMap, 0).x);
+    float lit = texture(pointShadowMap, vec4(direction, depth));
+    lit += texture(pointShadowMap, vec4(direction + offset * vec3(1, 1, 1), depth));
+    lit += texture(pointShadowMap, vec4(direction + offset * vec3(1, -1, -1), depth));
+    lit += texture(pointShadowMap, vec4(direction + offset * vec3(-1, 1, -1), depth));
+    lit += texture(pointShadowMap, vec4(direction + offset * vec3(-1, -1, 1), depth));
+    return lit / 5.0;
+}
+
+float shadowFactor(int lightNumber, vec3 pointPosition)
+{
+    float factor = 1.0;
+    if(lightNumber == shadowLight)
+    {
+        float lit = cascadeCount > 0 ? cascadeShadow(pointPosition) : directionalShadow(pointPosition);
+        factor *= 1.0 - shadowStrength * (1.0 - lit);
+    }
+    if(lightNumber == pointShadowLight)
+        factor *= 1.0 - pointShadowStrength * (1.0 - pointShadow(pointPosition));
+    return factor;
+}
+"""
+
+#the same function for materials without shadows
+noShadowShaderCode = """
+float shadowFactor(int lightNumber, vec3 pointPosition)
+{
+    return 1.0;
+}
+"""
+
+#uniforms used by shadowShaderCode, with values for "no shadow"
+def addShadowUniforms(material):
+    material.addUniform("int", "shadowLight", -1)
+    material.addUniform("sampler2DShadow", "shadowMap", [0, shadowMapUnit])
+    material.addUniform("mat4", "shadowMatrix", Matrix.makeIdentity())
+    material.addUniform("float", "shadowStrength", 0)
+    material.addUniform("float", "shadowBias", 0)
+    material.addUniform("int", "pointShadowLight", -1)
+    material.addUniform("samplerCubeShadow", "pointShadowMap", [0, pointShadowMapUnit])
+    material.addUniform("vec3", "pointShadowPosition", [0, 0, 0])
+    material.addUniform("vec2", "pointShadowRange", [0.1, 1])
+    material.addUniform("float", "pointShadowStrength", 0)
+    material.addUniform("float", "pointShadowBias", 0)
+    material.addUniform("int", "cascadeCount", 0)
+    material.addUniform("sampler2DArrayShadow", "cascadeMaps", [0, cascadeMapUnit])
+    for cascade in range(maxCascadeCount):
+        material.addUniform("mat4", "cascadeMatrix" + str(cascade), Matrix.makeIdentity())
+    material.addUniform("vec4", "cascadeSplits", [0, 0, 0, 0])
+    material.addUniform("vec3", "cascadeViewPosition", [0, 0, 0])
+    material.addUniform("vec3", "cascadeViewDirection", [0, 0, -1])
+
+
+#world to camera matrix of a camera at position looking along forward
+def makeViewMatrix(position, forward, up):
+    forward = numpy.asarray(forward, dtype=float)
+    forward = forward / numpy.linalg.norm(forward)
+    right = numpy.cross(forward, up)
+    #forward parallel to up: any perpendicular direction will do
+    if numpy.linalg.norm(right) < 0.001:
+        right = numpy.cross(forward, [1, 0, 0])
+    right = right / numpy.linalg.norm(right)
+    up = numpy.cross(right, forward)
+    m = Matrix.makeIdentity()
+    m[0, 0:3], m[0, 3] = right, -numpy.dot(right, position)
+    m[1, 0:3], m[1, 3] = up, -numpy.dot(up, position)
+    m[2, 0:3], m[2, 3] = -forward, numpy.dot(forward, position)
+    return m
+
+#world space corners of the bounding boxes of meshes, as (8N,3)
+def getWorldCorners(meshes):
+    corners = [mesh.geometry.getBoundingCorners() @ mesh.getWorldMatrix().T for mesh in meshes]
+    return numpy.concatenate(corners)[:, 0:3]
+
+#maps clip space [-1,1] coordinates to texture coordinates [0,1]
+biasMatrix = Matrix.makeTranslation(0.5, 0.5, 0.5) @ Matrix.makeScale(0.5)
+
+
+class Shadow(object):
+    #shared by all shadows; created when first needed
+    depthMaterial = None
+
+    def __init__(self, light, strength=0.5, bias=0.001):
+        self.light = light
+        #how much light a shadowed point loses (0 to 1)
+        self.strength = strength
+        #depth offset against self shadowing ("shadow acne")
+        self.bias = bias
+        #False redraws the map on every render call
+        self.cache = True
+        #positions of the light and casters when the map was drawn
+        self.state = None
+        #number of times the map was drawn, for measurement
+        self.renderCount = 0
+
+    #redraw the map on the next render call
+    def invalidate(self):
+        self.state = None
+
+    #meshes whose movement changes the map
+    def getTrackedMeshes(self, casters, receivers):
+        return casters
+
+    #draw the map if the light or the tracked meshes moved since the
+    #last time; returns True when it was drawn. camera is the camera
+    #the scene is rendered with (only used by cascaded shadows)
+    def update(self, casters, receivers, camera=None):
+        tracked = self.getTrackedMeshes(casters, receivers)
+        matrices = [self.light.getWorldMatrix()] + [mesh.getWorldMatrix() for mesh in tracked]
+        state = ([id(mesh) for mesh in tracked], numpy.array(matrices).tobytes())
+        if self.cache and state == self.state:
+            return False
+        self.state = state
+        self.render(casters, receivers)
+        self.renderCount += 1
+        return True
+
+    #implemented by extending classes
+    def render(self, casters, receivers):
+        pass
+
+    #values of the shadow uniforms (see addShadowUniforms) for
+    #receivers, when the light is light number lightNumber
+    def getUniformData(self, lightNumber):
+        return {}
+
+    #bind framebuffer and set up depth only rendering
+    def beginPass(self, target):
+        glBindFramebuffer(GL_FRAMEBUFFER, target.framebufferRef)
+        glViewport(0, 0, target.width, target.height)
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_DEPTH_TEST, True)
+        renderState.setDepthWrite(True)
+        renderState.setCapability(GL_BLEND, False)
+        renderState.setCapability(GL_CULL_FACE, False)
+        renderState.setPolygonMode(GL_FILL)
+        #slope scaled offset against self shadowing
+        renderState.setCapability(GL_POLYGON_OFFSET_FILL, True)
+        renderState.setPolygonOffset(2, 4)
+
+    def endPass(self):
+        RenderState.getCurrent().setCapability(GL_POLYGON_OFFSET_FILL, False)
+
+    #draw the casters' depth with the given camera matrices
+    def drawCasters(self, casters, viewMatrix, projectionMatrix):
+        if Shadow.depthMaterial is None:
+            Shadow.depthMaterial = DepthMaterial()
+        material = Shadow.depthMaterial
+        renderState = RenderState.getCurrent()
+        renderState.useProgram(material.programRef)
+        material.uniforms["viewMatrix"].data = viewMatrix
+        material.uniforms["viewMatrix"].uploadData()
+        material.uniforms["projectionMatrix"].data = projectionMatrix
+        material.uniforms["projectionMatrix"].uploadData()
+        modelMatrix = material.uniforms["modelMatrix"]
+        for mesh in casters:
+            renderState.bindVertexArray(mesh.vaoRef)
+            modelMatrix.data = mesh.getModelMatrix()
+            modelMatrix.uploadData()
+            glDrawArrays(mesh.material.settings["drawStyle"], 0, mesh.geometry.vertexCount)
+
+
+#orthographic shadow map along the light direction, fitted to the
+#bounds of all casters and receivers (or to fixed world space bounds)
+class DirectionalShadow(Shadow):
+    def __init__(self, light, resolution=1024, strength=0.5, bias=0.001, bounds=None):
+        super().__init__(light, strength, bias)
+        self.resolution = resolution
+        #optional [[minX, minY, minZ], [maxX, maxY, maxZ]]; fixed bounds
+        #only track casters, so moving receivers do not redraw the map
+        self.bounds = bounds
+        self.renderTarget = RenderTarget([resolution, resolution], internalFormat=None, depthTexture=True)
+        self.viewMatrix = Matrix.makeIdentity()
+        self.projectionMatrix = Matrix.makeIdentity()
+        #world space to shadow map coordinates and depth (0 to 1)
+        self.shadowMatrix = Matrix.makeIdentity()
+
+    def getTrackedMeshes(self, casters, receivers):
+        if self.bounds is not None:
+            return casters
+        return list(casters) + [mesh for mesh in receivers if not mesh.castShadow]
+
+    #orthographic projection along the light containing corners (N,3)
+    def fit(self, corners):
+        self.viewMatrix = makeViewMatrix([0, 0, 0], self.light.getDirection(), [0, 1, 0])
+        lightCorners = corners @ self.viewMatrix[0:3, 0:3].T
+        low = lightCorners.min(axis=0)
+        high = lightCorners.max(axis=0)
+        #snap to whole texels so the map does not shimmer while the
+        #bounds move
+        texelSize = max(high[0] - low[0], high[1] - low[1], 0.001) / self.resolution
+        low[0:2] = numpy.floor(low[0:2] / texelSize) * texelSize
+        high[0:2] = numpy.ceil(high[0:2] / texelSize) * texelSize
+        #the camera looks along -z; small margin in depth
+        margin = 0.01 * (high[2] - low[2]) + 0.01
+        self.projectionMatrix = Matrix.makeOrthographic(low[0], high[0], low[1], high[1],
+            -high[2] - margin, -low[2] + margin)
+        self.shadowMatrix = biasMatrix @ self.projectionMatrix @ self.viewMatrix
+
+    def render(self, casters, receivers):
+        if self.bounds is not None:
+            low, high = self.bounds
+            corners = numpy.array([[x, y, z] for x in (low[0], high[0])
+                                for y in (low[1], high[1]) for z in (low[2], high[2])])
+        else:
+            corners = getWorldCorners(list(casters) + list(receivers))
+        self.fit(corners)
+        self.beginPass(self.renderTarget)
+        glClear(GL_DEPTH_BUFFER_BIT)
+        self.drawCasters(casters, self.viewMatrix, self.projectionMatrix)
+        self.endPass()
+
+    def getUniformData(self, lightNumber):
+        return {
+            "shadowLight": lightNumber,
+            "shadowMap": [self.renderTarget.depthTexture.textureRef, shadowMapUnit],
+            "shadowMatrix": self.shadowMatrix,
+            "cascadeCount": 0,
+            "shadowStrength": self.strength,
+            "shadowBias": self.bias
+        }
+
+
+#cube shadow map around a point light: one 90 degree perspective
+#view per face
+class PointShadow(Shadow):
+    #view direction and up vector of each face (+x, -x, +y, -y, +z, -z),
+    #following the cube map face orientation
+    faceDirections = [[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]]
+    faceUps = [[0, -1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1], [0, -1, 0], [0, -1, 0]]
+
+    def __init__(self, light, resolution=512, strength=0.5, bias=0.05, near=0.1, far=50):
+        super().__init__(light, strength, bias)
+        self.resolution = resolution
+        #casters beyond far do not cast shadows
+        self.near = near
+        self.far = far
+        self.renderTarget = CubeRenderTarget(resolution, depthTexture=True)
+        self.projectionMatrix = Matrix.makePerspective(90, 1, near, far)
+        self.position = [0, 0, 0]
+
+    def render(self, casters, receivers):
+        self.position = self.light.getWorldPosition()
+        self.beginPass(self.renderTarget)
+        for face in range(6):
+            self.renderTarget.selectFace(face)
+            glClear(GL_DEPTH_BUFFER_BIT)
+            viewMatrix = makeViewMatrix(self.position, PointShadow.faceDirections[face],
+                PointShadow.faceUps[face])
+            self.drawCasters(casters, viewMatrix, self.projectionMatrix)
+        self.endPass()
+
+    def getUniformData(self, lightNumber):
+        return {
+            "pointShadowLight": lightNumber,
+            "pointShadowMap": [self.renderTarget.texture.textureRef, pointShadowMapUnit],
+            "pointShadowPosition": self.position,
+            "pointShadowRange": [self.near, self.far],
+            "pointShadowStrength": self.strength,
+            "pointShadowBias": self.bias
+        }
+
+
+#(near, far) distances of a perspective projection matrix
+def getPerspectiveRange(projectionMatrix):
+    if projectionMatrix[3, 3] != 0:
+        raise Exception("Cascaded shadows require a perspective camera")
+    b = projectionMatrix[2, 2]
+    c = projectionMatrix[2, 3]
+    return float(c / (b - 1)), float(c / (b + 1))
+
+#view distances dividing near to far into count slices: logarithmic
+#splits (equal resolution per distance ratio) blended with uniform
+#splits by weight (1: logarithmic only); returns count + 1 values
+def getCascadeSplits(near, far, count, weight):
+    fraction = numpy.arange(count + 1) / count
+    logarithmic = near * (far / near) ** fraction
+    uniform = near + (far - near) * fraction
+    return weight * logarithmic + (1 - weight) * uniform
+
+
+#directional light shadow of the part of the scene near the camera:
+#the view distance up to maxDistance is split into cascades, each
+#rendered into one layer of a depth texture array with an
+#orthographic projection fitted around that slice of the camera's
+#view. Far cascades cover large areas at low detail and change little
+#from frame to frame, so they can be updated less often: cascade i is
+#redrawn every updateIntervals[i] updates (staggered so cascades with
+#the same interval update in different frames)
+class CascadedShadow(Shadow):
+    def __init__(self, light, resolution=1024, cascadeCount=4, maxDistance=100, splitWeight=0.75,
+                updateIntervals=None, strength=0.5, bias=0.001):
+        super().__init__(light, strength, bias)
+        if cascadeCount < 1 or cascadeCount > maxCascadeCount:
+            raise Exception("Cascade count must be 1 to " + str(maxCascadeCount))
+        self.resolution = resolution
+        self.cascadeCount = cascadeCount
+        #shadows end at this view distance (or the camera's far plane)
+        self.maxDistance = maxDistance
+        self.splitWeight = splitWeight
+        if updateIntervals is None:
+            updateIntervals = [1, 1, 2, 4][0:cascadeCount]
+        self.updateIntervals = updateIntervals
+        self.renderTarget = ArrayRenderTarget([resolution, resolution], cascadeCount)
+        #per cascade: world space to shadow map coordinates, and the view
+        #distance up to which it is used
+        self.shadowMatrices = [Matrix.makeIdentity() for cascade in range(cascadeCount)]
+        self.splits = [0] * cascadeCount
+        #cascades not drawn yet are drawn in the next update
+        self.cascadeRendered = [False] * cascadeCount
+        #number of times each cascade was drawn, for measurement
+        self.cascadeRenderCounts = [0] * cascadeCount
+        self.updateNumber = 0
+        self.viewPosition = [0, 0, 0]
+        self.viewDirection = [0, 0, -1]
+
+    def invalidate(self):
+        super().invalidate()
+        self.cascadeRendered = [False] * self.cascadeCount
+
+    #the cascades follow the camera, so its movement also redraws them
+    def update(self, casters, receivers, camera=None):
+        if camera is None:
+            raise Exception("Cascaded shadows require the camera")
+        matrices = [self.light.getWorldMatrix(), camera.getWorldMatrix(), camera.projectionMatrix] + \
+                [mesh.getWorldMatrix() for mesh in casters]
+        state = ([id(mesh) for mesh in casters], numpy.array(matrices).tobytes())
+        if self.cache and state == self.state:
+            return False
+        self.state = state
+        self.updateNumber += 1
+        cascades = [cascade for cascade in range(self.cascadeCount)
+                    if not self.cascadeRendered[cascade]
+                    or (self.updateNumber + cascade) % self.updateIntervals[cascade] == 0]
+        self.render(casters, camera, cascades)
+        self.renderCount += 1
+        return True
+
+    #orthographic projection of one cascade, around the sphere
+    #enclosing the camera frustum slice from near to far; a sphere
+    #keeps its size when the camera turns, so the snapping to whole
+    #texels keeps the map steady
+    def fitCascade(self, cameraMatrix, projectionMatrix, near, far, viewMatrix, casterTop):
+        #frustum slice corners in camera space
+        tanX = 1 / projectionMatrix[0, 0]
+        tanY = 1 / projectionMatrix[1, 1]
+        corners = numpy.array([[x * tanX * d, y * tanY * d, -d, 1]
+                               for d in (near, far) for x in (-1, 1) for y in (-1, 1)])
+        corners = (corners @ cameraMatrix.T)[:, 0:3]
+        center = corners.mean(axis=0)
+        radius = numpy.linalg.norm(corners - center, axis=1).max()
+        radius = numpy.ceil(radius * 16) / 16
+        lightCenter = viewMatrix[0:3, 0:3] @ center
+        texelSize = 2 * radius / self.resolution
+        left = numpy.floor((lightCenter[0] - radius) / texelSize) * texelSize
+        bottom = numpy.floor((lightCenter[1] - radius) / texelSize) * texelSize
+        #the depth range also reaches back to casters between the light
+        #and the slice
+        top = max(lightCenter[2] + radius, casterTop)
+        projection = Matrix.makeOrthographic(left, left + 2 * radius, bottom, bottom + 2 * radius,
+            -top - 0.01, -(lightCenter[2] - radius) + 0.01)
+        return projection
+
+    def render(self, casters, camera, cascades):
+        cameraMatrix = camera.getWorldMatrix()
+        near, far = getPerspectiveRange(camera.projectionMatrix)
+        splits = getCascadeSplits(near, min(far, self.maxDistance), self.cascadeCount, self.splitWeight)
+        viewMatrix = makeViewMatrix([0, 0, 0], self.light.getDirection(), [0, 1, 0])
+        if len(casters) > 0:
+            casterTop = (getWorldCorners(casters) @ viewMatrix[2, 0:3]).max()
+        else:
+            casterTop = -numpy.inf
+        self.viewPosition = cameraMatrix[0:3, 3].copy()
+        self.viewDirection = -cameraMatrix[0:3, 2] / numpy.linalg.norm(cameraMatrix[0:3, 2])
+
+        self.beginPass(self.renderTarget)
+        for cascade in cascades:
+            projectionMatrix = self.fitCascade(cameraMatrix, camera.projectionMatrix,
+                splits[cascade], splits[cascade + 1], viewMatrix, casterTop)
+            self.renderTarget.selectLayer(cascade)
+            glClear(GL_DEPTH_BUFFER_BIT)
+            self.drawCasters(casters, viewMatrix, projectionMatrix)
+            self.shadowMatrices[cascade] = biasMatrix @ projectionMatrix @ viewMatrix
+            self.splits[cascade] = splits[cascade + 1]
+            self.cascadeRendered[cascade] = True
+            self.cascadeRenderCounts[cascade] += 1
+        self.endPass()
+
+    def getUniformData(self, lightNumber):
+        data = {
+            "shadowLight": lightNumber,
+            "cascadeCount": self.cascadeCount,
+            "cascadeMaps": [self.renderTarget.texture.textureRef, cascadeMapUnit],
+            "cascadeSplits": (self.splits + [0] * maxCascadeCount)[0:maxCascadeCount],
+            "cascadeViewPosition": self.viewPosition,
+            "cascadeViewDirection": self.viewDirection,
+            "shadowStrength": self.strength,
+            "shadowBias": self.bias
+        }
+        for cascade in range(self.cascadeCount):
+            data["cascadeMatrix" + str(cascade)] = self.shadowMatrices[cascade]
+        return data
@@ -10,6 +10,8 @@ class BasicMaterial(Material):
         in vec3 vertexPosition;
         in vec3 vertexColor;
         out vec3 color;
+        //depth matches the pre-pass (see material/depthMaterial.py)
+        invariant gl_Position;
         
         void main()
         {
@@ -0,0 +1,139 @@
+from OpenGL.GL import *
+
+from light.shadow import addShadowUniforms, shadowShaderCode
+from material.material import Material
+
+
+#lighting pass of deferred shading: adds the light of one light to the
+#pixels it covers, reading their surfaces from the G-buffer. Ambient
+#and directional lights are drawn as a full screen rectangle
+#(useVolume False, positions in clip space), point lights as a sphere
+#around their range (useVolume True)
+class DeferredLightMaterial(Material):
+    #texture units of the G-buffer textures (shadow maps use 3 to 5)
+    bufferUnits = {
+        "albedoBuffer": 10,
+        "normalBuffer": 11,
+        "positionBuffer": 12,
+        "specularBuffer": 13
+    }
+
+    def __init__(self, gBuffer):
+        vertexShaderCode = """
+        uniform mat4 projectionMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 modelMatrix;
+        uniform bool useVolume;
+        in vec3 vertexPosition;
+
+        void main()
+        {
+            if(useVolume)
+                gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+            else
+                gl_Position = vec4(vertexPosition.xy, 0.0, 1.0);
+        }
+        """
+
+        fragmentShaderCode = """
+        struct Light
+        {
+            //AMBIENT=1, DIRECTIONAL=2, POINT=3
+            int lightType;
+            //used by all lights
+            vec3 color;
+            //used by directional lights
+            vec3 direction;
+            //used by point lights
+            vec3 position;
+            vec3 attenuation;
+        };
+
+        uniform Light light;
+        //position of the light in the scene's light list (shadows)
+        uniform int lightNumber;
+        uniform vec3 viewPosition;
+        uniform sampler2D albedoBuffer;
+        uniform sampler2D normalBuffer;
+        uniform sampler2D positionBuffer;
+        uniform sampler2D specularBuffer;
+        """ + shadowShaderCode + """
+        out vec4 fragColor;
+
+        vec3 lightCalc(Light light, vec3 pointPosition, vec3 pointNormal, float specularStrength, float shininess)
+        {
+            float ambient = 0;
+            float diffuse = 0;
+            float specular = 0;
+            float attenuation = 1;
+            vec3 lightDirection = vec3(0,0,0);
+
+            if(light.lightType == 1)//ambient light
+            {
+                ambient = 1;
+            }
+            else if(light.lightType == 2)//directional light
+            {
+                lightDirection = normalize(light.direction);
+            }
+            else if(light.lightType == 3)//point light
+            {
+                lightDirection = normalize(pointPosition - light.position);
+                float distance = length(light.position - pointPosition);
+                attenuation = 1.0 / (light.attenuation[0] + light.attenuation[1] * distance + light.attenuation[2] * distance * distance);
+            }
+            if (light.lightType > 1)//directional or point light
+            {
+                diffuse = max(dot(pointNormal, -lightDirection), 0.0);
+                diffuse *= attenuation;
+
+                if(diffuse > 0 && specularStrength > 0)
+                {
+                    vec3 viewDirection = normalize(viewPosition - pointPosition);
+                    vec3 reflectDirection = reflect(lightDirection, pointNormal);
+                    specular = max(dot(viewDirection, reflectDirection),0.0);
+                    specular = specularStrength * pow(specular, shininess);
+                }
+            }
+
+            return light.color * (ambient + diffuse + specular);
+        }
+
+        void main()
+        {
+            ivec2 pixel = ivec2(gl_FragCoord.xy);
+            vec4 position = texelFetch(positionBuffer, pixel, 0);
+            //no surface
+            if(position.w == 0.0)
+                discard;
+            vec4 albedo = texelFetch(albedoBuffer, pixel, 0);
+            vec3 normal = texelFetch(normalBuffer, pixel, 0).xyz;
+            vec4 specular = texelFetch(specularBuffer, pixel, 0);
+            vec3 total = lightCalc(light, position.xyz, normal, specular.x, specular.y);
+            if(specular.z > 0.5)
+                total *= shadowFactor(lightNumber, position.xyz);
+            fragColor = vec4(albedo.rgb * total, 1.0);
+        }
+        """
+        super().__init__(vertexShaderCode, fragmentShaderCode)
+        self.addUniform("bool", "useVolume", False)
+        self.addUniform("Light", "light", None)
+        self.addUniform("int", "lightNumber", -1)
+        self.addUniform("vec3", "viewPosition", [0,0,0])
+        self.addUniform("sampler2D", "albedoBuffer",
+            [gBuffer.albedoTexture.textureRef, DeferredLightMaterial.bufferUnits["albedoBuffer"]])
+        self.addUniform("sampler2D", "normalBuffer",
+            [gBuffer.normalTexture.textureRef, DeferredLightMaterial.bufferUnits["normalBuffer"]])
+        self.addUniform("sampler2D", "positionBuffer",
+            [gBuffer.positionTexture.textureRef, DeferredLightMaterial.bufferUnits["positionBuffer"]])
+        self.addUniform("sampler2D", "specularBuffer",
+            [gBuffer.specularTexture.textureRef, DeferredLightMaterial.bufferUnits["specularBuffer"]])
+        addShadowUniforms(self)
+        self.locateUniforms()
+
+        #light adds up; the depth buffer of the geometry pass is kept
+        #for meshes drawn after lighting
+        self.settings["blending"] = True
+        self.settings["blendFunction"] = [GL_ONE, GL_ONE]
+        self.settings["depthTest"] = False
+        self.settings["depthWrite"] = False
@@ -0,0 +1,30 @@
+from material.material import Material
+
+
+#writes only depth; used for shadow map passes and the renderer's
+#depth pre-pass, which draw each mesh's vertex array object with this
+#program. gl_Position is invariant: materials drawn after the pre-pass
+#declare it invariant too and compute it with the same expression, so
+#their depth matches the stored depth exactly on every driver
+class DepthMaterial(Material):
+    def __init__(self):
+        vertexShaderCode = """
+        uniform mat4 projectionMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 modelMatrix;
+        in vec3 vertexPosition;
+        invariant gl_Position;
+
+        void main()
+        {
+            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+        }
+        """
+
+        fragmentShaderCode = """
+        void main()
+        {
+        }
+        """
+        super().__init__(vertexShaderCode, fragmentShaderCode)
+        self.locateUniforms()
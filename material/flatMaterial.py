@@ -1,10 +1,17 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
+from light.clusteredLighting import (addClusterUniforms, addFixedLightUniforms, clusteredLightsShaderCode,
+                                     fixedLightsShaderCode)
+from light.shadow import noShadowShaderCode
 from material.material import Material
 
 
 class FlatMaterial(Material):
-    def __init__(self, texture=None, properties={}):
+    def __init__(self, texture=None, properties={}, clustered=False):
+        #clustered: any number of lights (see light/clusteredLighting.py)
+        #instead of the four uniforms light0..light3
+        lightingCode = clusteredLightsShaderCode if clustered else fixedLightsShaderCode
         vertexShaderCode = """
         struct Light
         {
@@ -19,11 +26,6 @@ class FlatMaterial(Material):
             vec3 attenuation;
         };
 
-        uniform Light light0;
-        uniform Light light1;
-        uniform Light light2;
-        uniform Light light3;
-
         vec3 lightCalc(Light light, vec3 pointPosition, vec3 pointNormal)
         {
             float ambient = 0;
@@ -60,11 +62,14 @@ class FlatMaterial(Material):
         uniform mat4 projectionMatrix;
         uniform mat4 viewMatrix;
         uniform mat4 modelMatrix;
+        """ + noShadowShaderCode + lightingCode + """
         in vec3 vertexPosition;
         in vec2 vertexUV;
         in vec3 faceNormal;
         out vec2 UV;
         out vec3 light;
+        //depth matches the pre-pass (see material/depthMaterial.py)
+        invariant gl_Position;
 
         void main()
         {
@@ -73,11 +78,7 @@ class FlatMaterial(Material):
             //calculate total effect of lights on color
             vec3 position = vec3(modelMatrix * vec4(vertexPosition, 1.0));
             vec3 normal = normalize(mat3(modelMatrix) * faceNormal);
-            light = vec3(0,0,0);
-            light += lightCalc(light0, position, normal);
-            light += lightCalc(light1, position, normal);
-            light += lightCalc(light2, position, normal);
-            light += lightCalc(light3, position, normal);
+            light = totalLight(position, normal);
         }
         """
 
@@ -104,10 +105,10 @@ class FlatMaterial(Material):
         super().__init__(vertexShaderCode, fragmentShaderCode)
         
         self.addUniform("vec3", "baseColor", [1.0,1.0,1.0])
-        self.addUniform("Light", "light0", None)
-        self.addUniform("Light", "light1", None)
-        self.addUniform("Light", "light2", None)
-        self.addUniform("Light", "light3", None)
+        if clustered:
+            addClusterUniforms(self)
+        else:
+            addFixedLightUniforms(self)
         self.addUniform("bool", "useTexture", 0)
 
         if texture == None:
@@ -128,14 +129,13 @@ class FlatMaterial(Material):
 
     
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
         
         if self.settings["wireframe"]:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            renderState.setPolygonMode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            renderState.setPolygonMode(GL_FILL)
         
-        glLineWidth(self.settings["lineWidth"])
+        renderState.setLineWidth(self.settings["lineWidth"])
@@ -0,0 +1,67 @@
+from material.material import Material
+
+
+#geometry pass of deferred shading: writes the surface of each pixel
+#into the G-buffer (see core/gBuffer.py). One instance draws every lit
+#mesh; the renderer copies each mesh's material values into its
+#uniforms before drawing
+class GBufferMaterial(Material):
+    def __init__(self):
+        vertexShaderCode = """
+        uniform mat4 projectionMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 modelMatrix;
+        in vec3 vertexPosition;
+        in vec2 vertexUV;
+        in vec3 vertexNormal;
+        out vec3 position;
+        out vec2 UV;
+        out vec3 normal;
+
+        void main()
+        {
+            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+            UV = vertexUV;
+            position = vec3(modelMatrix * vec4(vertexPosition, 1.0));
+            normal = normalize(mat3(modelMatrix) * vertexNormal);
+        }
+        """
+
+        fragmentShaderCode = """
+        uniform vec3 baseColor;
+        uniform bool useTexture;
+        uniform sampler2D texture;
+        uniform float specularStrength;
+        uniform float shininess;
+        uniform bool receiveShadow;
+        in vec3 position;
+        in vec2 UV;
+        in vec3 normal;
+        layout(location = 0) out vec4 albedo;
+        layout(location = 1) out vec4 normalOut;
+        layout(location = 2) out vec4 positionOut;
+        layout(location = 3) out vec4 specularOut;
+
+        void main()
+        {
+            vec4 color = vec4(baseColor, 1.0);
+            if(useTexture)
+            {
+                color *= texture2D(texture, UV);
+            }
+            albedo = color;
+            normalOut = vec4(normalize(normal), 0.0);
+            positionOut = vec4(position, 1.0);
+            specularOut = vec4(specularStrength, shininess, receiveShadow ? 1.0 : 0.0, 0.0);
+        }
+        """
+        super().__init__(vertexShaderCode, fragmentShaderCode)
+        self.addUniform("vec3", "baseColor", [1.0,1.0,1.0])
+        self.addUniform("bool", "useTexture", False)
+        self.addUniform("sampler2D", "texture", [0, 1])
+        self.addUniform("float", "specularStrength", 0)
+        self.addUniform("float", "shininess", 1)
+        self.addUniform("bool", "receiveShadow", True)
+        self.locateUniforms()
+        #every buffer is overwritten, whatever its alpha
+        self.settings["blending"] = False
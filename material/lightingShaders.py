@@ -0,0 +1,139 @@
+#shaders of the lit materials (LambertMaterial, PhongMaterial), built
+#in two variants from the same lighting code:
+#"fragment" evaluates the lights for every fragment; "vertex" only for
+#every vertex, interpolating the light across triangles (Gouraud
+#shading). The vertex variant is much cheaper for meshes covering few
+#pixels, but has no bump mapping and blurs highlights within large
+#triangles. Materials created with lighting="auto" compile both, and
+#the renderer chooses for each mesh by its size on screen (see
+#Renderer.vertexLightingSize)
+
+#lightCode: the Light struct, lightCalc and the uniforms it reads,
+#then the shadowFactor and totalLight functions (light/shadow.py,
+#light/clusteredLighting.py); it may use the matrix uniforms.
+#reflections: mix in a cube map (uniforms environmentMap and
+#reflectivity) along the view direction mirrored at the normal;
+#lightCode must declare the uniform viewPosition. Returns vertex and
+#fragment shader code
+def getLightingShaders(lightCode, lighting="fragment", reflections=False):
+    reflectionCode = ""
+    if reflections:
+        reflectionCode = """
+            color.rgb = mix(color.rgb, textureCube(environmentMap, reflection).rgb, reflectivity);"""
+    if lighting == "fragment":
+        vertexShaderCode = """
+        uniform mat4 projectionMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 modelMatrix;
+        in vec3 vertexPosition;
+        in vec2 vertexUV;
+        in vec3 vertexNormal;
+        out vec2 UV;
+        out vec3 position;
+        out vec3 normal;
+        //depth matches the pre-pass (see material/depthMaterial.py)
+        invariant gl_Position;
+
+        void main()
+        {
+            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+            UV = vertexUV;
+            position = vec3(modelMatrix * vec4(vertexPosition, 1.0));
+            normal = normalize(mat3(modelMatrix) * vertexNormal);
+        }
+        """
+
+        fragmentShaderCode = """
+        uniform mat4 viewMatrix;
+        uniform mat4 projectionMatrix;
+        """ + lightCode + """
+        uniform vec3 baseColor;
+        uniform bool useTexture;
+        uniform sampler2D texture;
+        uniform bool useBumpTexture;
+        uniform sampler2D bumpTexture;
+        uniform float bumpStrength;
+        uniform samplerCube environmentMap;
+        uniform float reflectivity;
+        in vec3 position;
+        in vec2 UV;
+        in vec3 normal;
+        out vec4 fragColor;
+
+        void main()
+        {
+            vec4 color = vec4(baseColor, 1.0);
+            if(useTexture)
+            {
+                color *= texture2D(texture, UV);
+            }
+            vec3 bNormal = normal;
+            if(useBumpTexture)
+            {
+                bNormal += bumpStrength * vec3(texture2D(bumpTexture, UV));
+            }
+            //calculate total effect of lights on color
+            vec3 total = totalLight(position, bNormal);
+
+            color *= vec4(total, 1);
+        """ + ("""
+            vec3 reflection = reflect(normalize(position - viewPosition), normalize(bNormal));""" + reflectionCode
+            if reflections else "") + """
+            fragColor = color;
+        }
+        """
+    elif lighting == "vertex":
+        vertexShaderCode = """
+        uniform mat4 projectionMatrix;
+        uniform mat4 viewMatrix;
+        uniform mat4 modelMatrix;
+        """ + lightCode + """
+        in vec3 vertexPosition;
+        in vec2 vertexUV;
+        in vec3 vertexNormal;
+        out vec2 UV;
+        out vec3 light;
+        out vec3 reflection;
+        //depth matches the pre-pass (see material/depthMaterial.py)
+        invariant gl_Position;
+
+        void main()
+        {
+            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
+            UV = vertexUV;
+            //calculate total effect of lights on color
+            vec3 position = vec3(modelMatrix * vec4(vertexPosition, 1.0));
+            vec3 normal = normalize(mat3(modelMatrix) * vertexNormal);
+            light = totalLight(position, normal);
+        """ + ("""
+            reflection = reflect(normalize(position - viewPosition), normal);""" if reflections else "") + """
+        }
+        """
+
+        fragmentShaderCode = """
+        uniform vec3 baseColor;
+        uniform bool useTexture;
+        uniform sampler2D texture;
+        uniform samplerCube environmentMap;
+        uniform float reflectivity;
+        in vec2 UV;
+        in vec3 light;
+        in vec3 reflection;
+        out vec4 fragColor;
+
+        void main()
+        {
+            vec4 color = vec4(baseColor, 1.0);
+            if(useTexture)
+            {
+                color *= texture2D(texture, UV);
+            }
+
+            color *= vec4(light, 1);
+        """ + reflectionCode + """
+            fragColor = color;
+        }
+        """
+    else:
+        raise Exception("Unknown lighting: " + lighting)
+    return vertexShaderCode, fragmentShaderCode
@@ -1,3 +1,4 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
 from material.basicMaterial import BasicMaterial
@@ -15,7 +16,8 @@ class LineMaterial(BasicMaterial):
         self.setProperties(properties)
 
     def updateRenderSettings(self):
-        glLineWidth(self.settings["lineWidth"])
+        super().updateRenderSettings()
+        RenderState.getCurrent().setLineWidth(self.settings["lineWidth"])
 
         if self.settings["lineType"] == "connected":
             self.settings["drawStyle"] = GL_LINE_STRIP
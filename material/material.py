@@ -1,12 +1,21 @@
 from core.openGLUtils import OpenGLUtils
+from core.renderState import RenderState
 from core.uniform import Uniform
 from OpenGL.GL import *
 
 
 class Material(object):
-    def __init__(self, vertexShaderCode, fragmentShaderCode):
+    #variantName: name of this program among the material's variants
+    def __init__(self, vertexShaderCode, fragmentShaderCode, variantName="default"):
         self.programRef = OpenGLUtils.initializeProgram(
             vertexShaderCode, fragmentShaderCode)
+        #compiled versions of the shaders sharing the uniforms and
+        #settings (see addVariant), indexed by name; programRef is the
+        #program of the variant in use
+        self.variants = {variantName: self.programRef}
+        self.variant = variantName
+        #uniform locations in each variant's program
+        self.variantUniformRefs = {}
         #store uniform objects, indexed by name of associated variable in shader
         self.uniforms = {}
         #each shader typically constains these uniforms
@@ -20,6 +29,18 @@ class Material(object):
         #Additional settingd added by extending classes 
         self.settings = {}
         self.settings["drawStyle"] = GL_TRIANGLES
+        #blending of transparent colors (source, destination factors)
+        self.settings["blending"] = True
+        self.settings["blendFunction"] = [GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA]
+        #depth testing, and storing depth (usually off for transparent
+        #objects drawn after opaque ones)
+        self.settings["depthTest"] = True
+        self.settings["depthWrite"] = True
+        #drawn in the renderer's depth pre-pass (Renderer.depthPrepass),
+        #with a shader that only transforms vertexPosition; materials
+        #that move vertices in their vertex shader or discard fragments
+        #must turn this off
+        self.settings["depthPrepass"] = True
     
     def addUniform(self, dataType, variableName, data):
         self.uniforms[variableName] = Uniform(dataType, data)
@@ -27,14 +48,43 @@ class Material(object):
     
     #initialize all uniform variable references
     def locateUniforms(self):
-        for variableName, uniformObject in self.uniforms.items():
-            uniformObject.locateVariable(
-                self.programRef, variableName)
+        for name, programRef in self.variants.items():
+            for variableName, uniformObject in self.uniforms.items():
+                uniformObject.locateVariable(
+                    programRef, variableName)
+            self.variantUniformRefs[name] = {variableName: uniformObject.variableRef
+                for variableName, uniformObject in self.uniforms.items()}
+        self.useVariant(self.variant, True)
+
+    #compile another version of the shaders (e.g. cheaper), using the
+    #same uniforms (each variant may leave some unused), attribute
+    #locations and settings; call before locateUniforms
+    def addVariant(self, name, vertexShaderCode, fragmentShaderCode):
+        self.variants[name] = OpenGLUtils.initializeProgram(
+            vertexShaderCode, fragmentShaderCode)
+
+    #draw with the program of another variant from now on
+    def useVariant(self, name, force=False):
+        if name == self.variant and not force:
+            return
+        if name not in self.variants.keys():
+            raise Exception("Material has no variant named: " + name)
+        self.programRef = self.variants[name]
+        self.variant = name
+        for variableName, variableRef in self.variantUniformRefs[name].items():
+            self.uniforms[variableName].variableRef = variableRef
     
 
-    #configure opengl with render settings
+    #configure opengl with render settings; extending classes call
+    #this first, then apply their own settings the same way
     def updateRenderSettings(self):
-        pass
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_BLEND, self.settings["blending"])
+        if self.settings["blending"]:
+            renderState.setBlendFunction(self.settings["blendFunction"][0],
+                                        self.settings["blendFunction"][1])
+        renderState.setCapability(GL_DEPTH_TEST, self.settings["depthTest"])
+        renderState.setDepthWrite(self.settings["depthWrite"])
     
     #convenience method for setting multiple material "properties"
     #uniform and render settings values - from a dictionary
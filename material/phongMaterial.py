@@ -1,32 +1,28 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
+from light.clusteredLighting import (addClusterUniforms, addFixedLightUniforms, clusteredLightsShaderCode,
+                                     fixedLightsShaderCode)
+from light.lightProbes import addProbeUniforms, probeLightsShaderCode
+from light.shadow import addShadowUniforms, noShadowShaderCode, shadowShaderCode
+from material.lightingShaders import getLightingShaders
 from material.material import Material
 
 
 class PhongMaterial(Material):
-    def __init__(self, texture=None, bumpTexture = None, properties={}):
+    def __init__(self, texture=None, bumpTexture = None, properties={}, useShadow=False, clustered=False,
+                 lighting="fragment", probes=False, environmentMap=None):
+        #useShadow: darken lights by their shadow maps (see light/shadow.py)
+        shadowCode = shadowShaderCode if useShadow else noShadowShaderCode
+        #clustered: any number of lights (see light/clusteredLighting.py)
+        #instead of the four uniforms light0..light3
+        lightingCode = clusteredLightsShaderCode if clustered else fixedLightsShaderCode
+        #probes: light from the renderer's irradiance probes (see
+        #light/lightProbes.py) instead of individual lights
+        if probes:
+            lightingCode = probeLightsShaderCode
        
-        vertexShaderCode = """        
-        uniform mat4 projectionMatrix;
-        uniform mat4 viewMatrix;
-        uniform mat4 modelMatrix;        
-        in vec3 vertexPosition;
-        in vec2 vertexUV;
-        in vec3 vertexNormal;
-        out vec2 UV;
-        out vec3 normal;
-
-        void main()
-        {
-            gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
-            UV = vertexUV;
-            //calculate total effect of lights on color
-            vec3 position = vec3(modelMatrix * vec4(vertexPosition, 1.0));
-            normal = normalize(mat3(modelMatrix) * vertexNormal);           
-        }
-        """
-
-        fragmentShaderCode = """
+        lightCode = """
         struct Light
         {
             //AMBIENT=1, DIRECTIONAL=2, POINT=3
@@ -40,10 +36,6 @@ class PhongMaterial(Material):
             vec3 attenuation;
         };
 
-        uniform Light light0;
-        uniform Light light1;
-        uniform Light light2;
-        uniform Light light3;
         uniform vec3 viewPosition;
         uniform float specularStrength;
         uniform float shininess;
@@ -88,51 +80,32 @@ class PhongMaterial(Material):
 
             return light.color * (ambient + diffuse + specular);
         }
-
-        uniform vec3 baseColor;
-        uniform bool useTexture;
-        uniform sampler2D texture;
-        uniform bool useBumpTexture;
-        uniform sampler2D bumpTexture;
-        uniform float bumpStrength;
-        in vec3 position;
-        in vec2 UV;
-        in vec3 normal;
-        out vec4 fragColor;
-
-        void main()
-        {
-            vec4 color = vec4(baseColor, 1.0);
-            if(useTexture)
-            {
-                color *= texture2D(texture, UV);
-            }
-            vec3 bNormal = normal;
-            if(useBumpTexture)
-            {
-                bNormal += bumpStrength * vec3(texture2D(bumpTexture, UV));
-            }
-            //calculate total effect of lights on color
-            vec3 total = vec3(0,0,0);
-            total += lightCalc(light0, position, bNormal);
-            total += lightCalc(light1, position, bNormal);
-            total += lightCalc(light2, position, bNormal);
-            total += lightCalc(light3, position, bNormal);
-
-            color *= vec4(total, 1);
-            fragColor = color;
-        }
-        """
-        super().__init__(vertexShaderCode, fragmentShaderCode)
+        """ + shadowCode + lightingCode
+        #lighting: "fragment" (per pixel), "vertex" (cheaper, see
+        #material/lightingShaders.py) or "auto": both, chosen by the
+        #renderer for each mesh by its size on screen
+        #environmentMap: cube map texture (e.g. of a Skybox) reflected
+        #by the surface, mixed in by the uniform reflectivity
+        reflections = environmentMap is not None
+        if lighting == "auto":
+            super().__init__(*getLightingShaders(lightCode, "fragment", reflections), "fragment")
+            self.addVariant("vertex", *getLightingShaders(lightCode, "vertex", reflections))
+        else:
+            super().__init__(*getLightingShaders(lightCode, lighting, reflections), lighting)
         self.addUniform("vec3", "baseColor", [1.0,1.0,1.0])
-        self.addUniform("Light", "light0", None)
-        self.addUniform("Light", "light1", None)
-        self.addUniform("Light", "light2", None)
-        self.addUniform("Light", "light3", None)
+        if probes:
+            addProbeUniforms(self)
+        elif clustered:
+            addClusterUniforms(self)
+        else:
+            addFixedLightUniforms(self)
         self.addUniform("bool", "useTexture", 0)
         self.addUniform("vec3", "viewPosition", [0,0,0])
         self.addUniform("float", "specularStrength", 1)
         self.addUniform("float", "shininess", 32)
+        if reflections:
+            self.addUniform("samplerCube", "environmentMap", [environmentMap.textureRef, 9])
+            self.addUniform("float", "reflectivity", 0.5)
 
         if texture == None:
             self.addUniform("bool", "useTexture", False)
@@ -147,6 +120,8 @@ class PhongMaterial(Material):
             self.addUniform("sampler2D", "bumpTexture", [bumpTexture.textureRef, 2])
             self.addUniform("float", "bumpStrength", 1.0)
             
+        if useShadow:
+            addShadowUniforms(self)
         self.locateUniforms()
 
         #render both sides?
@@ -160,14 +135,13 @@ class PhongMaterial(Material):
 
     
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
         
         if self.settings["wireframe"]:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            renderState.setPolygonMode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            renderState.setPolygonMode(GL_FILL)
         
-        glLineWidth(self.settings["lineWidth"])
+        renderState.setLineWidth(self.settings["lineWidth"])
@@ -1,3 +1,4 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
 from material.basicMaterial import BasicMaterial
@@ -17,9 +18,7 @@ class PointMaterial(BasicMaterial):
 
         
     def updateRenderSettings(self):
-        glPointSize(self.settings["pointSize"])
-
-        if self.settings["roundedPoints"]:
-            glEnable(GL_POINT_SMOOTH)
-        else:
-            glDisable(GL_POINT_SMOOTH)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setPointSize(self.settings["pointSize"])
+        renderState.setCapability(GL_POINT_SMOOTH, self.settings["roundedPoints"])
@@ -0,0 +1,58 @@
+from core.renderState import RenderState
+from OpenGL.GL import *
+
+from material.material import Material
+
+
+#draws a cube map texture behind everything (see core/skybox.py): the
+#vertices are in clip space at the far plane, and each fragment looks
+#up the view direction through it
+class SkyboxMaterial(Material):
+    def __init__(self, texture, properties={}):
+        vertexShaderCode = """
+        //clip space to sky directions (inverse of projection, camera
+        //rotation and skybox rotation)
+        uniform mat4 directionMatrix;
+        in vec2 vertexPosition;
+        out vec3 direction;
+
+        void main()
+        {
+            //z = w: depth 1, the far plane
+            gl_Position = vec4(vertexPosition, 1.0, 1.0);
+            vec4 farPoint = directionMatrix * vec4(vertexPosition, 1.0, 1.0);
+            direction = farPoint.xyz / farPoint.w;
+        }
+        """
+
+        fragmentShaderCode = """
+        uniform vec3 baseColor;
+        uniform samplerCube cubeTexture;
+        in vec3 direction;
+        out vec4 fragColor;
+
+        void main()
+        {
+            fragColor = vec4(baseColor, 1.0) * texture(cubeTexture, direction);
+        }
+        """
+        super().__init__(vertexShaderCode, fragmentShaderCode)
+        self.addUniform("mat4", "directionMatrix", None)
+        self.addUniform("vec3", "baseColor", [1.0, 1.0, 1.0])
+        self.addUniform("samplerCube", "cubeTexture", [texture.textureRef, 1])
+        self.locateUniforms()
+
+        #only pixels nothing else covered (depth still 1) are shaded
+        self.settings["blending"] = False
+        self.settings["depthWrite"] = False
+        self.settings["depthPrepass"] = False
+
+        self.setProperties(properties)
+
+    def updateRenderSettings(self):
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        #the cleared depth equals the far plane
+        renderState.setDepthFunction(GL_LEQUAL)
+        renderState.setCapability(GL_CULL_FACE, False)
+        renderState.setPolygonMode(GL_FILL)
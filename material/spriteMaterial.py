@@ -1,3 +1,4 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
 from material.material import Material
@@ -73,10 +74,11 @@ class SpriteMaterial(Material):
 
         #render both sides?
         self.settings["doubleSide"] = True
+        #transparent texels are discarded, so depth needs the full shader
+        self.settings["depthPrepass"] = False
         self.setProperties(properties)
 
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
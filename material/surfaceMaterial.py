@@ -1,4 +1,5 @@
 from material.basicMaterial import BasicMaterial
+from core.renderState import RenderState
 from OpenGL.GL import *
 class SurfaceMaterial(BasicMaterial):
     def __init__(self, properties={}):
@@ -9,12 +10,11 @@ class SurfaceMaterial(BasicMaterial):
         self.settings["lineWidth"] = 1
         self.setProperties(properties)
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
         if self.settings["wireframe"]:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            renderState.setPolygonMode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            glLineWidth(self.settings["lineWidth"])
+            renderState.setPolygonMode(GL_FILL)
+        renderState.setLineWidth(self.settings["lineWidth"])
@@ -1,3 +1,4 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
 from material.basicMaterial import BasicMaterial
@@ -19,14 +20,13 @@ class SurfaceMaterial(BasicMaterial):
     
 
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
 
         if self.settings["wireframe"]:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            renderState.setPolygonMode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            renderState.setPolygonMode(GL_FILL)
 
-        glLineWidth(self.settings["lineWidth"])     
+        renderState.setLineWidth(self.settings["lineWidth"])     
@@ -1,30 +1,39 @@
+from core.renderState import RenderState
 from OpenGL.GL import *
 
 from material.material import Material
 
 
 class TextureMaterial(Material):
-    def __init__(self, texture, properties={}):
+    #lightMap: optional texture of baked light (see
+    #extras/lightBaker.py), read at the coordinates vertexUV2
+    def __init__(self, texture, properties={}, lightMap=None):
         vertexShaderCode = """
         uniform mat4 projectionMatrix;
         uniform mat4 viewMatrix;
         uniform mat4 modelMatrix;
         in vec3 vertexPosition;
         in vec2 vertexUV;
+        in vec2 vertexUV2;
         uniform vec2 repeatUV;
         uniform vec2 offsetUV;
         out vec2 UV;
+        out vec2 UV2;
 
         void main()
         {
             gl_Position = projectionMatrix * viewMatrix * modelMatrix * vec4(vertexPosition, 1.0);
             UV = vertexUV * repeatUV + offsetUV;
+            UV2 = vertexUV2;
         }"""
 
         fragmentShaderCode = """
         uniform vec3 baseColor;
         uniform sampler2D texture;
+        uniform bool useLightMap;
+        uniform sampler2D lightMap;
         in vec2 UV;
+        in vec2 UV2;
         out vec4 fragColor;
 
         void main()
@@ -35,6 +44,10 @@ class TextureMaterial(Material):
             {
                 discard;
             }
+            if(useLightMap)
+            {
+                color.rgb *= texture2D(lightMap, UV2).rgb;
+            }
             fragColor = color;
         }"""
         
@@ -43,10 +56,17 @@ class TextureMaterial(Material):
         self.addUniform("sampler2D", "texture", [texture.textureRef, 1])
         self.addUniform("vec2", "repeatUV", [1.0, 1.0])
         self.addUniform("vec2", "offsetUV", [0.0, 0.0])
+        if lightMap is None:
+            self.addUniform("bool", "useLightMap", False)
+        else:
+            self.addUniform("bool", "useLightMap", True)
+            self.addUniform("sampler2D", "lightMap", [lightMap.textureRef, 2])
         self.locateUniforms()
 
         #render both sides?
         self.settings["doubleSide"] = True
+        #transparent texels are discarded, so depth needs the full shader
+        self.settings["depthPrepass"] = False
         #render triangles as wireframe?
         self.settings["wireframe"] = False
         #line thickeness for wireframe rendering
@@ -56,14 +76,13 @@ class TextureMaterial(Material):
     
 
     def updateRenderSettings(self):
-        if self.settings["doubleSide"]:
-            glDisable(GL_CULL_FACE)
-        else:
-            glEnable(GL_CULL_FACE)
+        super().updateRenderSettings()
+        renderState = RenderState.getCurrent()
+        renderState.setCapability(GL_CULL_FACE, not self.settings["doubleSide"])
         
         if self.settings["wireframe"]:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            renderState.setPolygonMode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            renderState.setPolygonMode(GL_FILL)
         
-        glLineWidth(self.settings["lineWidth"])
+        renderState.setLineWidth(self.settings["lineWidth"])
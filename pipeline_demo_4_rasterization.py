@@ -16,6 +16,7 @@ sys.path.append(str(pathlib.Path(__file__).resolve().parent.parent))
 
 from core.base import Base
 from core.renderer import Renderer
+from core.renderState import RenderState
 from core.scene import Scene
 from core.camera import Camera
 from core.mesh import Mesh
@@ -213,6 +214,8 @@ class RasterizationDemo(Base):
             glPolygonMode(GL_FRONT_AND_BACK, GL_POINT)
             glEnable(GL_PROGRAM_POINT_SIZE)
             glPointSize(5.0)
+        # State diubah langsung dengan OpenGL; cache RenderState harus dilupakan
+        RenderState.getCurrent().invalidate()
 
 
 # Instantiate and run